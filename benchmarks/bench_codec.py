@@ -0,0 +1,80 @@
+"""
+Compares encoding and decoding the decisions of a synthetic game with ``DecisionCodec`` to JSON.
+
+Run with ``python benchmarks/bench_codec.py``.
+"""
+
+import json
+import os
+import sys
+import time
+from random import Random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from code_battles.codec import (
+    DecisionCodec,
+    Enum,
+    Float32,
+    Int32,
+    ListOf,
+    Record,
+    UInt16,
+)
+
+STEPS = 2000
+
+SCHEMA = Record(
+    moves=ListOf(Record(unit=UInt16, x=Float32, y=Float32)),
+    orders=ListOf(Enum(["hold", "attack", "retreat"])),
+    targets=ListOf(Int32),
+)
+
+
+def make_steps():
+    random = Random(0)
+    return [
+        {
+            "moves": [
+                {
+                    "unit": unit,
+                    "x": random.randrange(1000) / 4,
+                    "y": random.randrange(1000) / 4,
+                }
+                for unit in range(100)
+            ],
+            "orders": [
+                random.choice(["hold", "attack", "retreat"]) for _ in range(100)
+            ],
+            "targets": [random.randrange(-1, 100) for _ in range(100)],
+        }
+        for _ in range(STEPS)
+    ]
+
+
+def measure(name: str, steps, encode, decode):
+    start = time.perf_counter()
+    encoded = [encode(step) for step in steps]
+    encode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    decoded = [decode(data) for data in encoded]
+    decode_time = time.perf_counter() - start
+
+    assert decoded[0]["moves"] == steps[0]["moves"]
+    assert list(decoded[0]["targets"]) == steps[0]["targets"]
+    print(
+        f"{name:>6}: {sum(len(data) for data in encoded) / len(steps):7.0f} bytes/step | "
+        f"encode {encode_time / len(steps) * 1e6:6.1f}us/step | "
+        f"decode {decode_time / len(steps) * 1e6:6.1f}us/step"
+    )
+
+
+def main():
+    steps = make_steps()
+    codec = DecisionCodec(SCHEMA, "1.0.0")
+    measure("JSON", steps, lambda step: json.dumps(step).encode(), json.loads)
+    measure("codec", steps, codec.encode, codec.decode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Compares the decision compressors on the decisions of a synthetic game, in which 200 units move around and a few change orders each step.
+
+Run with ``python benchmarks/bench_decisions.py``.
+"""
+
+import json
+import os
+import struct
+import sys
+import time
+from random import Random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from code_battles.compression import (
+    DecisionCompressor,
+    DecisionLog,
+    XorDeltaCompressor,
+    ZlibStreamCompressor,
+)
+
+STEPS = 2000
+UNITS = 200
+
+
+def make_steps():
+    random = Random(0)
+    units = [
+        [unit, random.randrange(1000), random.randrange(1000), 0]
+        for unit in range(UNITS)
+    ]
+    binary = []
+    textual = []
+    for _ in range(STEPS):
+        for unit in units:
+            unit[1] += random.choice([-1, 0, 1])
+            unit[2] += random.choice([-1, 0, 1])
+            if random.random() < 0.05:
+                unit[3] = random.randrange(8)
+        binary.append(b"".join(struct.pack("<HhhH", *unit) for unit in units))
+        textual.append(
+            json.dumps(
+                [{"unit": u, "x": x, "y": y, "order": o} for u, x, y, o in units]
+            ).encode()
+        )
+
+    return binary, textual
+
+
+def measure(name: str, steps, compressor: DecisionCompressor):
+    log = DecisionLog(compressor)
+    start = time.perf_counter()
+    log.extend(steps)
+    encode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    decoded = list(log)
+    decode_time = time.perf_counter() - start
+
+    assert decoded == steps
+    raw_size = sum(len(step) for step in steps)
+    print(
+        f"{name:>22}: ratio {raw_size / log.compressed_size:6.1f}x | "
+        f"encode {encode_time / len(steps) * 1e6:6.1f}us/step | "
+        f"decode {decode_time / len(steps) * 1e6:6.1f}us/step"
+    )
+
+
+def main():
+    binary, textual = make_steps()
+    for label, steps in [("binary", binary), ("JSON", textual)]:
+        print(f"{label} decisions ({len(steps[0])} bytes per step):")
+        measure("none", steps, DecisionCompressor())
+        measure("XorDeltaCompressor", steps, XorDeltaCompressor())
+        measure("ZlibStreamCompressor", steps, ZlibStreamCompressor())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Compares moving 10,000 units stored as Python objects to moving them in an ``EntityStore``.
+
+Run with ``python benchmarks/bench_entities.py``.
+"""
+
+import os
+import sys
+import time
+from random import Random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from code_battles.utilities import EntityStore
+
+UNITS = 10000
+STEPS = 100
+
+
+class Unit:
+    def __init__(self, x: float, y: float, dx: float, dy: float):
+        self.x = x
+        self.y = y
+        self.dx = dx
+        self.dy = dy
+
+
+def main():
+    random = Random(0)
+    values = [
+        [random.random() * 1000 for _ in range(UNITS)],
+        [random.random() * 1000 for _ in range(UNITS)],
+        [random.random() - 0.5 for _ in range(UNITS)],
+        [random.random() - 0.5 for _ in range(UNITS)],
+    ]
+
+    units = [Unit(*unit) for unit in zip(*values)]
+    start = time.perf_counter()
+    for _ in range(STEPS):
+        for unit in units:
+            unit.x += unit.dx
+            unit.y += unit.dy
+    objects_time = time.perf_counter() - start
+
+    store = EntityStore(x="d", y="d", dx="d", dy="d")
+    store.add_many(UNITS, x=values[0], y=values[1], dx=values[2], dy=values[3])
+    # Imports NumPy (if it's installed) before timing.
+    store.find(x=-1)
+    start = time.perf_counter()
+    for _ in range(STEPS):
+        store.apply("x", lambda x, dx: x + dx, "x", "dx")
+        store.apply("y", lambda y, dy: y + dy, "y", "dy")
+    store_time = time.perf_counter() - start
+
+    assert abs(store.column("x")[-1] - units[-1].x) < 1e-6
+    print(
+        f"{UNITS} units, {STEPS} steps: objects {objects_time * 1000:.1f}ms | "
+        f"EntityStore.apply {store_time * 1000:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
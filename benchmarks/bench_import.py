@@ -0,0 +1,93 @@
+"""
+Measures how long importing ``code_battles`` takes, which every web worker and local simulation pays before its first step.
+
+Run with ``python benchmarks/bench_import.py``. The test suite fails if a module of :data:`LAZY_MODULES` is imported eagerly,
+or if the import takes several times longer than :data:`IMPORT_BUDGET_MS` (so it doesn't fail on busy machines).
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+from typing import List
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+IMPORT_BUDGET_MS = 50.0
+"""The budget for the cumulative import time of ``code_battles``, with compiled bytecode already cached."""
+
+LAZY_MODULES = [
+    "asyncio",
+    "base64",
+    "datetime",
+    "gzip",
+    "json",
+    "sqlite3",
+    "multiprocessing",
+    "numpy",
+    "traceback",
+    "urllib.parse",
+]
+"""Modules which ``code_battles`` must only import on first use, since they are slow to import."""
+
+
+def get_loaded_modules(module="code_battles") -> List[str]:
+    """Returns the modules which are loaded after importing the given module in a fresh interpreter."""
+
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys; import {module}; print('\\n'.join(sys.modules))",
+        ],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return output.splitlines()
+
+
+def measure_import_time(module="code_battles", runs=5) -> float:
+    """Returns the fastest cumulative import time of the given module (in milliseconds) out of the given amount of runs, as reported by ``python -X importtime``."""
+
+    with tempfile.TemporaryDirectory() as cache:
+        env = {
+            key: value
+            for key, value in os.environ.items()
+            if key != "PYTHONDONTWRITEBYTECODE"
+        }
+        env["PYTHONPYCACHEPREFIX"] = cache
+
+        times = []
+        # The first run only compiles and caches the bytecode.
+        for _ in range(runs + 1):
+            output = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                cwd=ROOT,
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stderr
+            for line in output.splitlines():
+                _, _, cumulative, name = [
+                    part.strip() for part in line.replace(":", "|", 1).split("|")
+                ]
+                if name == module:
+                    times.append(int(cumulative) / 1000)
+
+    return min(times[1:])
+
+
+def main():
+    import_time = measure_import_time()
+    print(f"import code_battles: {import_time:.1f}ms (budget {IMPORT_BUDGET_MS:.0f}ms)")
+
+    loaded = get_loaded_modules()
+    eager = [module for module in LAZY_MODULES if module in loaded]
+    print(f"eagerly imported lazy modules: {eager if len(eager) != 0 else 'none'}")
+
+
+if __name__ == "__main__":
+    main()
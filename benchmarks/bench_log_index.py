@@ -0,0 +1,66 @@
+"""
+Compares reading a slice of the logs of a simulation file with the log index to decoding all of the logs.
+
+Run with ``python benchmarks/bench_log_index.py``.
+"""
+
+import datetime
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from code_battles.battles import Simulation
+
+
+def main():
+    steps = [
+        [
+            {
+                "step": step,
+                "text": f"Unit {unit} moved to ({step}, {unit})",
+                "player_index": player_index,
+                "color": "white",
+            }
+            for player_index in range(4)
+            for unit in range(5)
+        ]
+        for step in range(10000)
+    ]
+    contents = Simulation(
+        {"map": "Forest"},
+        ["A", "B", "C", "D"],
+        "Game",
+        "1.0",
+        datetime.datetime.now(),
+        steps,
+        [[] for _ in steps],
+        [b"" for _ in steps],
+        0,
+    ).dump()
+
+    start = time.perf_counter()
+    all_logs = json.loads(json.dumps(steps))
+    sliced = [
+        entry
+        for entries in all_logs[4000:4500]
+        for entry in entries
+        if entry["player_index"] == 3
+    ]
+    decode_all_time = time.perf_counter() - start
+
+    simulation = Simulation.load(contents)
+    start = time.perf_counter()
+    queried = simulation.query_logs(3, 4000, 4500)
+    query_time = time.perf_counter() - start
+
+    assert queried == sliced
+    print(
+        f"{len(queried)} of {sum(len(entries) for entries in steps)} entries: "
+        f"decoding all {decode_all_time * 1000:.1f}ms | indexed query {query_time * 1000:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Compares logging formatted messages to logging lazy messages, when the entries are kept, rate-limited and disabled.
+
+Run with ``python benchmarks/bench_logs.py``.
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from code_battles.logs import LogSink
+
+
+class Unit:
+    def __init__(self, index: int):
+        self.index = index
+        self.position = (float(index), float(index * 2))
+
+    def __repr__(self):
+        return f"Unit({self.index}, {self.position})"
+
+
+def main():
+    units = [Unit(i) for i in range(1000)]
+
+    def eager(sink: LogSink):
+        for unit in units:
+            sink.add(0, f"Moving {unit} to {unit.position}", 0)
+        sink.take(0)
+
+    def lazy(sink: LogSink):
+        for unit in units:
+            sink.add(0, "Moving %s to %s", 0, args=(unit, unit.position))
+        sink.take(0)
+
+    disabled = LogSink()
+    disabled.enabled = False
+    for name, sink in [
+        ("kept", LogSink()),
+        ("limited to 100", LogSink(100)),
+        ("disabled", disabled),
+    ]:
+        eager_time = timeit.timeit(lambda: eager(sink), number=20) / 20
+        lazy_time = timeit.timeit(lambda: lazy(sink), number=20) / 20
+        print(
+            f"1000 entries, {name:>14}: formatted {eager_time * 1000:7.3f}ms | lazy {lazy_time * 1000:7.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
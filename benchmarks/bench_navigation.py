@@ -0,0 +1,90 @@
+"""
+Compares finding the next step of 1,000 units towards a target with a cached distance field to searching a path for each unit.
+
+Run with ``python benchmarks/bench_navigation.py``.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from random import Random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from code_battles.navigation import NavigationGrid
+
+WIDTH = 200
+HEIGHT = 150
+UNITS = 1000
+
+
+def search_next_step(grid: NavigationGrid, start: int, target: int) -> int:
+    previous = {start: start}
+    queue = deque([start])
+    while len(queue) != 0:
+        index = queue.popleft()
+        if index == target:
+            while previous[index] != start:
+                index = previous[index]
+            return index
+        x = index % grid.width
+        y = index // grid.width
+        for nx, ny in [(x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)]:
+            neighbor = ny * grid.width + nx
+            if (
+                0 <= nx < grid.width
+                and 0 <= ny < grid.height
+                and grid.passable[neighbor]
+                and neighbor not in previous
+            ):
+                previous[neighbor] = index
+                queue.append(neighbor)
+    return start
+
+
+def main():
+    random = Random(0)
+    text = "\n".join(
+        "".join("#" if random.random() < 0.2 else "." for _ in range(WIDTH))
+        for _ in range(HEIGHT)
+    )
+    units = [
+        (random.randrange(WIDTH) + 0.5, random.randrange(HEIGHT) + 0.5)
+        for _ in range(UNITS)
+    ]
+    target = (WIDTH / 2 + 0.5, HEIGHT / 2 + 0.5)
+
+    with tempfile.TemporaryDirectory() as directory:
+        grid = NavigationGrid.from_text(text, cache_directory=directory)
+        start = time.perf_counter()
+        grid.distance_field([target])
+        compute_time = time.perf_counter() - start
+
+        # A new grid (as in another simulation or process) maps the cached field from disk.
+        grid = NavigationGrid.from_text(text, cache_directory=directory)
+        start = time.perf_counter()
+        field = grid.distance_field([target])
+        load_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for x, y in units:
+            field.direction(x, y)
+        lookup_time = time.perf_counter() - start
+
+        target_index = int(target[1]) * WIDTH + int(target[0])
+        start = time.perf_counter()
+        for x, y in units[:100]:
+            search_next_step(grid, int(y) * WIDTH + int(x), target_index)
+        search_time = (time.perf_counter() - start) * UNITS / 100
+
+        print(
+            f"{WIDTH}x{HEIGHT} grid, {UNITS} units: computing the field {compute_time * 1000:.1f}ms | "
+            f"mapping the cached field {load_time * 1000:.2f}ms | field lookups {lookup_time * 1000:.1f}ms | "
+            f"searching per unit {search_time * 1000:.0f}ms"
+        )
+        del field, grid
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compares finding the neighbors of every entity with ``SpatialHash`` to checking all pairs, for 1,000 and 10,000 entities.
+
+Run with ``python benchmarks/bench_spatial.py``.
+"""
+
+import os
+import sys
+import time
+from random import Random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from code_battles.utilities import SpatialHash
+
+WIDTH = 2000
+HEIGHT = 1500
+RADIUS = 30
+QUERIES = 1000
+
+
+def brute_force_radius(xs, ys, x, y, radius):
+    squared_radius = radius * radius
+    return [
+        i
+        for i, (ex, ey) in enumerate(zip(xs, ys))
+        if (ex - x) * (ex - x) + (ey - y) * (ey - y) <= squared_radius
+    ]
+
+
+def brute_force_nearest(xs, ys, x, y, k):
+    return sorted(range(len(xs)), key=lambda i: (xs[i] - x) ** 2 + (ys[i] - y) ** 2)[:k]
+
+
+def main():
+    for count in [1000, 10000]:
+        random = Random(0)
+        xs = [random.random() * WIDTH for _ in range(count)]
+        ys = [random.random() * HEIGHT for _ in range(count)]
+        queries = range(QUERIES)
+
+        start = time.perf_counter()
+        expected = [brute_force_radius(xs, ys, xs[i], ys[i], RADIUS) for i in queries]
+        brute_radius_time = time.perf_counter() - start
+        start = time.perf_counter()
+        expected_nearest = [
+            brute_force_nearest(xs, ys, xs[i], ys[i], 5) for i in queries
+        ]
+        brute_nearest_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        spatial_hash = SpatialHash(WIDTH, HEIGHT, RADIUS)
+        spatial_hash.rebuild(range(count), xs, ys)
+        rebuild_time = time.perf_counter() - start
+        start = time.perf_counter()
+        found = [spatial_hash.query_radius(xs[i], ys[i], RADIUS) for i in queries]
+        radius_time = time.perf_counter() - start
+        start = time.perf_counter()
+        nearest = [spatial_hash.nearest(xs[i], ys[i], 5) for i in queries]
+        nearest_time = time.perf_counter() - start
+
+        assert [sorted(ids) for ids in found] == expected
+        assert [ids[0] for ids in nearest] == [ids[0] for ids in expected_nearest]
+        print(
+            f"{count} entities, {QUERIES} queries: "
+            f"radius brute force {brute_radius_time * 1000:.1f}ms | hash {radius_time * 1000:.1f}ms, "
+            f"5-nearest brute force {brute_nearest_time * 1000:.1f}ms | hash {nearest_time * 1000:.1f}ms, "
+            f"rebuild {rebuild_time * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Compares handing bots a read-only view of the state to handing them a deep copy.
+
+Run with ``python benchmarks/bench_views.py``.
+"""
+
+import copy
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from code_battles.views import ViewScope, read_only
+
+
+class Unit:
+    def __init__(self, index: int):
+        self.index = index
+        self.x = float(index)
+        self.y = float(index * 2)
+        self.health = 100
+        self.orders = [index, index + 1]
+
+
+class State:
+    def __init__(self, unit_count: int):
+        self.units = [Unit(i) for i in range(unit_count)]
+        self.scores = {"red": 0, "blue": 0}
+
+
+def main():
+    for unit_count in [100, 1000, 10000]:
+        state = State(unit_count)
+        repeats = max(1, 10000 // unit_count)
+
+        deepcopy_time = (
+            timeit.timeit(lambda: copy.deepcopy(state), number=repeats) / repeats
+        )
+        view_time = (
+            timeit.timeit(lambda: read_only(state, ViewScope()), number=repeats)
+            / repeats
+        )
+
+        def read_all():
+            view = read_only(state, ViewScope())
+            return sum(unit.x for unit in view.units)
+
+        read_time = timeit.timeit(read_all, number=repeats) / repeats
+
+        print(
+            f"{unit_count:>6} units: deepcopy {deepcopy_time * 1000:8.3f}ms | "
+            f"view {view_time * 1000:8.4f}ms | view + reading every unit {read_time * 1000:8.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+"""An index of simulation files, which can be searched by their metadata without loading them."""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import codecs
+import json
+import os
+import sqlite3
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS simulations (
+    path TEXT PRIMARY KEY,
+    modified REAL NOT NULL,
+    size INTEGER NOT NULL,
+    game TEXT,
+    version TEXT,
+    seed TEXT,
+    map TEXT,
+    parameters TEXT,
+    timestamp TEXT,
+    winner TEXT,
+    steps INTEGER,
+    statistics TEXT
+);
+CREATE TABLE IF NOT EXISTS players (
+    path TEXT NOT NULL REFERENCES simulations (path) ON DELETE CASCADE,
+    player_index INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    place INTEGER,
+    PRIMARY KEY (path, player_index)
+);
+CREATE INDEX IF NOT EXISTS players_name ON players (name);
+CREATE INDEX IF NOT EXISTS simulations_map ON simulations (map);
+"""
+
+_BODY_KEYS = {"logLines", "logIndex", "logs", "alerts", "decisions"}
+_CHUNK_SIZE = 1 << 16
+
+
+def read_header(path: str) -> Dict[str, Any]:
+    """
+    Returns the keys of the given simulation file which come before its logs and decisions (the parameters, player names,
+    game, version, timestamp, seed and results), decompressing only as much of the file as needed.
+
+    Simulation files from before the header was placed first don't contain the seed and results in their header.
+    """
+
+    decompressor = zlib.decompressobj(wbits=31)
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    decoder = json.JSONDecoder()
+    text = ""
+    pending = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(_CHUNK_SIZE)
+            data = pending + chunk.strip()
+            cut = len(data) - len(data) % 4 if chunk else len(data)
+            pending = data[cut:]
+            text += text_decoder.decode(
+                decompressor.decompress(base64.b64decode(data[:cut]))
+            )
+
+            header = _parse_header(decoder, text)
+            if header is not None:
+                return header
+            if not chunk:
+                raise ValueError(f"{path} is not a valid simulation file.")
+
+
+def _parse_header(decoder: json.JSONDecoder, text: str) -> Optional[Dict[str, Any]]:
+    """Parses the keys of the JSON object at the start of ``text`` up to the first key of the body, or returns ``None`` if more text is needed."""
+
+    header: Dict[str, Any] = {}
+    try:
+        index = _skip_whitespace(text, 0)
+        if text[index] != "{":
+            raise ValueError("Simulation files must contain a JSON object.")
+        index += 1
+        while True:
+            index = _skip_whitespace(text, index)
+            if text[index] == "}":
+                return header
+
+            key, index = decoder.raw_decode(text, index)
+            if key in _BODY_KEYS:
+                return header
+            index = _skip_whitespace(text, index)
+            if text[index] != ":":
+                raise ValueError("Invalid simulation file.")
+            value, index = decoder.raw_decode(text, _skip_whitespace(text, index + 1))
+            index = _skip_whitespace(text, index)
+            # A value must be followed by a separator, otherwise it may have been cut in the middle (for instance, a number).
+            if text[index] == ",":
+                index += 1
+            elif text[index] != "}":
+                raise ValueError("Invalid simulation file.")
+            header[key] = value
+    except (IndexError, json.JSONDecodeError):
+        return None
+
+
+def _skip_whitespace(text: str, index: int) -> int:
+    while text[index] in " \t\n\r":
+        index += 1
+    return index
+
+
+class SimulationArchive:
+    """
+    A SQLite index of the metadata of simulation files, which can be updated incrementally and queried for matching files.
+
+    Only files which were added or changed since the last update are read, and only their header is decompressed.
+    The winner, steps and statistics are available for simulation files which were saved after the simulation ended.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    def update(self, directory: str) -> int:
+        """Indexes the new and changed simulation (``.btl``) files in the given directory (recursively), forgets deleted files, and returns the amount of indexed files."""
+
+        directory = os.path.abspath(directory)
+        files = {}
+        for root, _, filenames in os.walk(directory):
+            for filename in filenames:
+                if filename.endswith(".btl"):
+                    path = os.path.join(root, filename)
+                    stat = os.stat(path)
+                    files[path] = (stat.st_mtime, stat.st_size)
+
+        with self._connect() as connection:
+            known = {
+                row[0]: (row[1], row[2])
+                for row in connection.execute(
+                    "SELECT path, modified, size FROM simulations WHERE path LIKE ? ESCAPE '\\'",
+                    (_escape_like(directory + os.sep) + "%",),
+                )
+            }
+            connection.executemany(
+                "DELETE FROM simulations WHERE path = ?",
+                [(path,) for path in known if path not in files],
+            )
+
+            indexed = 0
+            for path, (modified, size) in files.items():
+                if known.get(path) == (modified, size):
+                    continue
+                try:
+                    header = self._read_metadata(path)
+                except Exception as e:
+                    print(f"Skipping {path}: {e!r}")
+                    continue
+                self._insert(connection, path, modified, size, header)
+                indexed += 1
+
+        return indexed
+
+    def query(
+        self,
+        player: Optional[str] = None,
+        players: Sequence[str] = (),
+        map: Optional[str] = None,
+        winner: Optional[str] = None,
+        game: Optional[str] = None,
+        version: Optional[str] = None,
+        min_steps: Optional[int] = None,
+        max_steps: Optional[int] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        parameters: Optional[Dict[str, str]] = None,
+    ) -> List[str]:
+        """
+        Returns the paths of the indexed simulation files matching all of the given conditions, from the oldest to the newest.
+
+        :param player: A player that took part in the simulation.
+        :param players: Players that all took part in the simulation.
+        :param since: The earliest timestamp, in ISO format.
+        :param until: The latest timestamp, in ISO format.
+        :param parameters: Parameters the simulation must have had.
+        """
+
+        conditions = []
+        arguments: List[Any] = []
+        for name in ([player] if player is not None else []) + list(players):
+            conditions.append(
+                "EXISTS (SELECT 1 FROM players WHERE players.path = simulations.path AND players.name = ?)"
+            )
+            arguments.append(name)
+        for column, operator, value in [
+            ("map", "=", map),
+            ("winner", "=", winner),
+            ("game", "=", game),
+            ("version", "=", version),
+            ("steps", ">=", min_steps),
+            ("steps", "<=", max_steps),
+            ("timestamp", ">=", since),
+            ("timestamp", "<=", until),
+        ]:
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                arguments.append(value)
+        for key, value in (parameters or {}).items():
+            conditions.append("json_extract(parameters, ?) = ?")
+            arguments.extend([f'$."{key}"', value])
+
+        with self._connect() as connection:
+            return [
+                row[0]
+                for row in connection.execute(
+                    f"SELECT path FROM simulations {'WHERE ' + ' AND '.join(conditions) if len(conditions) != 0 else ''} ORDER BY timestamp, path",
+                    arguments,
+                )
+            ]
+
+    def get_metadata(self, path: str) -> Optional[Dict[str, Any]]:
+        """Returns the indexed metadata of the given simulation file."""
+
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT game, version, seed, parameters, timestamp, winner, steps, statistics FROM simulations WHERE path = ?",
+                (os.path.abspath(path),),
+            ).fetchone()
+            if row is None:
+                return None
+            player_names = [
+                name
+                for (name,) in connection.execute(
+                    "SELECT name FROM players WHERE path = ? ORDER BY player_index",
+                    (os.path.abspath(path),),
+                )
+            ]
+
+        return {
+            "game": row[0],
+            "version": row[1],
+            "seed": None if row[2] is None else int(row[2]),
+            "parameters": json.loads(row[3]),
+            "player_names": player_names,
+            "timestamp": row[4],
+            "winner": row[5],
+            "steps": row[6],
+            "statistics": None if row[7] is None else json.loads(row[7]),
+        }
+
+    @staticmethod
+    def _read_metadata(path: str) -> Dict[str, Any]:
+        header = read_header(path)
+        if "seed" not in header:
+            # Older simulation files keep the seed at their end.
+            from code_battles.battles import Simulation
+
+            with open(path, "r") as f:
+                simulation = Simulation.load(f.read())
+            header["seed"] = simulation.seed
+
+        return header
+
+    @staticmethod
+    def _insert(
+        connection: sqlite3.Connection,
+        path: str,
+        modified: float,
+        size: int,
+        header: Dict[str, Any],
+    ):
+        parameters = header.get("parameters", {"map": header.get("map", "")})
+        results = header.get("results") or {}
+        places = results.get("places", [])
+        connection.execute("DELETE FROM simulations WHERE path = ?", (path,))
+        connection.execute(
+            "INSERT INTO simulations (path, modified, size, game, version, seed, map, parameters, timestamp, winner, steps, statistics) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                path,
+                modified,
+                size,
+                header.get("game"),
+                header.get("version"),
+                None if header.get("seed") is None else str(header["seed"]),
+                parameters.get("map"),
+                json.dumps(parameters),
+                header.get("timestamp"),
+                results.get("winner"),
+                results.get("steps"),
+                json.dumps(results["statistics"]) if "statistics" in results else None,
+            ),
+        )
+        connection.executemany(
+            "INSERT INTO players (path, player_index, name, place) VALUES (?, ?, ?, ?)",
+            [
+                (
+                    path,
+                    player_index,
+                    name,
+                    places.index(player_index) if player_index in places else None,
+                )
+                for player_index, name in enumerate(header.get("playerNames", []))
+            ],
+        )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=60)
+        connection.execute("PRAGMA foreign_keys = ON")
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def main(arguments: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m code_battles.archive",
+        description="Index simulation files and search them by their metadata.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    update_parser = subparsers.add_parser(
+        "update", help="Index the new and changed simulation files of a directory."
+    )
+    update_parser.add_argument("database")
+    update_parser.add_argument("directory")
+    query_parser = subparsers.add_parser(
+        "query", help="Print the paths of the matching simulation files."
+    )
+    query_parser.add_argument("database")
+    query_parser.add_argument(
+        "--player", action="append", default=[], help="May be given multiple times."
+    )
+    query_parser.add_argument("--map")
+    query_parser.add_argument("--winner")
+    query_parser.add_argument("--game")
+    query_parser.add_argument("--version")
+    query_parser.add_argument("--min-steps", type=int)
+    query_parser.add_argument("--max-steps", type=int)
+    query_parser.add_argument("--since")
+    query_parser.add_argument("--until")
+    query_parser.add_argument(
+        "--parameter",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="May be given multiple times.",
+    )
+    args = parser.parse_args(arguments)
+    parameters = {}
+    for parameter in getattr(args, "parameter", []):
+        if "=" not in parameter:
+            parser.error(f"--parameter must be KEY=VALUE, got '{parameter}'.")
+        key, value = parameter.split("=", 1)
+        parameters[key] = value
+
+    archive = SimulationArchive(args.database)
+    if args.command == "update":
+        print(f"Indexed {archive.update(args.directory)} simulation files.")
+    else:
+        for path in archive.query(
+            players=args.player,
+            map=args.map,
+            winner=args.winner,
+            game=args.game,
+            version=args.version,
+            min_steps=args.min_steps,
+            max_steps=args.max_steps,
+            since=args.since,
+            until=args.until,
+            parameters=parameters,
+        ):
+            print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,27 +2,40 @@
 
 from __future__ import annotations
 
-import asyncio
-import base64
-import datetime
-import gzip
-import json
 import math
 import sys
 import time
-import traceback
 import typing
-from contextlib import contextmanager
-from dataclasses import dataclass
+from collections import deque
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, field
+from functools import partial
 from random import Random
-from typing import Any, Dict, Generic, List, Optional, Set, Tuple, TypeVar, Union
-from urllib.parse import quote
+from types import CodeType
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Sequence,
+    TypeVar,
+    Union,
+)
 
+from code_battles.compression import DecisionCompressor, DecisionLog
+from code_battles.logs import IndexedLogs, LogSink, LogText, StepBuffer
+from code_battles.memory import MemoryProfiler, bot_filename, is_bot_filename
+from code_battles.timing import BotTimings
 from code_battles.utilities import (
     GameCanvas,
-    console_log,
+    console_log_batch,
     download_image,
-    is_web,
+    is_web_or_worker,
     is_worker,
     navigate,
     set_results,
@@ -36,10 +49,21 @@ try:
 except Exception:
     pass
 
+if typing.TYPE_CHECKING:
+    import asyncio
+    import datetime
+
+    from code_battles.processes import BotProcesses
+    from code_battles.threads import BotThreads
+    from code_battles.views import ViewScope
+
 GameStateType = TypeVar("GameStateType")
 APIImplementationType = TypeVar("APIImplementationType")
 APIType = TypeVar("APIType")
 PlayerRequestsType = TypeVar("PlayerRequestsType")
+T = TypeVar("T")
+
+_COMPILED_BOTS_LIMIT = 64
 
 
 @dataclass
@@ -49,28 +73,56 @@ class Simulation:
     game: str
     version: str
     timestamp: datetime.datetime
-    logs: list
-    alerts: list
-    decisions: List[bytes]
+    logs: Union[Sequence[List[Dict[str, Any]]], IndexedLogs]
+    """The log entries of each step. Loaded simulations have :class:`code_battles.logs.IndexedLogs`, which can be queried with :func:`query_logs`."""
+    alerts: Sequence[Any]
+    decisions: Sequence[bytes]
     seed: int
+    results: Optional[Dict[str, Any]] = None
+    """The outcome of the simulation (``places``, ``winner``, ``steps``, ``statistics`` and ``errors``), if it was over when it was saved."""
+
+    def query_logs(
+        self, player_index: Optional[int] = None, start=0, end: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the log entries of the given steps (from ``start`` up to, but not including, ``end``), optionally only of the given player (-1 for the game's entries).
+
+        Only the returned entries are decoded.
+        """
+
+        if not isinstance(self.logs, IndexedLogs):
+            self.logs = IndexedLogs.from_steps(self.logs)
+
+        return self.logs.query(player_index, start, end)
 
     def dump(self):
+        import base64
+        import gzip
+        import json
+
+        logs = (
+            self.logs
+            if isinstance(self.logs, IndexedLogs)
+            else IndexedLogs.from_steps(self.logs)
+        )
         return base64.b64encode(
             gzip.compress(
                 json.dumps(
                     {
+                        # The header comes first, so it can be read without decompressing the rest of the file.
                         "parameters": self.parameters,
                         "playerNames": self.player_names,
                         "game": self.game,
                         "version": self.version,
                         "timestamp": self.timestamp.isoformat(),
-                        "logs": self.logs,
-                        "alerts": self.alerts,
+                        "seed": self.seed,
+                        "results": self.results,
+                        **logs.dump(),
+                        "alerts": list(self.alerts),
                         "decisions": [
                             base64.b64encode(decision).decode()
                             for decision in self.decisions
                         ],
-                        "seed": self.seed,
                     }
                 ).encode()
             )
@@ -78,6 +130,11 @@ class Simulation:
 
     @staticmethod
     def load(file: str):
+        import base64
+        import datetime
+        import gzip
+        import json
+
         contents: Dict[str, Any] = json.loads(gzip.decompress(base64.b64decode(file)))
         return Simulation(
             contents["parameters"]
@@ -87,13 +144,29 @@ class Simulation:
             contents["game"],
             contents["version"],
             datetime.datetime.fromisoformat(contents["timestamp"]),
-            contents["logs"],
+            IndexedLogs.load(contents),
             contents["alerts"],
             [base64.b64decode(decision) for decision in contents["decisions"]],
             contents["seed"],
+            contents.get("results"),
         )
 
 
+@dataclass
+class SimulationResult:
+    """The outcome of a single simulation that ran without UI."""
+
+    parameters: Dict[str, str]
+    player_names: List[str]
+    seed: int
+    places: List[int]
+    """The player indices, ordered from the winner to the first eliminated player."""
+    steps: int
+    statistics: Dict[str, Union[int, float]]
+    errors: List[int] = field(default_factory=list)
+    """The amount of exceptions raised by each player's bot."""
+
+
 class CodeBattles(
     Generic[GameStateType, APIImplementationType, APIType, PlayerRequestsType]
 ):
@@ -144,14 +217,26 @@ class CodeBattles(
     """The current step of the simulation. Automatically increments after each :func:`apply_decisions`."""
     active_players: List[int]
     """A list of the currently active player indices."""
+    memory_profiler: Optional[MemoryProfiler] = None
+    """The memory measurements of the players' bots in the current simulation, if enabled by :func:`configure_memory_profiling`."""
 
     _player_globals: List[Dict[str, Any]]
     _initialized: bool
     _eliminated: List[int]
     _sounds: Dict[str, "js.Audio"] = {}
-    _decisions: List[bytes]
+    _decisions: DecisionLog
     _breakpoints: Set[int]
     _since_last_render: int
+    _bot_runner: Optional[Union["BotProcesses", "BotThreads"]] = None
+    _view_scope: Optional["ViewScope"] = None
+    _forked = False
+    _collect_alerts = False
+    _bot_errors: Dict[Tuple[int, type, Tuple[int, ...]], int]
+    _error_counts: List[int]
+    _log_sink: LogSink
+    _decisions_random: Random
+    _bot_timings: BotTimings
+    _compiled_bots: Dict[Tuple[str, int], CodeType] = {}
 
     def render(self) -> None:
         """
@@ -228,6 +313,7 @@ class CodeBattles(
         Returns an implementation for the API's Context class, which provides users with access to their corresponding element in :attr:`player_requests`.
 
         You should also provide the API implementation with the state, but think about it as read-only.
+        To enforce this without copying the state, hand bots the result of :func:`read_only` (for example ``self.game.read_only(self.game.state.units)``).
 
         Should perform checking.
         """
@@ -248,10 +334,26 @@ class CodeBattles(
         Optional method to return statistics, called after the game ends.
 
         When running multiple no UI simulations, you can use this to view the simulations in a table.
+
+        The results also include the timing of each player's bot methods which ran through :func:`run_bot_method`:
+        ``player_N_METHOD_calls``, ``_total_ms``, ``_p50_ms``, ``_p95_ms`` and ``_max_ms`` (for example ``player_1_run_p95_ms``).
+        Statistics returned here take precedence over them.
         """
 
         return {}
 
+    def fork_state(self, state: GameStateType) -> GameStateType:
+        """
+        Optional method to copy the state for :func:`fork`. By default, this is a deep copy.
+
+        Override this to share the parts of the state which :func:`apply_decisions` never modifies in place (for example, the map's terrain),
+        and to copy only the rest, so forking large states is cheap.
+        """
+
+        import copy
+
+        return copy.deepcopy(state)
+
     def configure_extra_width(self) -> int:
         """Optionally add extra height to the right of the boards. 0 by default."""
 
@@ -319,12 +421,89 @@ class CodeBattles(
             "random": self.player_randoms[player_index],
         }
 
+    def configure_bot_execution(self) -> str:
+        """
+        How :func:`run_bot_methods` runs the bots of multiple players. ``"sequential"`` by default.
+
+        - ``"sequential"`` runs the bots one after the other.
+        - ``"process"`` runs each player's bot in its own persistent process, so the bots run in parallel.
+          This is only available for local simulations on platforms which support forking, and falls back to ``"sequential"`` otherwise.
+          The state and player requests must be picklable, and the API implementation should access them through the game rather than keeping its own references.
+        - ``"thread"`` runs the bots of each :func:`run_bot_methods` call in parallel threads, without copying anything between processes.
+          This is only available on interpreters without a global interpreter lock (such as free-threaded CPython 3.13 builds), and falls back to ``"sequential"`` otherwise.
+          While the bots run, the API implementation must only modify its own player's requests.
+
+        The results are identical in all modes, since each bot keeps its own random generator from :attr:`player_randoms`.
+        """
+
+        return "sequential"
+
+    def configure_log_limit(self) -> Optional[int]:
+        """
+        The maximum amount of log entries each player can log in a single step. 100 by default, or ``None`` for no limit.
+
+        Further entries of the player in the step are dropped (without being formatted) and replaced by a single "N messages suppressed" entry.
+        """
+
+        return 100
+
+    def configure_decision_compressor(self) -> Optional[DecisionCompressor]:
+        """
+        How the decisions of each step are compressed in memory and between the web worker and the main thread. ``None`` (no compression) by default.
+
+        Each step can be compressed against the steps before it, using a built-in compressor from :mod:`code_battles.compression`
+        (:class:`code_battles.compression.XorDeltaCompressor` for fixed-layout decisions,
+        :class:`code_battles.compression.ZlibStreamCompressor` for decisions which repeat earlier byte strings)
+        or your own :class:`code_battles.compression.DecisionCompressor`.
+        This method is called for each simulation, so return a new compressor every time.
+
+        The decisions passed to :func:`apply_decisions` and stored in simulation files are unaffected.
+        """
+
+        return None
+
+    def configure_memory_profiling(self) -> Optional[MemoryProfiler]:
+        """
+        Whether to measure the memory each player's bot holds, and optionally limit it. ``None`` (no profiling) by default.
+
+        Return a :class:`code_battles.memory.MemoryProfiler` (for example ``MemoryProfiler(interval=10, limit=256 * 2**20, policy="stop")``)
+        to measure the bots every few steps, after :func:`make_decisions`. The measurements are available in :attr:`memory_profiler`,
+        and local simulations print a report of each bot's top allocation sites to the standard error once they are over.
+        This method is called for each simulation, so return a new profiler every time.
+
+        To eliminate players which exceed the limit, check :attr:`code_battles.memory.MemoryProfiler.exceeded` in :func:`make_decisions`
+        and include the elimination in the decisions, so it is replayed identically.
+        """
+
+        return None
+
+    def configure_lookahead_steps(self) -> Optional[int]:
+        """
+        How many steps the web worker may simulate ahead of the step shown in the UI before it waits. 1000 by default, or ``None`` for no limit.
+
+        The steps which were already shown are kept compressed for downloading the simulation file,
+        so the memory a long simulation takes mostly depends on the steps the worker is ahead.
+        """
+
+        return 1000
+
+    def configure_lookahead_bytes(self) -> Optional[int]:
+        """
+        How many bytes of decisions, logs and alerts the web worker may send ahead of the step shown in the UI before it waits. ``None`` (no limit) by default.
+
+        Useful for games whose steps vary a lot in size, together with :func:`configure_lookahead_steps`.
+        """
+
+        return None
+
     def configure_version(self) -> str:
         """Configure the version of the game, which is stored in the simulation files."""
         return "1.0.0"
 
     @web_only
     def download_image(self, url: str) -> "asyncio.Future[js.Image]":
+        import asyncio
+
         from js import Image
 
         result = asyncio.Future[Image]()
@@ -341,6 +520,8 @@ class CodeBattles(
         :param sources: A list of ``(image_name, image_url)`` to download.
         :returns: A future which can be ``await``'d containing a dictionary mapping each ``image_name`` to its loaded image.
         """
+        import asyncio
+
         from js import Image
 
         remaining_images: List[str] = []
@@ -389,6 +570,7 @@ class CodeBattles(
         Runs the specified method of the given player and returns the time it took (in seconds).
 
         Upon exception, shows an alert (does not terminate the bot).
+        Repeated exceptions (of the same type, from the same lines of the bot) are only counted, with an alert after 10, 100, 1000, ... repetitions.
         """
         start = time.time()
 
@@ -399,29 +581,114 @@ class CodeBattles(
                 f"if player_api is not None: player_api.{method_name}()",
                 self._player_globals[player_index],
             )
-        except Exception:
-            lines = traceback.format_exc().splitlines()
-            string_file_indices: List[int] = []
-            for i, line in enumerate(lines):
-                if "<string>" in line:
-                    string_file_indices.append(i)
-            output = lines[0] + "\n"
-            for i in string_file_indices:
-                output += (
-                    lines[i].strip().replace('File "<string>", line', "Line") + "\n"
-                )
-            output += lines[string_file_indices[-1] + 1].strip() + "\n"
-
-            self.alert(
-                f"Code Exception in 'Player {player_index + 1}' API!",
-                output,
-                "red",
-                "fa-solid fa-exclamation",
-            )
+        except Exception as e:
+            self._report_bot_exception(player_index, e)
 
         end = time.time()
+        self._bot_timings.add(player_index, method_name, end - start)
         return end - start
 
+    def run_bot_methods(
+        self, method_name: str, player_indices: Optional[List[int]] = None
+    ) -> List[float]:
+        """
+        Runs the specified method of each of the given players (all of the active players by default)
+        and returns the time each of them took (in seconds).
+
+        Depending on :func:`configure_bot_execution`, the bots may run in parallel.
+        """
+
+        if player_indices is None:
+            player_indices = list(self.active_players)
+
+        if self._bot_runner is None:
+            self._bot_runner = self._create_bot_runner()
+
+        if self._bot_runner is not None:
+            return self._bot_runner.run(method_name, player_indices)
+
+        return [
+            self.run_bot_method(player_index, method_name)
+            for player_index in player_indices
+        ]
+
+    def read_only(self, value: T) -> T:
+        """
+        Returns a read-only view of the given value (for example, a part of :attr:`state`) which can be handed to bots.
+
+        Creating a view is cheap regardless of the value's size, and any attempt to modify the view raises a :class:`code_battles.views.ReadOnlyError`.
+        Views are invalidated once the current :func:`make_decisions` is over, so bots can't keep them between steps.
+        """
+
+        from code_battles.views import ViewScope, read_only
+
+        if self._view_scope is None or not self._view_scope.valid:
+            self._view_scope = ViewScope()
+
+        return read_only(value, self._view_scope)
+
+    def fork(
+        self,
+    ) -> (
+        "CodeBattles[GameStateType, APIImplementationType, APIType, PlayerRequestsType]"
+    ):
+        """
+        Returns an independent copy of the current simulation, which can be advanced with :func:`advance` without affecting this simulation.
+        Useful for lookahead by game-side AI opponents, or for trying alternative decisions from the current step in analysis tools.
+
+        The copy gets its own :attr:`state` (from :func:`fork_state`), player requests, active players and random generators,
+        where the random generators continue from the same position as this simulation's.
+        Everything that doesn't change during a simulation (such as the parameters and the canvas) and the decisions made so far are shared,
+        and logs and alerts of the copy are collected in the copy instead of being shown.
+
+        .. warning::
+           The players' bots are not copied, so :func:`run_bot_method` does nothing in a fork.
+           Fork before running the bots, or replay the decisions you want with :func:`advance`.
+        """
+
+        import copy
+
+        fork = copy.copy(self)
+        fork._forked = True
+        fork.verbose = False
+        fork._bot_runner = None
+        fork.memory_profiler = None
+        fork._bot_timings = BotTimings()
+        fork._view_scope = None
+        fork._logs = []
+        fork._log_sink = LogSink(self._log_sink.limit)
+        fork._alerts = []
+        fork._decisions = self._decisions.copy()
+        fork._breakpoints = set()
+        fork._eliminated = list(self._eliminated)
+        fork._player_globals = [{"player_api": None} for _ in self.player_names]
+        fork.active_players = list(self.active_players)
+        fork.state = self.fork_state(self.state)
+        fork.player_requests = copy.deepcopy(self.player_requests)
+        fork.random = self._copy_random(getattr(self, "random", self._decisions_random))
+        fork.make_decisions_random = self._copy_random(self.make_decisions_random)
+        fork.player_randoms = [self._copy_random(r) for r in self.player_randoms]
+        return fork
+
+    def advance(self, decisions: Optional[bytes] = None) -> bytes:
+        """
+        Advances the simulation by a single step and returns the step's decisions.
+
+        If ``decisions`` aren't given, they are made by :func:`make_decisions`. Intended for simulations returned by :func:`fork`.
+        """
+
+        if decisions is None:
+            decisions = self._make_decisions()
+        self._decisions.append(decisions)
+        # As in simulations, entries logged while applying decisions are dropped.
+        self._log_sink.enabled = False
+        self.apply_decisions(decisions)
+        self._log_sink.enabled = True
+        if not self.over:
+            self.step += 1
+
+        return decisions
+
     def eliminate_player(self, player_index: int, reason=""):
         """Eliminate the specified player for the specified reason from the simulation."""
 
@@ -443,26 +710,23 @@ class CodeBattles(
             "white",
         )
 
-    def log(self, text: str, player_index: Optional[int] = None, color="white"):
+    def log(
+        self,
+        text: LogText,
+        player_index: Optional[int] = None,
+        color="white",
+        args: Tuple[Any, ...] = (),
+    ):
         """
         Logs the given entry with the given color.
 
         For game-global log entries (not coming from a specific player), don't specify a ``player_index``.
+
+        The text is only formatted if the entry is kept (see :func:`configure_log_limit`), so instead of formatting it yourself
+        you can pass the values separately (``self.log("Moved to %s", player_index, args=(position,))``) or pass a function which returns the text.
         """
-        if not isinstance(text, str):
-            text = str(text)
 
-        if is_web():
-            console_log(-1 if player_index is None else player_index, text, color)
-        else:
-            self._logs.append(
-                {
-                    "step": self.step,
-                    "text": text,
-                    "player_index": player_index,
-                    "color": color,
-                }
-            )
+        self._log_sink.add(self.step, text, player_index, color, args)
 
     def alert(
         self,
@@ -477,7 +741,7 @@ class CodeBattles(
         Displays the given alert in the game UI.
         """
 
-        if is_worker():
+        if is_worker() or self._forked or self._collect_alerts:
             self._alerts.append(
                 {
                     "title": title,
@@ -498,6 +762,8 @@ class CodeBattles(
 
         If ``force`` is set, will play the sound even if the simulation is not :attr:`verbose`.
         """
+        import asyncio
+
         from js import Audio, window
 
         if not force and not self.verbose:
@@ -541,14 +807,100 @@ class CodeBattles(
         return len(self.active_players) <= 1
 
     def _make_decisions(self):
-        r = self.random
+        self._decisions_random = self.random
         del self.random
 
         result = self.make_decisions()
-
-        self.random = r
+        self._invalidate_views()
+        if (
+            self.memory_profiler is not None
+            and self.step % self.memory_profiler.interval == 0
+        ):
+            self._measure_memory(self.memory_profiler)
+
+        self.random = self._decisions_random
         return result
 
+    def _measure_memory(self, profiler: MemoryProfiler):
+        for player_index in profiler.measure(self.step):
+            size = profiler.size(player_index) / 2**20
+            limit = (profiler.limit or 0) / 2**20
+            sites = profiler.top_sites[player_index]
+            self.alert(
+                f"Memory Limit Exceeded in 'Player {player_index + 1}' API!",
+                f"The bot holds {size:.1f} MiB, more than the limit of {limit:.1f} MiB"
+                + (f", mostly from line {sites[0].lineno}." if len(sites) != 0 else ".")
+                + (" The bot was stopped." if profiler.policy == "stop" else ""),
+                "red",
+                "fa-solid fa-memory",
+            )
+            if profiler.policy == "stop":
+                # The bot's functions refer to its globals, so clear them to free the bot's memory without waiting for the garbage collector.
+                self._player_globals[player_index].clear()
+                self._player_globals[player_index] = {"player_api": None}
+
+    def _stop_memory_profiler(self):
+        if self.memory_profiler is not None:
+            self.memory_profiler.stop()
+
+    @staticmethod
+    def _copy_random(random: Random) -> Random:
+        copied = Random()
+        copied.setstate(random.getstate())
+        return copied
+
+    def _report_bot_exception(self, player_index: int, exception: Exception):
+        bot_lines = []
+        tb = exception.__traceback__
+        while tb is not None:
+            if is_bot_filename(tb.tb_frame.f_code.co_filename):
+                bot_lines.append(tb.tb_lineno)
+            tb = tb.tb_next
+
+        # Only the first occurrence of each exception is formatted, since bots often raise the same exception every step.
+        fingerprint = (player_index, type(exception), tuple(bot_lines))
+        count = self._bot_errors.get(fingerprint, 0) + 1
+        self._bot_errors[fingerprint] = count
+        self._error_counts[player_index] += 1
+
+        if count == 1:
+            output = self._format_bot_exception(exception)
+        elif count == 10 ** (len(str(count)) - 1):
+            output = f"{type(exception).__name__} (line {bot_lines[-1] if len(bot_lines) != 0 else '?'}) repeated {count} times."
+        else:
+            return
+
+        self.alert(
+            f"Code Exception in 'Player {player_index + 1}' API!",
+            output,
+            "red",
+            "fa-solid fa-exclamation",
+        )
+
+    @staticmethod
+    def _format_bot_exception(exception: Exception) -> str:
+        """Formats the given exception with only the lines of the bot's code in the traceback."""
+
+        import re
+        import traceback
+
+        output = "Traceback (most recent call last):\n"
+        for frame in traceback.extract_tb(exception.__traceback__):
+            if is_bot_filename(frame.filename):
+                output += f"Line {frame.lineno}, in {frame.name}\n"
+        for line in traceback.format_exception_only(type(exception), exception):
+            output += (
+                re.sub(r'File "<(string|player \d+)>", line', "Line", line.strip())
+                + "\n"
+            )
+
+        return output
+
+    def _invalidate_views(self):
+        if self._view_scope is not None:
+            self._view_scope.invalidate()
+            self._view_scope = None
+
     @web_only
     def _initialize(self):
         from js import window
@@ -561,11 +913,16 @@ class CodeBattles(
     ):
         if seed is None:
             seed = Random().randint(0, 2**128)
-        self._logs: List[Any] = []
+        self._close_bot_runner()
+        self._stop_memory_profiler()
+        self._logs: Sequence[Any] = []
+        self._log_sink = LogSink(self.configure_log_limit())
         self._alerts: List[Any] = []
-        self._decisions = []
+        self._decisions = DecisionLog(self.configure_decision_compressor())
         self._breakpoints = set()
         self._decision_index = 0
+        self._lookahead_sizes: Deque[int] = deque()
+        self._lookahead_bytes = 0
         self._seed = seed
         self.step = 0
         self.active_players = list(range(len(self.player_names)))
@@ -580,6 +937,13 @@ class CodeBattles(
             for i in range(len(self.player_names))
         ]
         self._eliminated = []
+        self._bot_errors = {}
+        self._final_results: Optional[Dict[str, Any]] = None
+        self._error_counts = [0 for _ in self.player_names]
+        self._bot_timings = BotTimings()
+        self.memory_profiler = self.configure_memory_profiling()
+        if self.memory_profiler is not None:
+            self.memory_profiler.start(len(self.player_names))
         self._player_globals = self._get_initial_player_globals(player_codes)
         self._since_last_render = 1
         self._start_time = time.time()
@@ -591,6 +955,9 @@ class CodeBattles(
         player_codes_str: str,
         seed: Optional[int] = None,
     ):
+        import base64
+        import json
+
         from pyscript import sync
 
         # JS to Python
@@ -606,48 +973,178 @@ class CodeBattles(
         self.verbose = False
         self._initialize_simulation(player_codes, seed)
         while not self.over:
-            self._should_pause = False
-            self._logs = []
-            self._alerts = []
-            decisions = self._make_decisions()
-            logs = self._logs
-            alerts = self._alerts
-
-            with self._without_log():
-                self.apply_decisions(decisions)
-
-            sync.update_step(
-                base64.b64encode(decisions).decode(),
+            decisions, logs, alerts = self._simulate_step()
+            lookahead_full = sync.update_step(
+                base64.b64encode(self._decisions.encode(decisions)).decode(),
                 json.dumps(logs),
                 json.dumps(alerts),
                 "true" if self.over else "false",
                 "true" if self._should_pause else "false",
+                json.dumps(self._get_results()) if self.over else "",
             )
 
             if not self.over:
                 self.step += 1
+                # Wait for the UI to catch up, so it doesn't keep the steps it hasn't shown yet in memory.
+                while str(lookahead_full) == "true":
+                    time.sleep(0.05)
+                    lookahead_full = sync.is_lookahead_full()
+
+        self._stop_memory_profiler()
+        if self.memory_profiler is not None:
+            print(self.memory_profiler.report(self.player_names))
+
+    def _simulate_step(self) -> Tuple[bytes, List[Dict[str, Any]], List[Any]]:
+        """Makes and applies the decisions of the current step in the web worker, and returns them with the step's logs and alerts."""
+
+        self._should_pause = False
+        self._alerts = []
+        decisions = self._make_decisions()
+        logs = self._log_sink.take(self.step)
+        alerts = self._alerts
+
+        self._log_sink.enabled = False
+        self.apply_decisions(decisions)
+        self._log_sink.enabled = True
+        return decisions, logs, alerts
+
+    def _run_headless_simulation(
+        self,
+        parameters: Dict[str, str],
+        player_names: List[str],
+        player_codes: List[str],
+        seed: Optional[int] = None,
+        decisions: Optional[List[bytes]] = None,
+        record=False,
+        on_step: Optional[Callable[[], None]] = None,
+        keep_logs=True,
+        on_logs: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+        on_alerts: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> SimulationResult:
+        """
+        Runs an entire simulation in the current process, without UI.
 
-    @contextmanager
-    def _without_log(self):
-        log = getattr(self, "log")
+        The given ``decisions`` are replayed before any new decisions are made.
+        If ``record`` is set, the new decisions are stored so the simulation can be dumped with :func:`_get_simulation`.
+        If ``keep_logs`` isn't set, log entries are dropped without being formatted.
+        If ``on_logs`` is given, the log entries of each step are passed to it, and are only kept if ``record`` is set.
+        If ``on_alerts`` is given, alerts are passed to it (once after the bots are created, and then for each step) instead of being shown.
+        """
 
-        def do_nothing(*args, **kwargs):
-            pass
+        self.parameters = parameters
+        self.map = parameters.get("map", "")
+        self.player_names = player_names
+        self.background = True
+        self.console_visible = False
+        self.verbose = False
+        self._collect_alerts = on_alerts is not None
+        self._initialize_simulation(player_codes, seed)
+        if on_alerts is not None and len(self._alerts) != 0:
+            on_alerts(self._alerts)
 
-        setattr(self, "log", do_nothing)
-        yield
-        setattr(self, "log", log)
+        replayed = 0
+        all_logs = []
+        all_alerts = []
+        while not self.over:
+            if on_step is not None:
+                on_step()
+            self._log_sink.enabled = keep_logs
+            if decisions is not None and replayed < len(decisions):
+                self._log_sink.enabled = False
+                self.apply_decisions(decisions[replayed])
+                replayed += 1
+            else:
+                self._alerts = []
+                _decisions = self._make_decisions()
+                logs = self._log_sink.take(self.step)
+                if on_logs is not None:
+                    on_logs(logs)
+                all_logs.append(logs if on_logs is None or record else [])
+                if on_alerts is not None and len(self._alerts) != 0:
+                    on_alerts(self._alerts)
+                all_alerts.append(self._alerts)
+                self._alerts = []
+                if record:
+                    self._decisions.append(_decisions)
+                self._log_sink.enabled = False
+                self.apply_decisions(_decisions)
+
+            if not self.over:
+                self.step += 1
+        self._logs = all_logs
+        self._alerts = all_alerts
+        self._collect_alerts = False
+        self._close_bot_runner()
+        self._stop_memory_profiler()
+
+        return self._get_result()
+
+    def _create_bot_runner(self) -> Optional[Union[BotProcesses, BotThreads]]:
+        execution = self.configure_bot_execution()
+        if execution == "process" and not is_web_or_worker():
+            from code_battles.processes import BotProcesses, is_fork_available
+
+            if is_fork_available():
+                return BotProcesses(self)
+        if execution == "thread":
+            from code_battles.threads import BotThreads, is_free_threaded
+
+            if is_free_threaded():
+                return BotThreads(self)
+
+        return None
+
+    def _close_bot_runner(self):
+        if self._bot_runner is not None:
+            self._bot_runner.close()
+            self._bot_runner = None
+
+    def _get_result(self) -> SimulationResult:
+        return SimulationResult(
+            self.parameters,
+            self.player_names,
+            self._seed,
+            self.active_players + self._eliminated[::-1],
+            self.step,
+            self._get_statistics(),
+            list(self._error_counts),
+        )
+
+    def _get_statistics(self) -> Dict[str, Union[int, float]]:
+        return {**self._bot_timings.statistics(), **self.get_statistics()}
 
     def _run_local_simulation(self):
+        import json
+
+        from code_battles.cli import is_legacy_command, main
+
+        if not is_legacy_command(sys.argv[1:]):
+            main(self)
+            return
+
         command = sys.argv[1]
+        if command == "tournament":
+            self._run_local_tournament()
+            return
+        if command == "worker":
+            from code_battles.jobs import JobQueue, run_worker
+
+            run_worker(self, JobQueue(sys.argv[2]))
+            return
+        if command == "coordinator":
+            self._run_local_coordinator()
+            return
+        if command == "compare":
+            self._run_local_comparison()
+            return
+
         output_file = None
         decisions = []
         if command == "simulate":
             seed = None if sys.argv[2] == "None" else int(sys.argv[2])
             output_file = None if sys.argv[3] == "None" else sys.argv[3]
-            self.parameters = json.loads(sys.argv[4])
-            self.map = self.parameters.get("map")
-            self.player_names = sys.argv[5].split("-")
+            parameters = json.loads(sys.argv[4])
+            player_names = sys.argv[5].split("-")
             player_codes = []
             for filename in sys.argv[6:]:
                 with open(filename, "r") as f:
@@ -657,41 +1154,26 @@ class CodeBattles(
                 contents = f.read()
             simulation = Simulation.load(contents)
             seed = simulation.seed
-            self.parameters = simulation.parameters
-            self.map = simulation.parameters.get("map")
-            self.player_names = simulation.player_names
+            parameters = simulation.parameters
+            player_names = simulation.player_names
             decisions = simulation.decisions
             player_codes = ["" for _ in simulation.player_names]
         else:
             print(f"invalid command {sys.argv[1]}", file=sys.stderr)
             exit(-1)
-        self.background = True
-        self.console_visible = False
-        self.verbose = False
-        self._initialize_simulation(player_codes, seed)
 
-        all_logs = []
-        all_alerts = []
-        while not self.over:
-            print("__CODE_BATTLES_ADVANCE_STEP")
-            if len(decisions) != 0:
-                self.apply_decisions(decisions.pop(0))
-            else:
-                self._logs = []
-                self._alerts = []
-                _decisions = self._make_decisions()
-                all_logs.append(self._logs)
-                all_alerts.append(self._alerts)
-                self._logs = []
-                self._alerts = []
-                if output_file is not None:
-                    self._decisions.append(_decisions)
-                self.apply_decisions(_decisions)
+        self._run_headless_simulation(
+            parameters,
+            player_names,
+            player_codes,
+            seed,
+            decisions,
+            output_file is not None,
+            lambda: print("__CODE_BATTLES_ADVANCE_STEP"),
+        )
 
-            if not self.over:
-                self.step += 1
-        self._logs = all_logs
-        self._alerts = all_alerts
+        if self.memory_profiler is not None:
+            print(self.memory_profiler.report(self.player_names), file=sys.stderr)
 
         print("--- SIMULATION FINISHED ---")
         print(
@@ -714,7 +1196,162 @@ class CodeBattles(
             with open(output_file, "w") as f:
                 f.write(simulation_str)
 
+    def _run_local_tournament(self):
+        import json
+
+        from code_battles.tournament import Tournament
+
+        seed = None if sys.argv[2] == "None" else int(sys.argv[2])
+        output_file = None if sys.argv[3] == "None" else sys.argv[3]
+        settings: Dict[str, Any] = json.loads(sys.argv[4])
+        bots = {}
+        for player_name, filename in zip(sys.argv[5].split("-"), sys.argv[6:]):
+            with open(filename, "r") as f:
+                bots[player_name] = f.read()
+        parameters = settings.get("parameters", [])
+        if isinstance(parameters, dict):
+            parameters = [parameters]
+
+        run_matches = None
+        pool = None
+        if "queue" in settings:
+            from code_battles.jobs import JobQueue
+
+            run_matches = partial(JobQueue(settings["queue"]).run_matches, bots=bots)
+        elif "processes" in settings:
+            from code_battles.pool import SimulationPool
+
+            pool = SimulationPool(
+                self,
+                settings["processes"],
+                settings.get("max_matches_per_worker", 100),
+                bots,
+            )
+            run_matches = pool.run_matches
+
+        with pool if pool is not None else nullcontext():
+            tournament = Tournament(
+                self,
+                bots,
+                parameters,
+                settings.get("players_per_match", 2),
+                settings.get("pairing", "swiss"),
+                settings.get("confidence", 0.95),
+                settings.get("resolution", 80.0),
+                settings.get("max_rounds", 100),
+                seed,
+                run_matches,
+            )
+            sink = None
+            if "statistics" in settings:
+                from code_battles.results import StatisticsSink
+
+                sink = StatisticsSink(settings["statistics"])
+
+            def on_round(tournament: Tournament, results: List[SimulationResult]):
+                if sink is not None:
+                    for result in results:
+                        sink.add(result)
+                print(
+                    f"Round {tournament.round}: {tournament.matches_played} matches played, {'converged' if tournament.converged else 'not converged'}"
+                )
+
+            tournament.run(on_round)
+        if sink is not None:
+            sink.close()
+
+        info = json.dumps(tournament.get_tournament_info(settings.get("members")))
+        if output_file is not None:
+            with open(output_file, "w") as f:
+                f.write(info)
+        print("--- TOURNAMENT FINISHED ---")
+        print(info)
+
+    def _run_local_comparison(self):
+        import json
+
+        from code_battles.comparison import Comparison
+
+        seed = None if sys.argv[2] == "None" else int(sys.argv[2])
+        settings: Dict[str, Any] = json.loads(sys.argv[3])
+        codes = []
+        for filename in sys.argv[5:]:
+            with open(filename, "r") as f:
+                codes.append(f.read())
+        baseline, candidate = codes[:2]
+        opponents = dict(zip(sys.argv[4].split("-"), codes[2:]))
+        parameters = settings.get("parameters", [])
+        if isinstance(parameters, dict):
+            parameters = [parameters]
+
+        run_matches = None
+        pool = None
+        if "queue" in settings:
+            from code_battles.jobs import JobQueue
+
+            run_matches = JobQueue(settings["queue"]).run_matches
+        elif "processes" in settings:
+            from code_battles.pool import SimulationPool
+
+            pool = SimulationPool(
+                self, settings["processes"], settings.get("max_matches_per_worker", 100)
+            )
+            run_matches = pool.run_matches
+
+        with pool if pool is not None else nullcontext():
+            comparison = Comparison(
+                self,
+                baseline,
+                candidate,
+                opponents,
+                parameters,
+                settings.get("delta", 0.1),
+                settings.get("alpha", 0.05),
+                settings.get("beta", 0.05),
+                settings.get("max_pairs", 500),
+                settings.get("batch", 1),
+                settings.get("name", "Bot"),
+                seed,
+                run_matches,
+            )
+
+            def on_pair(comparison: Comparison):
+                print(
+                    f"{comparison.pairs} pairs: {comparison.wins} wins, {comparison.losses} losses, {comparison.ties} ties, LLR {comparison.log_likelihood_ratio:.2f}"
+                )
+
+            result = comparison.run(on_pair)
+        print("--- COMPARISON FINISHED ---")
+        print(json.dumps(asdict(result)))
+
+    def _run_local_coordinator(self):
+        import json
+
+        from code_battles.jobs import JobQueue, run_coordinator
+
+        queue = JobQueue(sys.argv[2])
+        if len(sys.argv) > 3:
+            with open(sys.argv[3], "r") as f:
+                jobs: List[Dict[str, Any]] = json.load(f)
+            for job in jobs:
+                player_codes = []
+                for filename in job["bots"]:
+                    with open(filename, "r") as f:
+                        player_codes.append(f.read())
+                queue.submit(
+                    job["parameters"],
+                    job["player_names"],
+                    player_codes,
+                    job.get("seed"),
+                    job.get("output_file"),
+                )
+
+        run_coordinator(queue)
+
     async def _start_simulation_from_file(self, contents: str):
+        import asyncio
+        from urllib.parse import quote
+
         from js import document
 
         try:
@@ -763,9 +1400,9 @@ class CodeBattles(
             self._initialize_simulation(
                 ["" for _ in simulation.player_names], simulation.seed
             )
-            self._decisions = simulation.decisions
+            self._decisions.extend(simulation.decisions)
             self._logs = simulation.logs
-            self._alerts = simulation.alerts
+            self._alerts = list(simulation.alerts)
             self.canvas = GameCanvas(
                 document.getElementById("simulation"),
                 self.configure_board_count(),
@@ -792,6 +1429,9 @@ class CodeBattles(
         verbose: bool,
         seed="",
     ):
+        import json
+        import traceback
+
         from js import document
         from pyscript import workers
 
@@ -815,6 +1455,9 @@ class CodeBattles(
             self.console_visible = console_visible
             self.verbose = verbose
             self._initialize_simulation(player_codes, None if seed == "" else int(seed))
+            # The steps arrive from the worker as JSON, and are compressed once they were played.
+            self._logs = StepBuffer()
+            self._alerts = StepBuffer()  # type: ignore[assignment]
 
             if not self.background:
                 self.canvas = GameCanvas(
@@ -837,6 +1480,7 @@ class CodeBattles(
 
             self._worker = await workers["worker"]
             self._worker.update_step = self._update_step
+            self._worker.is_lookahead_full = self._is_lookahead_full
             self._worker._run_webworker_simulation(
                 json.dumps(parameters),
                 json.dumps(player_names),
@@ -870,6 +1514,13 @@ class CodeBattles(
         )
 
     def _get_simulation(self):
+        import datetime
+
+        # On the web, the main thread may still be replaying when the worker's results arrive.
+        results = self._final_results
+        if results is None and self.over:
+            results = self._get_results()
+
         return Simulation(
             self.parameters,
             self.player_names,
@@ -880,8 +1531,21 @@ class CodeBattles(
             self._alerts,
             self._decisions,
             self._seed,
+            results,
         )
 
+    def _get_results(self) -> Dict[str, Any]:
+        result = self._get_result()
+        return {
+            "places": result.places,
+            "winner": self.player_names[result.places[0]]
+            if len(result.places) != 0
+            else None,
+            "steps": result.steps,
+            "statistics": result.statistics,
+            "errors": result.errors,
+        }
+
     def _update_step(
         self,
         decisions_str: str,
@@ -889,24 +1553,25 @@ class CodeBattles(
         alerts_str: str,
         is_over_str: str,
         should_pause_str: str,
-    ):
+        results_str="",
+    ) -> str:
+        import base64
+        import json
+
         from js import document, window
 
         now = time.time()
-        decisions = base64.b64decode(str(decisions_str))
-        logs: list = json.loads(str(logs_str))
-        alerts: list = json.loads(str(alerts_str))
+        frame = base64.b64decode(str(decisions_str))
+        logs = str(logs_str)
+        alerts = str(alerts_str)
         is_over = str(is_over_str) == "true"
         should_pause = str(should_pause_str) == "true"
 
-        if should_pause:
-            self._breakpoints.add(len(self._decisions))
-        self._decisions.append(decisions)
-        self._logs.append(logs)
-        self._alerts.append(alerts)
-
+        self._receive_step(frame, logs, alerts, should_pause)
         if is_over:
             try:
+                if str(results_str) != "":
+                    self._final_results = json.loads(str(results_str))
                 simulation = self._get_simulation()
                 window.simulationToDownload = simulation.dump()
                 show_download()
@@ -921,6 +1586,42 @@ class CodeBattles(
                 else f"Rendering: Frame {len(self._decisions)} ({int(now - self._start_time)}s)"
             )
 
+        return self._is_lookahead_full()
+
+    def _receive_step(self, frame: bytes, logs: str, alerts: str, should_pause: bool):
+        """Keeps a step simulated by the web worker (with its logs and alerts as JSON) until :func:`_replay_step` plays it."""
+
+        if should_pause:
+            self._breakpoints.add(len(self._decisions))
+        self._decisions.append_frame(frame)
+        typing.cast(StepBuffer, self._logs).append_json(logs)
+        typing.cast(StepBuffer, self._alerts).append_json(alerts)
+        size = len(frame) + len(logs) + len(alerts)
+        self._lookahead_sizes.append(size)
+        self._lookahead_bytes += size
+
+    def _replay_step(self):
+        """Plays the next step received from the web worker, showing its logs and alerts, and compresses the steps which were played."""
+
+        self._log_sink.extend(self._logs[self._decision_index])
+        for alert in self._alerts[self._decision_index]:
+            self.alert(**alert)
+        self.apply_decisions(self._decisions[self._decision_index])
+        self._decision_index += 1
+        if len(self._lookahead_sizes) != 0:
+            self._lookahead_bytes -= self._lookahead_sizes.popleft()
+        if isinstance(self._logs, StepBuffer):
+            self._logs.spill(self._decision_index)
+            typing.cast(StepBuffer, self._alerts).spill(self._decision_index)
+
+    def _is_lookahead_full(self) -> str:
+        steps = self.configure_lookahead_steps()
+        size = self.configure_lookahead_bytes()
+        full = (
+            steps is not None and len(self._decisions) - self._decision_index >= steps
+        ) or (size is not None and self._lookahead_bytes >= size)
+        return "true" if full else "false"
+
     def _get_initial_player_globals(self, player_codes: List[str]):
         contexts = [
             self.create_api_implementation(i) for i in range(len(self.player_names))
@@ -991,34 +1692,34 @@ class CodeBattles(
                     "class MyBot", f"class Player{index}Bot"
                 )
                 try:
-                    exec(player_code, player_globals[index])
+                    exec(self._compile_bot(player_code, index), player_globals[index])
                     exec(
                         f"player_api = Player{index}Bot(context)",
                         player_globals[index],
                     )
-                except Exception:
-                    lines = traceback.format_exc().splitlines()
-                    string_file_indices = []
-                    for i, line in enumerate(lines):
-                        if "<string>" in line:
-                            string_file_indices.append(i)
-                    output = lines[0] + "\n"
-                    for i in string_file_indices:
-                        output += (
-                            lines[i].strip().replace('File "<string>", line', "Line")
-                            + "\n"
-                        )
-                    output += lines[string_file_indices[-1] + 1].strip() + "\n"
-
+                except Exception as e:
                     self.alert(
                         f"Code Exception in 'Player {index + 1}' API!",
-                        output,
+                        self._format_bot_exception(e),
                         "red",
                         "fa-solid fa-exclamation",
                     )
 
         return player_globals
 
+    def _compile_bot(self, player_code: str, player_index: int) -> CodeType:
+        """Compiles the player's code, reusing the code object of earlier simulations with the same code (for example, other matches of a tournament)."""
+
+        key = (player_code, player_index)
+        code = self._compiled_bots.pop(key, None)
+        if code is None:
+            code = compile(player_code, bot_filename(player_index), "exec")
+        # Keep the most recently used bots last.
+        self._compiled_bots[key] = code
+        while len(self._compiled_bots) > _COMPILED_BOTS_LIMIT:
+            del self._compiled_bots[next(iter(self._compiled_bots))]
+        return code
+
     @web_only
     def _resize_canvas(self):
         if not hasattr(self, "canvas"):
@@ -1041,6 +1742,8 @@ class CodeBattles(
 
     @web_only
     async def _step(self):
+        import asyncio
+
         from js import document
 
         if not self.over:
@@ -1050,18 +1753,7 @@ class CodeBattles(
                     await asyncio.sleep(0.01)
                     continue
                 else:
-                    logs = self._logs[self._decision_index]
-                    for log in logs:
-                        console_log(
-                            -1 if log["player_index"] is None else log["player_index"],
-                            log["text"],
-                            log["color"],
-                        )
-                    alerts = self._alerts[self._decision_index]
-                    for alert in alerts:
-                        self.alert(**alert)
-                    self.apply_decisions(self._decisions[self._decision_index])
-                    self._decision_index += 1
+                    self._replay_step()
                     break
 
         if not self.over:
@@ -1074,7 +1766,10 @@ class CodeBattles(
                 self.player_names,
                 self._seed,
                 self._eliminated[::-1],
-                self.get_statistics(),
+                # The bots ran in the web worker, so their timing is only available in its results.
+                self._final_results["statistics"]
+                if self._final_results is not None
+                else self._get_statistics(),
                 self.parameters,
                 self.verbose,
             )
@@ -1100,6 +1795,14 @@ class CodeBattles(
             if self.over:
                 document.getElementById("noui-progress").style.display = "none"
 
+        self._flush_logs()
+
+    @web_only
+    def _flush_logs(self):
+        entries = self._log_sink.take(self.step)
+        if len(entries) != 0:
+            console_log_batch(entries)
+
     @web_only
     def _should_play(self):
         from js import document
@@ -1122,6 +1825,7 @@ class CodeBattles(
             self._breakpoints.remove(self.step)
             self._ensure_paused()
             self.log(f"[Battles {self.step + 1}] Pause requested!")
+            self._flush_logs()
             return False
 
         return True
@@ -1155,6 +1859,9 @@ class CodeBattles(
             return -1
 
     async def _play_pause(self):
+        import asyncio
+        import traceback
+
         await asyncio.sleep(0.05)
         while self._should_play():
             start = time.time()
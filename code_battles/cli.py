@@ -0,0 +1,320 @@
+"""
+The command line interface of local simulations, which reports JSON lines to the standard output.
+
+Every line is a JSON object with an ``event``: ``progress`` events (``step`` and ``elapsed`` seconds, at most once per ``--progress-interval``),
+an ``alert`` event for each alert (``title``, ``alert``, ``color``, ``icon``, ``limit_time`` and ``is_code``, such as a bot's exceptions),
+and a ``result`` event for each simulation (``winner_index``, ``winner``, ``places``, ``steps``, ``seed``, ``statistics`` and ``errors``).
+Log entries are written to the file given with ``--logs`` (a JSON object per line) instead of the standard output,
+and anything else printed during the simulations (for example, by the game) goes to the standard error.
+
+Games run this through :func:`code_battles.run_game`, for example ``python main.py simulate bots/a.py bots/b.py --seed 42 --parameter map=Forest``.
+The positional commands of earlier versions (such as ``python main.py simulate 42 None '{"map": "Forest"}' A-B bots/a.py bots/b.py``)
+keep printing ``__CODE_BATTLES_ADVANCE_STEP`` on every step and all of the logs at the end.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, TextIO
+
+if TYPE_CHECKING:
+    from code_battles.battles import CodeBattles, SimulationResult
+
+_LEGACY_COMMANDS = {
+    "tournament",
+    "worker",
+    "coordinator",
+    "compare",
+    "simulate-from-file",
+}
+
+
+def is_legacy_command(arguments: List[str]) -> bool:
+    """Whether the given command line arguments (without the program) are in the positional format of earlier versions."""
+
+    if len(arguments) == 0:
+        return False
+    if arguments[0] in _LEGACY_COMMANDS:
+        return True
+
+    return (
+        arguments[0] == "simulate"
+        and len(arguments) >= 5
+        and (arguments[1] == "None" or arguments[1].lstrip("-").isdigit())
+        and arguments[3].startswith("{")
+    )
+
+
+def main(battles: CodeBattles, arguments: Optional[List[str]] = None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog=os.path.basename(sys.argv[0]),
+        description="Run simulations without UI, reporting progress and results as JSON lines.",
+        epilog="The tournament, worker, coordinator, compare and simulate-from-file commands take positional arguments, as in earlier versions.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    simulate_parser = subparsers.add_parser(
+        "simulate", help="Simulate the given bots against each other."
+    )
+    simulate_parser.add_argument("bots", nargs="+", metavar="BOT")
+    simulate_parser.add_argument(
+        "--name",
+        action="append",
+        default=[],
+        help="The name of each player, in the order of the bots (the bot's filename by default). May be given multiple times.",
+    )
+    simulate_parser.add_argument("--seed", type=int)
+    simulate_parser.add_argument(
+        "--parameter",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="May be given multiple times.",
+    )
+    simulate_parser.add_argument("--output", help="Save the simulation file here.")
+
+    replay_parser = subparsers.add_parser(
+        "replay", help="Replay the decisions of a simulation file."
+    )
+    replay_parser.add_argument("simulation")
+
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help="Simulate the jobs of a JSON file one after the other (in the format of the coordinator's jobs).",
+    )
+    batch_parser.add_argument("jobs")
+    batch_parser.add_argument(
+        "--statistics",
+        help="Store the results in a .csv or .npz file (see code_battles.results).",
+    )
+
+    for subparser in [simulate_parser, replay_parser, batch_parser]:
+        subparser.add_argument(
+            "--logs", help="Write the log entries here, one JSON object per line."
+        )
+        subparser.add_argument(
+            "--progress-interval",
+            type=float,
+            default=1.0,
+            metavar="SECONDS",
+            help="The minimal time between progress events (1 second by default).",
+        )
+
+    args = parser.parse_args(arguments)
+    emit = _event_writer(sys.stdout)
+    log_file = None if args.logs is None else open(args.logs, "w")
+    try:
+        # Only events go to the standard output, so every line of it can be parsed.
+        with contextlib.redirect_stdout(sys.stderr):
+            if args.command == "simulate":
+                if len(args.name) not in (0, len(args.bots)):
+                    parser.error("--name must be given once for each bot.")
+                parameters = {}
+                for parameter in args.parameter:
+                    if "=" not in parameter:
+                        parser.error(
+                            f"--parameter must be KEY=VALUE, got '{parameter}'."
+                        )
+                    key, value = parameter.split("=", 1)
+                    parameters[key] = value
+                _simulate(
+                    battles,
+                    parameters,
+                    args.name
+                    or [
+                        os.path.splitext(os.path.basename(bot))[0] for bot in args.bots
+                    ],
+                    [_read(bot) for bot in args.bots],
+                    args.seed,
+                    args.output,
+                    log_file,
+                    args.progress_interval,
+                    emit,
+                )
+            elif args.command == "replay":
+                _replay(
+                    battles, args.simulation, log_file, args.progress_interval, emit
+                )
+            else:
+                _batch(
+                    battles,
+                    args.jobs,
+                    args.statistics,
+                    log_file,
+                    args.progress_interval,
+                    emit,
+                )
+    finally:
+        if log_file is not None:
+            log_file.close()
+
+
+def _simulate(
+    battles: CodeBattles,
+    parameters: Dict[str, str],
+    player_names: List[str],
+    player_codes: List[str],
+    seed: Optional[int],
+    output_file: Optional[str],
+    log_file: Optional[TextIO],
+    progress_interval: float,
+    emit: Callable[[Dict[str, Any]], None],
+    fields: Optional[Dict[str, Any]] = None,
+) -> SimulationResult:
+    fields = fields or {}
+    result = battles._run_headless_simulation(
+        parameters,
+        player_names,
+        player_codes,
+        seed,
+        record=output_file is not None,
+        on_step=_progress(battles, progress_interval, fields, emit),
+        keep_logs=log_file is not None or output_file is not None,
+        on_logs=None if log_file is None else _log_writer(log_file),
+        on_alerts=_alert_writer(emit, fields),
+    )
+    if output_file is not None:
+        with open(output_file, "w") as f:
+            f.write(battles._get_simulation().dump())
+    if battles.memory_profiler is not None:
+        print(battles.memory_profiler.report(player_names), file=sys.stderr)
+
+    emit({"event": "result", **fields, **_describe(result)})
+    return result
+
+
+def _replay(
+    battles: CodeBattles,
+    path: str,
+    log_file: Optional[TextIO],
+    progress_interval: float,
+    emit: Callable[[Dict[str, Any]], None],
+):
+    from code_battles.battles import Simulation
+
+    simulation = Simulation.load(_read(path))
+    if log_file is not None:
+        write = _log_writer(log_file)
+        for logs in simulation.logs:
+            write(logs)
+
+    result = battles._run_headless_simulation(
+        simulation.parameters,
+        simulation.player_names,
+        ["" for _ in simulation.player_names],
+        simulation.seed,
+        simulation.decisions,
+        on_step=_progress(battles, progress_interval, {}, emit),
+        keep_logs=False,
+        on_alerts=_alert_writer(emit, {}),
+    )
+    emit({"event": "result", **_describe(result)})
+
+
+def _batch(
+    battles: CodeBattles,
+    path: str,
+    statistics_file: Optional[str],
+    log_file: Optional[TextIO],
+    progress_interval: float,
+    emit: Callable[[Dict[str, Any]], None],
+):
+    jobs: List[Dict[str, Any]] = json.loads(_read(path))
+    sink = None
+    if statistics_file is not None:
+        from code_battles.results import StatisticsSink
+
+        sink = StatisticsSink(statistics_file)
+
+    for index, job in enumerate(jobs):
+        result = _simulate(
+            battles,
+            job["parameters"],
+            job["player_names"],
+            [_read(bot) for bot in job["bots"]],
+            job.get("seed"),
+            job.get("output_file"),
+            log_file,
+            progress_interval,
+            emit,
+            {"job": index},
+        )
+        if sink is not None:
+            sink.add(result)
+
+    if sink is not None:
+        sink.close()
+
+
+def _progress(
+    battles: CodeBattles,
+    interval: float,
+    fields: Dict[str, Any],
+    emit: Callable[[Dict[str, Any]], None],
+) -> Callable[[], None]:
+    start = time.monotonic()
+    last = start
+
+    def on_step():
+        nonlocal last
+        now = time.monotonic()
+        if now - last >= interval:
+            last = now
+            emit(
+                {
+                    "event": "progress",
+                    **fields,
+                    "step": battles.step,
+                    "elapsed": round(now - start, 3),
+                }
+            )
+
+    return on_step
+
+
+def _log_writer(log_file: TextIO) -> Callable[[List[Dict[str, Any]]], None]:
+    def write(logs: List[Dict[str, Any]]):
+        log_file.writelines(json.dumps(entry) + "\n" for entry in logs)
+
+    return write
+
+
+def _alert_writer(
+    emit: Callable[[Dict[str, Any]], None], fields: Dict[str, Any]
+) -> Callable[[List[Dict[str, Any]]], None]:
+    def write(alerts: List[Dict[str, Any]]):
+        for alert in alerts:
+            emit({"event": "alert", **fields, **alert})
+
+    return write
+
+
+def _event_writer(output: TextIO) -> Callable[[Dict[str, Any]], None]:
+    def emit(event: Dict[str, Any]):
+        print(json.dumps(event), file=output, flush=True)
+
+    return emit
+
+
+def _describe(result: SimulationResult) -> Dict[str, Any]:
+    winner = result.places[0] if len(result.places) != 0 else None
+    return {
+        "winner_index": winner,
+        "winner": None if winner is None else result.player_names[winner],
+        "places": result.places,
+        "steps": result.steps,
+        "seed": str(result.seed),
+        "statistics": result.statistics,
+        "errors": result.errors,
+    }
+
+
+def _read(path: str) -> str:
+    with open(path, "r") as f:
+        return f.read()
@@ -0,0 +1,293 @@
+"""Encoding decisions to bytes and back according to a declared schema."""
+
+from __future__ import annotations
+
+import struct
+import sys
+import zlib
+from array import array
+from typing import Any, List, Optional, Sequence, Tuple
+
+_ARRAY_FORMATS = set("bBhHiIqQfd")
+_LITTLE_ENDIAN = sys.byteorder == "little"
+_COUNT = struct.Struct("<I")
+
+
+class Field:
+    """
+    A part of a decision schema.
+
+    Fixed-size fields have a ``format`` (:mod:`struct` format characters, without a byte order),
+    so records and lists of them are packed with a single precompiled :class:`struct.Struct`.
+    """
+
+    format: Optional[str] = None
+
+    def pack(self, value: Any, parts: List[bytes]) -> None:
+        raise NotImplementedError("pack")
+
+    def unpack(self, data: memoryview, offset: int) -> Tuple[Any, int]:
+        raise NotImplementedError("unpack")
+
+    def pack_many(self, values: Sequence[Any], parts: List[bytes]) -> None:
+        """Packs the elements of a :class:`ListOf` this field."""
+
+        for value in values:
+            self.pack(value, parts)
+
+    def unpack_many(
+        self, data: memoryview, offset: int, count: int
+    ) -> Tuple[Sequence[Any], int]:
+        """Unpacks the elements of a :class:`ListOf` this field."""
+
+        result = []
+        for _ in range(count):
+            value, offset = self.unpack(data, offset)
+            result.append(value)
+        return result, offset
+
+
+class Scalar(Field):
+    """A number (or a boolean, for ``"?"``) stored with the given :mod:`struct` format character."""
+
+    format: str
+
+    def __init__(self, format: str):
+        self.format = format
+        self._struct = struct.Struct("<" + format)
+
+    def pack(self, value, parts):
+        parts.append(self._struct.pack(value))
+
+    def unpack(self, data, offset):
+        return self._struct.unpack_from(data, offset)[0], offset + self._struct.size
+
+    def pack_many(self, values, parts):
+        if self.format not in _ARRAY_FORMATS:
+            parts.append(struct.pack(f"<{len(values)}{self.format}", *values))
+            return
+
+        numbers = (
+            values
+            if isinstance(values, array) and values.typecode == self.format
+            else array(self.format, values)
+        )
+        if not _LITTLE_ENDIAN:
+            numbers = array(self.format, numbers)
+            numbers.byteswap()
+        parts.append(numbers.tobytes())
+
+    def unpack_many(self, data, offset, count):
+        end = _end(data, offset, count * self._struct.size)
+        if self.format not in _ARRAY_FORMATS:
+            return list(struct.unpack_from(f"<{count}{self.format}", data, offset)), end
+        if _LITTLE_ENDIAN:
+            return data[offset:end].cast(self.format), end
+
+        numbers = array(self.format, data[offset:end])
+        numbers.byteswap()
+        return memoryview(numbers), end
+
+    def __repr__(self):
+        return f"Scalar({self.format!r})"
+
+
+Bool = Scalar("?")
+Int8 = Scalar("b")
+UInt8 = Scalar("B")
+Int16 = Scalar("h")
+UInt16 = Scalar("H")
+Int32 = Scalar("i")
+UInt32 = Scalar("I")
+Int64 = Scalar("q")
+UInt64 = Scalar("Q")
+Float32 = Scalar("f")
+Float64 = Scalar("d")
+
+
+class Enum(Field):
+    """One of the given values (of any hashable type), stored as its index."""
+
+    def __init__(self, values: Sequence[Any]):
+        self.values = list(values)
+        self.format = next(
+            format
+            for format in "BHI"
+            if len(self.values) <= 1 << (8 * struct.calcsize(format))
+        )
+        self._index = Scalar(self.format)
+        self._indices = {value: index for index, value in enumerate(self.values)}
+
+    def pack(self, value, parts):
+        self._index.pack(self._get_index(value), parts)
+
+    def unpack(self, data, offset):
+        index, offset = self._index.unpack(data, offset)
+        return self.values[index], offset
+
+    def pack_many(self, values, parts):
+        self._index.pack_many([self._get_index(value) for value in values], parts)
+
+    def unpack_many(self, data, offset, count):
+        indices, offset = self._index.unpack_many(data, offset, count)
+        return list(map(self.values.__getitem__, indices)), offset
+
+    def _get_index(self, value) -> int:
+        try:
+            return self._indices[value]
+        except KeyError:
+            raise ValueError(f"{value!r} is not one of {self.values!r}.") from None
+
+    def __repr__(self):
+        return f"Enum({self.values!r})"
+
+
+class Record(Field):
+    """
+    Named fields in a fixed order, encoded from and decoded to a dictionary.
+    A tuple or list of the values in the order of the fields can also be encoded.
+
+    Records of numbers and booleans are packed with a single :class:`struct.Struct`, including lists of them.
+    """
+
+    def __init__(self, **fields: Field):
+        self.fields = fields
+        self._names = list(fields)
+        self._fields = list(fields.values())
+        if all(isinstance(field, Scalar) for field in self._fields):
+            self.format = "".join(field.format or "" for field in self._fields)
+            self._struct = struct.Struct("<" + self.format)
+
+    def pack(self, value, parts):
+        if self.format is not None:
+            parts.append(self._struct.pack(*self._items(value)))
+        else:
+            for field, item in zip(self._fields, self._items(value)):
+                field.pack(item, parts)
+
+    def unpack(self, data, offset):
+        if self.format is not None:
+            values = self._struct.unpack_from(data, offset)
+            return dict(zip(self._names, values)), offset + self._struct.size
+
+        result = {}
+        for name, field in zip(self._names, self._fields):
+            result[name], offset = field.unpack(data, offset)
+        return result, offset
+
+    def pack_many(self, values, parts):
+        if self.format is None:
+            return super().pack_many(values, parts)
+
+        pack = self._struct.pack
+        items = self._items
+        parts.append(b"".join([pack(*items(value)) for value in values]))
+
+    def unpack_many(self, data, offset, count):
+        if self.format is None:
+            return super().unpack_many(data, offset, count)
+
+        end = _end(data, offset, count * self._struct.size)
+        names = self._names
+        return [
+            dict(zip(names, values))
+            for values in self._struct.iter_unpack(data[offset:end])
+        ], end
+
+    def _items(self, value) -> Sequence[Any]:
+        if isinstance(value, dict):
+            return [value[name] for name in self._names]
+        if len(value) != len(self._fields):
+            raise ValueError(
+                f"Expected {len(self._fields)} values ({', '.join(self._names)}), got {len(value)}."
+            )
+        return value
+
+    def __repr__(self):
+        return f"Record({', '.join(f'{name}={field!r}' for name, field in self.fields.items())})"
+
+
+class ListOf(Field):
+    """
+    A variable-length list of the given field.
+
+    Lists of numbers are decoded to a read-only :class:`memoryview` of the decisions (without copying them),
+    which supports indexing, iteration, ``len`` and ``tolist()``. Numbers can be encoded from any sequence, or from an :class:`array.array`.
+    """
+
+    def __init__(self, item: Field):
+        self.item = item
+
+    def pack(self, value, parts):
+        parts.append(_COUNT.pack(len(value)))
+        self.item.pack_many(value, parts)
+
+    def unpack(self, data, offset):
+        count = _COUNT.unpack_from(data, offset)[0]
+        return self.item.unpack_many(data, offset + _COUNT.size, count)
+
+    def __repr__(self):
+        return f"ListOf({self.item!r})"
+
+
+def _end(data: memoryview, offset: int, size: int) -> int:
+    if offset + size > len(data):
+        raise ValueError("The decisions are truncated.")
+    return offset + size
+
+
+class DecisionCodec:
+    """
+    Encodes the decisions of a step according to a schema, for returning from :func:`code_battles.battles.CodeBattles.make_decisions`,
+    and decodes them in :func:`code_battles.battles.CodeBattles.apply_decisions`.
+
+    Encoded decisions start with a tag of the game's version and the schema,
+    so decisions of a different version (for example, from an old simulation file) raise a :class:`ValueError` instead of being misread.
+
+    For example::
+
+        DECISIONS = Record(
+            moves=ListOf(Record(unit=UInt16, x=Float32, y=Float32)),
+            orders=ListOf(Enum(["hold", "attack", "retreat"])),
+            targets=ListOf(Int32),
+        )
+
+        class MyGame(CodeBattles):
+            def __init__(self):
+                super().__init__()
+                self.codec = DecisionCodec(DECISIONS, self.configure_version())
+
+    :param version: The game's version, usually :func:`code_battles.battles.CodeBattles.configure_version`.
+    """
+
+    def __init__(self, schema: Field, version: str):
+        self.schema = schema
+        self.version = version
+        self._tag = _COUNT.pack(zlib.crc32(f"{version}\0{schema!r}".encode()))
+
+    def encode(self, decisions: Any) -> bytes:
+        parts = [self._tag]
+        self.schema.pack(decisions, parts)
+        return b"".join(parts)
+
+    def decode(self, data: bytes) -> Any:
+        """
+        Returns the decoded decisions. Lists of numbers are views of ``data``;
+        convert them with ``tolist()`` if you keep them after :func:`code_battles.battles.CodeBattles.apply_decisions`.
+        """
+
+        view = memoryview(data)
+        if view[: len(self._tag)] != self._tag:
+            raise ValueError(
+                f"The decisions were not encoded by version {self.version} of the game, or with a different schema."
+            )
+
+        try:
+            decisions, offset = self.schema.unpack(view, len(self._tag))
+        except struct.error:
+            raise ValueError("The decisions are truncated.") from None
+        if offset != len(view):
+            raise ValueError(
+                f"The decisions have {len(view) - offset} unexpected trailing bytes."
+            )
+        return decisions
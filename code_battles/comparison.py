@@ -0,0 +1,170 @@
+"""Comparing two versions of a bot on paired simulations, stopping as soon as the answer is clear."""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from random import Random
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from code_battles.tournament import Match
+
+if TYPE_CHECKING:
+    from code_battles.battles import CodeBattles, SimulationResult
+
+
+@dataclass
+class ComparisonResult:
+    """The outcome of a :class:`Comparison`."""
+
+    verdict: str
+    """``"better"`` if the candidate is better than the baseline, ``"worse"`` if it is worse, or ``"inconclusive"`` if the cap was reached first."""
+    pairs: int
+    """The amount of played pairs of simulations."""
+    wins: int
+    """The amount of pairs in which the candidate placed above the baseline."""
+    losses: int
+    """The amount of pairs in which the baseline placed above the candidate."""
+    ties: int
+    log_likelihood_ratio: float
+    simulations: int
+    saved_simulations: int
+    """The amount of simulations which were not played, compared to playing all ``max_pairs`` pairs."""
+
+
+class Comparison:
+    """
+    Compares a candidate bot to a baseline bot using a sequential probability ratio test (SPRT).
+
+    Each pair plays the baseline and the candidate in the same seat against the same opponents, with the same seed and parameters,
+    so both simulations get the same random numbers (from the :attr:`CodeBattles.random` derived from the seed) and differ only by the compared bot.
+    Pairs where one of them placed higher count as a win or loss for the candidate, and ties are ignored by the test.
+
+    The test decides between the candidate winning a pair with probability ``0.5 + delta`` (better) or ``0.5 - delta`` (worse),
+    with error rates of ``alpha`` and ``beta``, and stops as soon as either is accepted or after ``max_pairs`` pairs.
+
+    :param opponents: A mapping from each opponent's name to its code. Every simulation has the compared bot alongside all of the opponents.
+    :param parameters: The parameters of the simulations, which are used in turns (for example, one entry for each map).
+    :param batch: The amount of pairs to play before checking the test, which is useful when ``run_matches`` runs in parallel.
+    """
+
+    def __init__(
+        self,
+        battles: CodeBattles,
+        baseline: str,
+        candidate: str,
+        opponents: Dict[str, str],
+        parameters: List[Dict[str, str]],
+        delta=0.1,
+        alpha=0.05,
+        beta=0.05,
+        max_pairs=500,
+        batch=1,
+        name="Bot",
+        seed: Optional[int] = None,
+        run_matches: Optional[Callable[[List[Match]], List[SimulationResult]]] = None,
+    ):
+        if not 0 < delta < 0.5:
+            raise ValueError("delta must be between 0 and 0.5.")
+        if len(parameters) == 0:
+            raise ValueError("At least one set of parameters is required.")
+        if name in opponents:
+            raise ValueError(
+                f"The compared bot's name '{name}' is taken by an opponent."
+            )
+
+        self.battles = battles
+        self.baseline = baseline
+        self.candidate = candidate
+        self.opponents = opponents
+        self.parameters = parameters
+        self.max_pairs = max_pairs
+        self.batch = batch
+        self.name = name
+        self.wins = 0
+        self.losses = 0
+        self.ties = 0
+
+        self._win_weight = math.log((0.5 + delta) / (0.5 - delta))
+        self._loss_weight = -self._win_weight
+        self._lower_bound = math.log(beta / (1 - alpha))
+        self._upper_bound = math.log((1 - beta) / alpha)
+        self._random = Random(seed)
+        self._run_matches = run_matches or self._run_matches_locally
+
+    @property
+    def pairs(self) -> int:
+        return self.wins + self.losses + self.ties
+
+    @property
+    def log_likelihood_ratio(self) -> float:
+        return self.wins * self._win_weight + self.losses * self._loss_weight
+
+    @property
+    def verdict(self) -> str:
+        if self.log_likelihood_ratio >= self._upper_bound:
+            return "better"
+        if self.log_likelihood_ratio <= self._lower_bound:
+            return "worse"
+        return "inconclusive"
+
+    def run(
+        self, on_pair: Optional[Callable[[Comparison], None]] = None
+    ) -> ComparisonResult:
+        """Plays pairs until the test is decided or ``max_pairs`` is reached."""
+
+        while self.verdict == "inconclusive" and self.pairs < self.max_pairs:
+            self.play_pairs(min(self.batch, self.max_pairs - self.pairs))
+            if on_pair is not None:
+                on_pair(self)
+
+        return ComparisonResult(
+            self.verdict,
+            self.pairs,
+            self.wins,
+            self.losses,
+            self.ties,
+            self.log_likelihood_ratio,
+            2 * self.pairs,
+            2 * (self.max_pairs - self.pairs),
+        )
+
+    def play_pairs(self, count: int):
+        """Plays the given amount of pairs and records their outcomes."""
+
+        matches = []
+        for pair in range(self.pairs, self.pairs + count):
+            player_names = list(self.opponents)
+            player_names.insert(pair % (len(player_names) + 1), self.name)
+            parameters = self.parameters[pair % len(self.parameters)]
+            seed = self._random.randint(0, 2**128)
+            for compared in [self.baseline, self.candidate]:
+                player_codes = [
+                    compared if name == self.name else self.opponents[name]
+                    for name in player_names
+                ]
+                matches.append(Match(player_names, parameters, seed, player_codes))
+
+        results = self._run_matches(matches)
+        for baseline_result, candidate_result in zip(results[::2], results[1::2]):
+            seat = baseline_result.player_names.index(self.name)
+            baseline_place = baseline_result.places.index(seat)
+            candidate_place = candidate_result.places.index(seat)
+            if candidate_place < baseline_place:
+                self.wins += 1
+            elif candidate_place > baseline_place:
+                self.losses += 1
+            else:
+                self.ties += 1
+
+    def _run_matches_locally(self, matches: List[Match]) -> List[SimulationResult]:
+        return [
+            self.battles._run_headless_simulation(
+                match.parameters,
+                match.player_names,
+                match.player_codes or [],
+                match.seed,
+                keep_logs=False,
+            )
+            for match in matches
+        ]
@@ -0,0 +1,234 @@
+"""Compressing each step's decisions against the decisions of the previous steps."""
+
+from __future__ import annotations
+
+import zlib
+from typing import Iterable, Iterator, List, Optional, Sequence, overload
+
+# The tail of an empty stored block, which ends every flushed deflate frame.
+_SYNC_MARKER = b"\x00\x00\xff\xff"
+
+
+class DecisionCompressor:
+    """
+    Compresses the decisions of consecutive steps, where each step may be compressed using the decisions of the steps before it.
+
+    Frames are compressed and decompressed in the same order, each starting from :func:`reset`.
+    The same instance is never used to both compress and decompress: a :class:`DecisionLog` uses a :func:`copy` of it for decompression.
+    Override all methods to implement a custom codec, for instance one which knows the layout of the game's decisions.
+    """
+
+    def reset(self) -> None:
+        """Forgets the previous steps, so the next frame can be decompressed on its own."""
+
+    def compress(self, decisions: bytes) -> bytes:
+        return decisions
+
+    def decompress(self, frame: bytes) -> bytes:
+        return frame
+
+    def copy(self) -> DecisionCompressor:
+        """Returns an independent compressor in the same state."""
+
+        return self
+
+
+class XorDeltaCompressor(DecisionCompressor):
+    """
+    XORs each step's decisions with the previous step's decisions and deflates the result.
+
+    Best for fixed-layout decisions which change little between steps (for example, a record per unit),
+    since unchanged bytes become runs of zeros.
+    """
+
+    def __init__(self, level=1):
+        self.level = level
+        self._previous = b""
+
+    def reset(self):
+        self._previous = b""
+
+    def compress(self, decisions: bytes) -> bytes:
+        delta = _xor(decisions, self._previous)
+        self._previous = decisions
+        return zlib.compress(delta, self.level)
+
+    def decompress(self, frame: bytes) -> bytes:
+        decisions = _xor(zlib.decompress(frame), self._previous)
+        self._previous = decisions
+        return decisions
+
+    def copy(self) -> XorDeltaCompressor:
+        compressor = XorDeltaCompressor(self.level)
+        compressor._previous = self._previous
+        return compressor
+
+
+class ZlibStreamCompressor(DecisionCompressor):
+    """
+    Deflates all steps as a single stream which is flushed after each step,
+    so the decisions of the previous steps (up to 32KiB) act as the dictionary of each step.
+
+    Best for variable-layout decisions (such as JSON) which repeat strings from earlier steps.
+
+    :param dictionary: Initial contents of the dictionary, such as a typical step's decisions.
+    """
+
+    def __init__(self, level=6, dictionary: Optional[bytes] = None):
+        self.level = level
+        self.dictionary = dictionary
+        self.reset()
+
+    def reset(self):
+        if self.dictionary is None:
+            self._compressor = zlib.compressobj(self.level, wbits=-15)
+            self._decompressor = zlib.decompressobj(wbits=-15)
+        else:
+            self._compressor = zlib.compressobj(
+                self.level, wbits=-15, zdict=self.dictionary
+            )
+            self._decompressor = zlib.decompressobj(wbits=-15, zdict=self.dictionary)
+
+    def compress(self, decisions: bytes) -> bytes:
+        frame = self._compressor.compress(decisions) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+        # Every frame ends with the same marker, so there is no need to store it.
+        return frame[: -len(_SYNC_MARKER)]
+
+    def decompress(self, frame: bytes) -> bytes:
+        return self._decompressor.decompress(frame + _SYNC_MARKER)
+
+    def copy(self) -> ZlibStreamCompressor:
+        compressor = ZlibStreamCompressor.__new__(ZlibStreamCompressor)
+        compressor.level = self.level
+        compressor.dictionary = self.dictionary
+        compressor._compressor = self._compressor.copy()
+        compressor._decompressor = self._decompressor.copy()
+        return compressor
+
+
+def _xor(data: bytes, previous: bytes) -> bytes:
+    if len(data) == 0:
+        return b""
+    if len(previous) != len(data):
+        previous = previous[: len(data)].ljust(len(data), b"\0")
+    return (
+        int.from_bytes(data, "little") ^ int.from_bytes(previous, "little")
+    ).to_bytes(len(data), "little")
+
+
+class DecisionLog(Sequence[bytes]):
+    """
+    The decisions of each step of a simulation, kept compressed in memory by a :class:`DecisionCompressor`.
+
+    The compressor is reset every ``keyframe_interval`` steps, so reading a step only decompresses the steps since the last reset.
+    Reading the steps in order (as replays do) decompresses each step once.
+    """
+
+    def __init__(
+        self,
+        compressor: Optional[DecisionCompressor] = None,
+        decisions: Iterable[bytes] = (),
+        keyframe_interval=256,
+    ):
+        self.compressor = compressor
+        self.keyframe_interval = keyframe_interval
+        self._frames: List[bytes] = []
+        self._base: Optional[DecisionLog] = None
+        self._base_length = 0
+        self._encoder = compressor
+        self._encoded_count = 0
+        self._decoder = None if compressor is None else compressor.copy()
+        self._decoded_index = -1
+        self._decoded = b""
+        self.extend(decisions)
+
+    @property
+    def compressed_size(self) -> int:
+        return sum(len(self._frame(index)) for index in range(len(self)))
+
+    def encode(self, decisions: bytes) -> bytes:
+        """Compresses the decisions of the next step without storing them, and returns the frame (to be stored elsewhere with :func:`append_frame`)."""
+
+        if self._encoder is None:
+            return decisions
+        if self._encoded_count % self.keyframe_interval == 0:
+            self._encoder.reset()
+        self._encoded_count += 1
+        return self._encoder.compress(decisions)
+
+    def append(self, decisions: bytes):
+        self.append_frame(self.encode(decisions))
+
+    def extend(self, decisions: Iterable[bytes]):
+        for decision in decisions:
+            self.append(decision)
+
+    def append_frame(self, frame: bytes):
+        """Stores a frame which was returned by :func:`encode` of a log with the same compressor."""
+
+        self._frames.append(frame)
+
+    def copy(self) -> DecisionLog:
+        """Returns an independent log with the same decisions, which shares the frames stored so far with this log (so copying doesn't depend on their amount)."""
+
+        log = DecisionLog.__new__(DecisionLog)
+        log.compressor = self.compressor
+        log.keyframe_interval = self.keyframe_interval
+        log._frames = []
+        log._base = self
+        log._base_length = len(self)
+        log._encoder = None if self._encoder is None else self._encoder.copy()
+        log._encoded_count = self._encoded_count
+        log._decoder = None if self._decoder is None else self._decoder.copy()
+        log._decoded_index = self._decoded_index
+        log._decoded = self._decoded
+        return log
+
+    def __len__(self):
+        return self._base_length + len(self._frames)
+
+    @overload
+    def __getitem__(self, step: int) -> bytes: ...
+
+    @overload
+    def __getitem__(self, step: slice) -> List[bytes]: ...
+
+    def __getitem__(self, step):
+        if isinstance(step, slice):
+            return [self[i] for i in range(*step.indices(len(self)))]
+        if step < 0:
+            step += len(self)
+        if not 0 <= step < len(self):
+            raise IndexError(step)
+        if self._decoder is None:
+            return self._frame(step)
+        if step == self._decoded_index:
+            return self._decoded
+
+        index = self._decoded_index + 1
+        if step < index or step // self.keyframe_interval != (
+            index // self.keyframe_interval
+        ):
+            index = step - step % self.keyframe_interval
+        while index <= step:
+            if index % self.keyframe_interval == 0:
+                self._decoder.reset()
+            self._decoded = self._decoder.decompress(self._frame(index))
+            self._decoded_index = index
+            index += 1
+
+        return self._decoded
+
+    def __iter__(self) -> Iterator[bytes]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def _frame(self, index: int) -> bytes:
+        # Frames are only appended, so the frames of the logs this log was copied from never change.
+        log = self
+        while index < log._base_length:
+            assert log._base is not None
+            log = log._base
+        return log._frames[index - log._base_length]
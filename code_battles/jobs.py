@@ -0,0 +1,402 @@
+"""A simulation job queue which can be shared between multiple worker processes and hosts."""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    from code_battles.battles import CodeBattles, SimulationResult
+    from code_battles.tournament import Match
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    parameters TEXT NOT NULL,
+    player_names TEXT NOT NULL,
+    player_codes TEXT NOT NULL,
+    seed TEXT,
+    output_file TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    submitted REAL NOT NULL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+"""
+
+_MAX_VARIABLES = 500
+"""The maximum amount of bound variables in a single query, well below SQLite's limit."""
+
+
+@dataclass
+class Job:
+    """A single simulation leased from a :class:`JobQueue`."""
+
+    id: int
+    parameters: Dict[str, str]
+    player_names: List[str]
+    player_codes: List[str]
+    seed: Optional[int]
+    output_file: Optional[str]
+    """Where the worker should write the simulation file, if at all."""
+    attempts: int
+
+
+@dataclass
+class QueueProgress:
+    """A snapshot of the amount of jobs in each status of a :class:`JobQueue`."""
+
+    pending: int
+    leased: int
+    done: int
+    failed: int
+
+    @property
+    def total(self) -> int:
+        return self.pending + self.leased + self.done + self.failed
+
+    @property
+    def remaining(self) -> int:
+        return self.pending + self.leased
+
+
+class JobQueue:
+    """
+    A queue of simulation jobs, stored in a SQLite database.
+
+    The database can live on storage shared between hosts, so any amount of workers (see :func:`run_worker`) can lease jobs from it.
+    A leased job must be renewed with :func:`heartbeat` before ``lease_seconds`` pass, otherwise it is given to another worker.
+    Jobs which were leased ``max_attempts`` times without completing are marked as failed.
+
+    .. note::
+       Leases are compared with the local clock of each host, so the hosts' clocks should be synchronized.
+    """
+
+    def __init__(self, path: str, lease_seconds=60.0, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    def submit(
+        self,
+        parameters: Dict[str, str],
+        player_names: List[str],
+        player_codes: List[str],
+        seed: Optional[int] = None,
+        output_file: Optional[str] = None,
+    ) -> int:
+        """Adds a simulation to the queue and returns its job id."""
+
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "INSERT INTO jobs (parameters, player_names, player_codes, seed, output_file, submitted) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    json.dumps(parameters),
+                    json.dumps(player_names),
+                    json.dumps(player_codes),
+                    None if seed is None else str(seed),
+                    output_file,
+                    time.time(),
+                ),
+            )
+            return int(cursor.lastrowid or 0)
+
+    def lease(self, worker: str) -> Optional[Job]:
+        """Leases the next pending (or expired) job to the given worker, or returns ``None`` if there are none."""
+
+        with self._transaction() as connection:
+            now = time.time()
+            self._expire(connection, now)
+            row = connection.execute(
+                "SELECT id, parameters, player_names, player_codes, seed, output_file, attempts FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+
+            connection.execute(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                (worker, now + self.lease_seconds, row[0]),
+            )
+
+        return Job(
+            row[0],
+            json.loads(row[1]),
+            json.loads(row[2]),
+            json.loads(row[3]),
+            None if row[4] is None else int(row[4]),
+            row[5],
+            row[6] + 1,
+        )
+
+    def heartbeat(self, job_id: int, worker: str) -> bool:
+        """Renews the lease of the given job. Returns whether the worker still holds it."""
+
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time() + self.lease_seconds, job_id, worker),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker: str, result: SimulationResult) -> bool:
+        """Stores the result of the given job. Returns whether the worker still held the job."""
+
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = 'done', result = ?, finished = ?, lease_expires = NULL WHERE id = ? AND worker = ? AND status = 'leased'",
+                (
+                    json.dumps(
+                        {
+                            "places": result.places,
+                            "steps": result.steps,
+                            "statistics": result.statistics,
+                            "errors": result.errors,
+                        }
+                    ),
+                    time.time(),
+                    job_id,
+                    worker,
+                ),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker: str, error: str):
+        """Gives up on the given job after an error, or puts it back in the queue if it has attempts left."""
+
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ?, worker = NULL, lease_expires = NULL WHERE id = ? AND worker = ? AND status = 'leased'",
+                (self.max_attempts, error, job_id, worker),
+            )
+
+    def requeue_expired(self) -> int:
+        """Puts jobs whose lease expired back in the queue and returns their amount."""
+
+        with self._transaction() as connection:
+            return self._expire(connection, time.time())
+
+    def progress(self) -> QueueProgress:
+        with self._connect() as connection:
+            counts = dict(
+                connection.execute(
+                    "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+                ).fetchall()
+            )
+
+        return QueueProgress(
+            counts.get("pending", 0),
+            counts.get("leased", 0),
+            counts.get("done", 0),
+            counts.get("failed", 0),
+        )
+
+    def get_result(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Returns the result of the given job, if it is done."""
+
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT result FROM jobs WHERE id = ? AND status = 'done'", (job_id,)
+            ).fetchone()
+
+        return None if row is None else json.loads(row[0])
+
+    def wait(self, job_ids: List[int], poll_seconds=0.25) -> List[Dict[str, Any]]:
+        """Blocks until all of the given jobs are done and returns their results, while re-queueing expired leases."""
+
+        while True:
+            self.requeue_expired()
+            rows: Dict[int, str] = {}
+            with self._connect() as connection:
+                for start in range(0, len(job_ids), _MAX_VARIABLES):
+                    chunk = job_ids[start : start + _MAX_VARIABLES]
+                    rows.update(
+                        connection.execute(
+                            f"SELECT id, status FROM jobs WHERE id IN ({','.join('?' * len(chunk))})",
+                            chunk,
+                        ).fetchall()
+                    )
+            failed = [job_id for job_id in job_ids if rows.get(job_id) == "failed"]
+            if len(failed) != 0:
+                raise RuntimeError(f"Jobs {failed} failed.")
+            if all(rows.get(job_id) == "done" for job_id in job_ids):
+                return [self.get_result(job_id) or {} for job_id in job_ids]
+            time.sleep(poll_seconds)
+
+    def run_matches(
+        self, matches: List[Match], bots: Optional[Dict[str, str]] = None
+    ) -> List[SimulationResult]:
+        """
+        Runs the given matches on the queue's workers. Useful as the ``run_matches`` of a :class:`Tournament`.
+
+        :param bots: A mapping from each bot's name to its code, for matches which don't specify their players' code.
+        """
+
+        from code_battles.battles import SimulationResult
+
+        job_ids = [
+            self.submit(
+                match.parameters,
+                match.player_names,
+                match.player_codes
+                or [(bots or {})[name] for name in match.player_names],
+                match.seed,
+            )
+            for match in matches
+        ]
+
+        return [
+            SimulationResult(
+                match.parameters,
+                match.player_names,
+                match.seed,
+                result["places"],
+                result["steps"],
+                result["statistics"],
+                result.get("errors", []),
+            )
+            for match, result in zip(matches, self.wait(job_ids))
+        ]
+
+    def _expire(self, connection: sqlite3.Connection, now: float) -> int:
+        cursor = connection.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = CASE WHEN attempts >= ? THEN 'Lease expired' ELSE error END, worker = NULL, lease_expires = NULL WHERE status = 'leased' AND lease_expires < ?",
+            (self.max_attempts, self.max_attempts, now),
+        )
+        return cursor.rowcount
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+
+def run_worker(
+    battles: CodeBattles,
+    queue: JobQueue,
+    worker: Optional[str] = None,
+    poll_seconds=1.0,
+    exit_when_empty=False,
+):
+    """
+    Leases jobs from the given queue and simulates them until interrupted, renewing each lease in the background.
+
+    The simulation file of a job is written to its output file, which should be on storage shared with the coordinator.
+    The file is first written next to the output file, and only replaces it if the worker still held the job's lease when completing it,
+    so a worker whose lease expired can't overwrite the file of the worker which took the job over.
+    """
+
+    if worker is None:
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+
+    while True:
+        job = queue.lease(worker)
+        if job is None:
+            if exit_when_empty and queue.progress().remaining == 0:
+                return
+            time.sleep(poll_seconds)
+            continue
+
+        finished = threading.Event()
+        heartbeat_thread = threading.Thread(
+            target=_heartbeat, args=(queue, job.id, worker, finished), daemon=True
+        )
+        heartbeat_thread.start()
+        temporary_file = None
+        try:
+            result = battles._run_headless_simulation(
+                job.parameters,
+                job.player_names,
+                job.player_codes,
+                job.seed,
+                record=job.output_file is not None,
+                keep_logs=job.output_file is not None,
+            )
+            if job.output_file is not None:
+                temporary_file = _write_temporary(
+                    job.output_file, battles._get_simulation().dump()
+                )
+            finished.set()
+            heartbeat_thread.join()
+            if queue.complete(job.id, worker, result):
+                if temporary_file is not None and job.output_file is not None:
+                    os.replace(temporary_file, job.output_file)
+                    temporary_file = None
+            else:
+                print(f"[{worker}] Lost the lease of job {job.id}.")
+        except Exception as e:
+            finished.set()
+            heartbeat_thread.join()
+            queue.fail(job.id, worker, repr(e))
+            print(f"[{worker}] Job {job.id} failed: {e!r}")
+        finally:
+            if temporary_file is not None:
+                os.remove(temporary_file)
+
+
+def _write_temporary(path: str, contents: str) -> str:
+    """Writes the contents to a new file in the directory of the given path and returns the new file's path."""
+
+    import tempfile
+
+    descriptor, temporary_path = tempfile.mkstemp(
+        ".tmp", os.path.basename(path) + ".", os.path.dirname(path) or None
+    )
+    with os.fdopen(descriptor, "w") as f:
+        f.write(contents)
+    return temporary_path
+
+
+def _heartbeat(queue: JobQueue, job_id: int, worker: str, finished: threading.Event):
+    while not finished.wait(queue.lease_seconds / 3):
+        if not queue.heartbeat(job_id, worker):
+            return
+
+
+def run_coordinator(queue: JobQueue, poll_seconds=5.0):
+    """Re-queues expired leases and reports the throughput and ETA of the queue until all of its jobs are finished."""
+
+    start = time.time()
+    initial = queue.progress()
+    while True:
+        requeued = queue.requeue_expired()
+        progress = queue.progress()
+        elapsed = time.time() - start
+        finished = progress.done + progress.failed - initial.done - initial.failed
+        throughput = finished / elapsed if elapsed > 0 else 0
+        eta = f"{progress.remaining / throughput:.0f}s" if throughput > 0 else "unknown"
+        print(
+            f"{progress.done}/{progress.total} done, {progress.failed} failed, {progress.leased} running, {requeued} re-queued | {throughput * 60:.1f} simulations/min, ETA {eta}",
+            flush=True,
+        )
+        if progress.remaining == 0:
+            return progress
+        time.sleep(poll_seconds)
@@ -0,0 +1,303 @@
+"""Collecting log entries with lazy formatting and per-player rate limiting, and indexing them in simulation files."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    overload,
+)
+
+LogText = Union[str, Callable[[], Any], Any]
+
+
+class LogSink:
+    """
+    Collects the log entries of a simulation until they are taken (for example, at the end of each step).
+
+    Messages are only formatted if they are kept: a message can be a format string with ``args`` (formatted with ``%``),
+    or a callable which returns the message. Nothing is formatted while the sink is disabled.
+
+    Each player can log up to ``limit`` entries between takes, and the rest are replaced by a single "N messages suppressed" entry.
+    Game entries (without a player, or with a negative player index) are never limited.
+    """
+
+    __slots__ = ("enabled", "limit", "_entries", "_counts")
+
+    def __init__(self, limit: Optional[int] = None):
+        self.enabled = True
+        self.limit = limit
+        self._entries: List[Dict[str, Any]] = []
+        self._counts: Dict[int, int] = {}
+
+    def add(
+        self,
+        step: int,
+        text: LogText,
+        player_index: Optional[int] = None,
+        color="white",
+        args: Tuple[Any, ...] = (),
+    ):
+        if not self.enabled:
+            return
+
+        if self.limit is not None and player_index is not None and player_index >= 0:
+            count = self._counts.get(player_index, 0)
+            self._counts[player_index] = count + 1
+            if count >= self.limit:
+                return
+
+        if callable(text):
+            text = text()
+        if len(args) != 0:
+            text = text % args
+        if not isinstance(text, str):
+            text = str(text)
+
+        self._entries.append(
+            {"step": step, "text": text, "player_index": player_index, "color": color}
+        )
+
+    def extend(self, entries: List[Dict[str, Any]]):
+        """Adds entries which were already formatted and limited (for example, the entries of a step simulated by the web worker)."""
+
+        if self.enabled:
+            self._entries.extend(entries)
+
+    def branch(self) -> LogSink:
+        """Returns an empty sink with the same settings and counts, whose entries can be added back with :func:`merge` (for example, by another thread)."""
+
+        sink = LogSink(self.limit)
+        sink.enabled = self.enabled
+        sink._counts = dict(self._counts)
+        return sink
+
+    def merge(self, other: LogSink):
+        """Adds the entries and counts of a sink returned by :func:`branch`."""
+
+        if self.enabled:
+            self._entries.extend(other._entries)
+        for player_index, count in other._counts.items():
+            self._counts[player_index] = max(self._counts.get(player_index, 0), count)
+
+    def take(self, step: int) -> List[Dict[str, Any]]:
+        """Returns the collected entries (with an entry for each player whose messages were suppressed) and starts collecting anew."""
+
+        entries = self._entries
+        if self.limit is not None:
+            for player_index, count in self._counts.items():
+                if count > self.limit:
+                    entries.append(
+                        {
+                            "step": step,
+                            "text": f"{count - self.limit} messages suppressed",
+                            "player_index": player_index,
+                            "color": "gray",
+                        }
+                    )
+
+        self._entries = []
+        self._counts = {}
+        return entries
+
+
+class IndexedLogs(Sequence[List[Dict[str, Any]]]):
+    """
+    The log entries of a simulation, indexed by step and by player, as stored in simulation files.
+
+    Each entry is stored as its own line of JSON and is only decoded when it is accessed,
+    so a slice of the logs (for example, a single player's entries in a range of steps) can be read without decoding the rest.
+    Indexing returns the entries of a single step, like the list of steps this replaces.
+    """
+
+    def __init__(
+        self, lines: str, step_offsets: List[int], player_entries: Dict[int, List[int]]
+    ):
+        self._text = lines
+        self._lines: Optional[List[str]] = None
+        self._step_offsets = step_offsets
+        self._player_entries = player_entries
+
+    @staticmethod
+    def from_steps(steps: Sequence[List[Dict[str, Any]]]) -> IndexedLogs:
+        """Indexes the given entries of each step."""
+
+        import json
+
+        lines: List[str] = []
+        step_offsets = [0]
+        player_entries: Dict[int, List[int]] = {}
+        for entries in steps:
+            for entry in entries:
+                player_index = entry["player_index"]
+                player_entries.setdefault(
+                    -1 if player_index is None else player_index, []
+                ).append(len(lines))
+                lines.append(json.dumps(entry))
+            step_offsets.append(len(lines))
+
+        return IndexedLogs("\n".join(lines), step_offsets, player_entries)
+
+    @staticmethod
+    def load(contents: Dict[str, Any]) -> IndexedLogs:
+        """Loads the logs of the given simulation file contents, including simulation files from before logs were indexed."""
+
+        if "logs" in contents:
+            return IndexedLogs.from_steps(contents["logs"])
+
+        index = contents["logIndex"]
+        return IndexedLogs(
+            contents["logLines"],
+            index["steps"],
+            {int(player): entries for player, entries in index["players"].items()},
+        )
+
+    def dump(self) -> Dict[str, Any]:
+        """The representation of the logs in simulation files."""
+
+        return {
+            "logLines": self._text,
+            "logIndex": {
+                "steps": self._step_offsets,
+                "players": {
+                    str(player): entries
+                    for player, entries in self._player_entries.items()
+                },
+            },
+        }
+
+    @property
+    def players(self) -> List[int]:
+        """The indices of the players which have log entries, where -1 stands for the game's entries."""
+
+        return sorted(self._player_entries)
+
+    def query(
+        self, player_index: Optional[int] = None, start=0, end: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the log entries of the given steps (from ``start`` up to, but not including, ``end``).
+
+        :param player_index: Only return the entries of this player, or the game's entries for -1. By default, all entries are returned.
+        """
+
+        start = max(0, min(start, len(self)))
+        end = len(self) if end is None else max(start, min(end, len(self)))
+        first = self._step_offsets[start]
+        last = self._step_offsets[end]
+        if player_index is None:
+            return self._decode(range(first, last))
+
+        entries = self._player_entries.get(player_index, [])
+        return self._decode(
+            entries[bisect_left(entries, first) : bisect_left(entries, last)]
+        )
+
+    def __len__(self):
+        return len(self._step_offsets) - 1
+
+    @overload
+    def __getitem__(self, step: int) -> List[Dict[str, Any]]: ...
+
+    @overload
+    def __getitem__(self, step: slice) -> List[List[Dict[str, Any]]]: ...
+
+    def __getitem__(self, step):
+        if isinstance(step, slice):
+            return [self[i] for i in range(*step.indices(len(self)))]
+        if step < 0:
+            step += len(self)
+        if not 0 <= step < len(self):
+            raise IndexError(step)
+        return self.query(start=step, end=step + 1)
+
+    def _decode(self, line_indices: Iterable[int]) -> List[Dict[str, Any]]:
+        import json
+
+        if self._lines is None:
+            self._lines = self._text.split("\n")
+        lines = self._lines
+        return [json.loads(lines[i]) for i in line_indices]
+
+
+class StepBuffer(Sequence[List[Any]]):
+    """
+    The log entries (or alerts) of each step as JSON text, where the steps before :func:`spill` are compressed together in chunks of ``chunk_size`` steps.
+
+    Used by the main thread on the web, which only reads the steps once as it plays them, but keeps all of them for downloading the simulation file.
+    Reading the steps in order (as downloads do) decompresses each chunk once.
+    """
+
+    def __init__(self, chunk_size=256):
+        self.chunk_size = chunk_size
+        self._chunks: List[bytes] = []
+        self._recent: List[str] = []
+        self._chunk_index = -1
+        self._chunk: List[str] = []
+
+    @property
+    def size(self) -> int:
+        """The amount of bytes the steps take (compressed, for spilled steps)."""
+
+        return sum(len(chunk) for chunk in self._chunks) + sum(
+            len(text) for text in self._recent
+        )
+
+    def append_json(self, text: str):
+        """Adds a step, given as the JSON text of its list (which mustn't contain line breaks, like the output of :func:`json.dumps`)."""
+
+        self._recent.append(text)
+
+    def append(self, entries: Any):
+        import json
+
+        self.append_json(json.dumps(entries))
+
+    def spill(self, steps: int):
+        """Compresses the first ``steps`` steps, in whole chunks."""
+
+        import zlib
+
+        while (len(self._chunks) + 1) * self.chunk_size <= min(steps, len(self)):
+            chunk = self._recent[: self.chunk_size]
+            del self._recent[: self.chunk_size]
+            self._chunks.append(zlib.compress("\n".join(chunk).encode()))
+
+    def __len__(self):
+        return len(self._chunks) * self.chunk_size + len(self._recent)
+
+    @overload
+    def __getitem__(self, step: int) -> List[Any]: ...
+
+    @overload
+    def __getitem__(self, step: slice) -> List[List[Any]]: ...
+
+    def __getitem__(self, step):
+        import json
+
+        if isinstance(step, slice):
+            return [self[i] for i in range(*step.indices(len(self)))]
+        if step < 0:
+            step += len(self)
+        if not 0 <= step < len(self):
+            raise IndexError(step)
+
+        chunk_index, offset = divmod(step, self.chunk_size)
+        if chunk_index >= len(self._chunks):
+            return json.loads(self._recent[step - len(self._chunks) * self.chunk_size])
+        if chunk_index != self._chunk_index:
+            import zlib
+
+            self._chunk = (
+                zlib.decompress(self._chunks[chunk_index]).decode().split("\n")
+            )
+            self._chunk_index = chunk_index
+        return json.loads(self._chunk[offset])
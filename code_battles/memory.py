@@ -0,0 +1,195 @@
+"""Measuring the memory held by each player's bot, and limiting it."""
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+POLICIES = ("warn", "stop")
+
+
+def bot_filename(player_index: int) -> str:
+    """The filename of the given player's bot code, as it appears in tracebacks and memory traces."""
+
+    return f"<player {player_index + 1}>"
+
+
+def is_bot_filename(filename: str) -> bool:
+    """Whether the given filename is of a bot's code (or of code the engine runs in the bot's globals)."""
+
+    return filename == "<string>" or filename.startswith("<player ")
+
+
+class AllocationSite:
+    """The memory allocated by a single line of a bot's code which is still alive."""
+
+    def __init__(self, lineno: int, size: int, count: int):
+        self.lineno = lineno
+        self.size = size
+        """The total size of the alive memory blocks, in bytes."""
+        self.count = count
+        """The amount of alive memory blocks."""
+
+    def __repr__(self):
+        return f"AllocationSite(lineno={self.lineno}, size={self.size}, count={self.count})"
+
+
+class MemoryProfiler:
+    """
+    Measures the memory each player's bot holds, using :mod:`tracemalloc`.
+
+    Every memory block which is still alive is attributed to the innermost line of a bot's code in the block's traceback,
+    so objects a bot creates through the API or the standard library (for example, with ``copy.deepcopy``) count towards the bot too.
+    The measurements are kept in :attr:`history`, and the lines which hold the most memory in :attr:`top_sites`.
+
+    Tracing every allocation slows down the whole simulation (usually by 2-4 times), and measuring takes time proportional to the amount of alive memory blocks,
+    so only enable profiling when looking for leaks or enforcing a limit.
+    Bots which run in their own processes (see :func:`code_battles.battles.CodeBattles.configure_bot_execution`) aren't measured.
+
+    :param interval: The amount of steps between measurements.
+    :param limit: The maximum amount of bytes each player's bot may hold, or ``None`` for no limit.
+    :param policy: What happens to a bot once it exceeds the limit. ``"warn"`` only shows an alert,
+        and ``"stop"`` also discards the bot (and everything it holds), so it doesn't run anymore.
+    :param frames: The amount of frames stored for each allocation. Allocations deeper than this below the bot's code aren't attributed to the bot.
+    :param top: The amount of allocation sites kept for each player.
+    """
+
+    def __init__(
+        self,
+        interval=10,
+        limit: Optional[int] = None,
+        policy="warn",
+        frames=16,
+        top=10,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(
+                f"Unknown policy {policy!r}, expected one of {', '.join(POLICIES)}."
+            )
+
+        self.interval = interval
+        self.limit = limit
+        self.policy = policy
+        self.frames = frames
+        self.top = top
+        self.history: List[List[Tuple[int, int]]] = []
+        """The ``(step, size)`` measurements of each player, in bytes."""
+        self.top_sites: List[List[AllocationSite]] = []
+        """The allocation sites which held the most memory in the latest measurement, for each player."""
+        self.exceeded: List[int] = []
+        """The players whose bots exceeded the limit, in the order they exceeded it."""
+        self._players: Dict[str, int] = {}
+        self._started_tracing = False
+
+    def start(self, player_count: int) -> None:
+        """Starts tracing allocations (if they aren't traced already), before the bots are created."""
+
+        import tracemalloc
+
+        self.history = [[] for _ in range(player_count)]
+        self.top_sites = [[] for _ in range(player_count)]
+        self.exceeded = []
+        self._players = {
+            bot_filename(player_index): player_index
+            for player_index in range(player_count)
+        }
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+
+    def stop(self) -> None:
+        """Stops tracing allocations, if :func:`start` started it. The measurements are kept."""
+
+        import tracemalloc
+
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def measure(self, step: int) -> List[int]:
+        """
+        Measures the memory each player's bot holds and returns the players which exceeded the limit for the first time.
+        """
+
+        import tracemalloc
+
+        players = self._players
+        sizes = [0 for _ in self.history]
+        sites: List[Dict[int, List[int]]] = [{} for _ in self.history]
+        for trace in tracemalloc.take_snapshot().traces:
+            # Tracebacks are ordered from the oldest frame, so the innermost line of the bot is the last one.
+            for frame in reversed(trace.traceback):
+                player_index = players.get(frame.filename)
+                if player_index is not None:
+                    break
+            else:
+                continue
+
+            sizes[player_index] += trace.size
+            site = sites[player_index].setdefault(frame.lineno, [0, 0])
+            site[0] += trace.size
+            site[1] += 1
+
+        exceeded = []
+        for player_index, size in enumerate(sizes):
+            self.history[player_index].append((step, size))
+            self.top_sites[player_index] = [
+                AllocationSite(lineno, site_size, count)
+                for lineno, (site_size, count) in sorted(
+                    sites[player_index].items(), key=lambda item: -item[1][0]
+                )[: self.top]
+            ]
+            if (
+                self.limit is not None
+                and size > self.limit
+                and player_index not in self.exceeded
+            ):
+                self.exceeded.append(player_index)
+                exceeded.append(player_index)
+
+        return exceeded
+
+    def size(self, player_index: int) -> int:
+        """The amount of bytes the player's bot held in the latest measurement."""
+
+        history = self.history[player_index]
+        return history[-1][1] if len(history) != 0 else 0
+
+    def peak(self, player_index: int) -> int:
+        """The largest amount of bytes the player's bot held in any measurement."""
+
+        return max((size for _, size in self.history[player_index]), default=0)
+
+    def growth(self, player_index: int) -> int:
+        """The amount of bytes the player's bot held in the latest measurement beyond the first measurement."""
+
+        history = self.history[player_index]
+        return history[-1][1] - history[0][1] if len(history) != 0 else 0
+
+    def report(self, player_names: List[str]) -> str:
+        """A summary of the latest measurement of each player, with the player's top allocation sites."""
+
+        output = ""
+        for player_index, name in enumerate(player_names):
+            output += (
+                f"Player #{player_index + 1} ({name}): {_format_size(self.size(player_index))} "
+                f"(peak {_format_size(self.peak(player_index))}, growth {_format_size(self.growth(player_index))})"
+            )
+            if player_index in self.exceeded:
+                output += " - exceeded the limit"
+            output += "\n"
+            for site in self.top_sites[player_index]:
+                output += f"    Line {site.lineno}: {_format_size(site.size)} in {site.count} blocks\n"
+
+        return output
+
+
+def _format_size(size: int) -> str:
+    if abs(size) < 1024:
+        return f"{size} B"
+
+    value = size / 1024
+    for unit in ["KiB", "MiB"]:
+        if abs(value) < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GiB"
@@ -0,0 +1,346 @@
+"""Passability grids derived from maps, with cached distance fields for pathfinding."""
+
+from __future__ import annotations
+
+import os
+from array import array
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from code_battles.utilities import is_web_or_worker, web_only
+
+try:
+    import js
+except Exception:
+    pass
+
+UNREACHABLE = 0xFFFFFFFF
+"""The distance of cells from which the target can't be reached."""
+
+_NEIGHBORS = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+
+
+class NavigationGrid:
+    """
+    Which cells of a map can be walked through, where each cell is ``cell_size`` by ``cell_size`` map pixels.
+
+    Units move between the 8 neighboring cells, but not diagonally past a blocked cell.
+    :func:`distance_field` returns the distance of every cell from a target, which is computed once per target
+    and cached in memory, and in ``cache_directory`` (if given) as a file which other simulations and processes map into memory,
+    so finding the next step towards a target is a constant-time lookup.
+
+    :param passable: A byte for each cell, row after row, which is non-zero for passable cells.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        passable: Union[bytes, bytearray],
+        cell_size: float = 1,
+        cache_directory: Optional[str] = None,
+        cache_size=64,
+    ):
+        if len(passable) != width * height:
+            raise ValueError(
+                f"Expected {width * height} cells, got {len(passable)} cells."
+            )
+
+        self.width = width
+        self.height = height
+        self.passable = bytes(passable)
+        self.cell_size = cell_size
+        self.cache_directory = cache_directory
+        self.cache_size = cache_size
+        self._fields: Dict[Tuple[int, ...], DistanceField] = {}
+        self._key: Optional[str] = None
+
+    @staticmethod
+    def from_text(
+        text: str, cell_size: float = 1, passable=".", **kwargs: Any
+    ) -> NavigationGrid:
+        """
+        Returns the grid of a text file, with a line for each row and a character for each cell,
+        where the characters in ``passable`` are passable cells. Shorter lines are padded with blocked cells.
+        """
+
+        rows = text.splitlines()
+        width = max((len(row) for row in rows), default=0)
+        cells = bytearray(width * len(rows))
+        for y, row in enumerate(rows):
+            for x, character in enumerate(row):
+                if character in passable:
+                    cells[y * width + x] = 1
+
+        return NavigationGrid(width, len(rows), cells, cell_size, **kwargs)
+
+    @staticmethod
+    def from_pixels(
+        pixels: bytes,
+        width: int,
+        height: int,
+        cell_size: float = 1,
+        is_passable: Optional[Callable[[int, int, int, int], bool]] = None,
+        **kwargs: Any,
+    ) -> NavigationGrid:
+        """
+        Returns the grid of an RGBA image of ``width`` by ``height`` pixels, such as the data of a canvas.
+        A cell is passable if ``is_passable(r, g, b, a)`` of its center pixel is true (by default, if the pixel isn't transparent).
+        """
+
+        if is_passable is None:
+            is_passable = _is_opaque
+        columns = max(1, int(width // cell_size))
+        rows = max(1, int(height // cell_size))
+        cells = bytearray(columns * rows)
+        for y in range(rows):
+            pixel_y = min(int((y + 0.5) * cell_size), height - 1)
+            for x in range(columns):
+                offset = (
+                    pixel_y * width + min(int((x + 0.5) * cell_size), width - 1)
+                ) * 4
+                if is_passable(*pixels[offset : offset + 4]):
+                    cells[y * columns + x] = 1
+
+        return NavigationGrid(columns, rows, cells, cell_size, **kwargs)
+
+    @staticmethod
+    @web_only
+    def from_image(
+        image: "js.Image",
+        cell_size: float = 1,
+        is_passable: Optional[Callable[[int, int, int, int], bool]] = None,
+        **kwargs: Any,
+    ) -> NavigationGrid:
+        """Returns the grid of a loaded map image (such as :attr:`code_battles.battles.CodeBattles.map_image`), like :func:`from_pixels`."""
+
+        from js import OffscreenCanvas
+
+        width = int(image.width)
+        height = int(image.height)
+        canvas = OffscreenCanvas.new(width, height)
+        context = canvas.getContext("2d")
+        context.drawImage(image, 0, 0)
+        pixels = context.getImageData(0, 0, width, height).data.to_py()
+        return NavigationGrid.from_pixels(
+            bytes(pixels), width, height, cell_size, is_passable, **kwargs
+        )
+
+    @staticmethod
+    def load(
+        url: str, cell_size: float = 1, passable=".", **kwargs: Any
+    ) -> NavigationGrid:
+        """
+        Returns the grid of a text sidecar file of the map (see :func:`from_text`), which works in web workers and in local simulations alike.
+
+        On the web, the file is downloaded from the given URL. Locally, URLs which start with ``/`` are read from the ``public`` directory if they
+        don't exist as is, like the URLs of :func:`code_battles.battles.CodeBattles.configure_map_image_url`.
+        """
+
+        if is_web_or_worker():
+            from pyodide.http import open_url
+
+            text = open_url(url).read()
+        else:
+            path = url
+            if not os.path.exists(path) and url.startswith("/"):
+                path = os.path.join("public", url[1:])
+            with open(path, "r") as f:
+                text = f.read()
+
+        return NavigationGrid.from_text(text, cell_size, passable, **kwargs)
+
+    def cell(self, x: float, y: float) -> Tuple[int, int]:
+        """The cell of the given map position, clamped to the grid."""
+
+        return (
+            min(max(int(x // self.cell_size), 0), self.width - 1),
+            min(max(int(y // self.cell_size), 0), self.height - 1),
+        )
+
+    def center(self, cell_x: int, cell_y: int) -> Tuple[float, float]:
+        """The map position of the center of the given cell."""
+
+        return (cell_x + 0.5) * self.cell_size, (cell_y + 0.5) * self.cell_size
+
+    def is_passable(self, x: float, y: float) -> bool:
+        cell_x, cell_y = self.cell(x, y)
+        return self.passable[cell_y * self.width + cell_x] != 0
+
+    def distance_field(self, targets: Iterable[Tuple[float, float]]) -> DistanceField:
+        """Returns the distances of all cells from the nearest of the given map positions (for example, a single base, or all enemy units)."""
+
+        key = tuple(
+            sorted(
+                {
+                    cell_y * self.width + cell_x
+                    for cell_x, cell_y in (self.cell(x, y) for x, y in targets)
+                }
+            )
+        )
+        field = self._fields.pop(key, None)
+        if field is None:
+            field = DistanceField(self, self._load_distances(key))
+        # Keep the most recently used fields last.
+        self._fields[key] = field
+        while len(self._fields) > self.cache_size:
+            del self._fields[next(iter(self._fields))]
+        return field
+
+    def _load_distances(self, targets: Tuple[int, ...]) -> Sequence[int]:
+        if self.cache_directory is None:
+            return self._compute_distances(targets)
+
+        import hashlib
+
+        if self._key is None:
+            self._key = hashlib.sha1(
+                f"{self.width}x{self.height}:".encode() + self.passable
+            ).hexdigest()
+        name = hashlib.sha1(array("I", targets).tobytes()).hexdigest()
+        directory = os.path.join(self.cache_directory, self._key)
+        path = os.path.join(directory, name + ".bin")
+        if not os.path.exists(path):
+            distances = self._compute_distances(targets)
+            os.makedirs(directory, exist_ok=True)
+            temporary_path = f"{path}.{os.getpid()}.tmp"
+            with open(temporary_path, "wb") as f:
+                distances.tofile(f)
+            os.replace(temporary_path, path)
+
+        return _map_file(path)
+
+    def _compute_distances(self, targets: Tuple[int, ...]) -> array:
+        from collections import deque
+
+        width = self.width
+        height = self.height
+        passable = self.passable
+        distances = array("I", [UNREACHABLE]) * (width * height)
+        queue: deque = deque()
+        for target in targets:
+            distances[target] = 0
+            queue.append(target)
+
+        while len(queue) != 0:
+            index = queue.popleft()
+            distance = distances[index] + 1
+            x = index % width
+            y = index // width
+            for dx, dy in _NEIGHBORS:
+                nx = x + dx
+                ny = y + dy
+                if not (0 <= nx < width and 0 <= ny < height):
+                    continue
+                neighbor = ny * width + nx
+                if distances[neighbor] != UNREACHABLE or not passable[neighbor]:
+                    continue
+                if (
+                    dx != 0
+                    and dy != 0
+                    and not (passable[y * width + nx] and passable[ny * width + x])
+                ):
+                    continue
+                distances[neighbor] = distance
+                queue.append(neighbor)
+
+        return distances
+
+
+class DistanceField:
+    """
+    The distance (in steps between neighboring cells) of every cell of a :class:`NavigationGrid` from a target,
+    which doubles as a flow field: the next step towards the target is the neighboring cell with the smallest distance.
+    """
+
+    def __init__(self, grid: NavigationGrid, distances: Sequence[int]):
+        self.grid = grid
+        self.distances = distances
+
+    def distance(self, x: float, y: float) -> Optional[int]:
+        """The amount of steps from the given map position to the target, or ``None`` if it can't be reached."""
+
+        cell_x, cell_y = self.grid.cell(x, y)
+        distance = self.distances[cell_y * self.grid.width + cell_x]
+        return None if distance == UNREACHABLE else distance
+
+    def direction(self, x: float, y: float) -> Optional[Tuple[int, int]]:
+        """The cell offset (such as ``(1, -1)``) of the next step towards the target, or ``None`` at the target or if it can't be reached."""
+
+        grid = self.grid
+        width = grid.width
+        distances = self.distances
+        passable = grid.passable
+        cell_x, cell_y = grid.cell(x, y)
+        best = distances[cell_y * width + cell_x]
+        if best == 0 or best == UNREACHABLE:
+            return None
+
+        result = None
+        for dx, dy in _NEIGHBORS:
+            nx = cell_x + dx
+            ny = cell_y + dy
+            if not (0 <= nx < width and 0 <= ny < grid.height):
+                continue
+            if (
+                dx != 0
+                and dy != 0
+                and not (
+                    passable[cell_y * width + nx] and passable[ny * width + cell_x]
+                )
+            ):
+                continue
+            distance = distances[ny * width + nx]
+            if distance < best:
+                best = distance
+                result = (dx, dy)
+
+        return result
+
+    def next_position(self, x: float, y: float) -> Optional[Tuple[float, float]]:
+        """The map position of the center of the next cell towards the target, or ``None`` at the target or if it can't be reached."""
+
+        direction = self.direction(x, y)
+        if direction is None:
+            return None
+        cell_x, cell_y = self.grid.cell(x, y)
+        return self.grid.center(cell_x + direction[0], cell_y + direction[1])
+
+    def path(self, x: float, y: float) -> List[Tuple[float, float]]:
+        """The map positions of the centers of the cells on the way to the target, or an empty list if it can't be reached."""
+
+        path = []
+        position = self.next_position(x, y)
+        while position is not None:
+            path.append(position)
+            position = self.next_position(*position)
+        return path
+
+
+def _is_opaque(r: int, g: int, b: int, a: int) -> bool:
+    return a != 0
+
+
+def _map_file(path: str) -> Sequence[int]:
+    """Maps the given file of distances into memory, or reads it if memory mapping isn't available."""
+
+    with open(path, "rb") as f:
+        try:
+            import mmap
+
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast(
+                "I"
+            )
+        except (ImportError, OSError, ValueError):
+            distances = array("I")
+            distances.frombytes(f.read())
+            return distances
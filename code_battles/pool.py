@@ -0,0 +1,112 @@
+"""A pool of warm worker processes for running many local simulations."""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from code_battles.processes import is_fork_available
+
+if TYPE_CHECKING:
+    from code_battles.battles import CodeBattles, SimulationResult
+    from code_battles.tournament import Match
+
+_battles: Optional[CodeBattles] = None
+
+
+class SimulationPool:
+    """
+    Runs simulations in worker processes which are forked from the current process once, so the game and its API are only imported once,
+    and each worker reuses the compiled bots of its earlier matches. Only the state of each match is reset, by starting a new simulation.
+
+    Workers are replaced after ``max_matches_per_worker`` matches, so anything which leaks between matches (for example, caches kept by the game or the API module)
+    can't grow without bound. Useful as the ``run_matches`` of a :class:`code_battles.tournament.Tournament` or a :class:`code_battles.comparison.Comparison`.
+    On platforms which don't support forking, the matches run one after the other in the current process.
+
+    Use the pool as a context manager (or call :func:`close`) so the workers are stopped, which happens immediately if an exception is raised.
+
+    :param processes: The amount of workers. The amount of CPUs by default.
+    :param bots: A mapping from each bot's name to its code, for matches which don't specify their players' code.
+    """
+
+    def __init__(
+        self,
+        battles: CodeBattles,
+        processes: Optional[int] = None,
+        max_matches_per_worker=100,
+        bots: Optional[Dict[str, str]] = None,
+    ):
+        self.battles = battles
+        self.processes = processes or os.cpu_count() or 1
+        self.max_matches_per_worker = max_matches_per_worker
+        self.bots = bots or {}
+        self._pool = None
+        if is_fork_available():
+            # Import the API before forking, so the workers don't.
+            battles.get_api()
+            self._pool = multiprocessing.get_context("fork").Pool(
+                self.processes,
+                _initialize_worker,
+                (battles,),
+                max_matches_per_worker,
+            )
+
+    def run_matches(self, matches: List[Match]) -> List[SimulationResult]:
+        """Runs the given matches in parallel and returns their results, in the order of the matches."""
+
+        tasks = [
+            (
+                match.parameters,
+                match.player_names,
+                match.player_codes or [self.bots[name] for name in match.player_names],
+                match.seed,
+            )
+            for match in matches
+        ]
+        if self._pool is None:
+            _initialize_worker(self.battles)
+            return [_run_match(task) for task in tasks]
+
+        return self._pool.map(_run_match, tasks, chunksize=1)
+
+    def close(self):
+        """Waits for the workers to finish their matches and stops them."""
+
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def terminate(self):
+        """Stops the workers without waiting for their matches."""
+
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type: Any, *args: Any):
+        if exception_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+
+def _initialize_worker(battles: CodeBattles):
+    global _battles
+    _battles = battles
+
+
+def _run_match(
+    task: Tuple[Dict[str, str], List[str], List[str], Optional[int]],
+) -> SimulationResult:
+    assert _battles is not None
+
+    parameters, player_names, player_codes, seed = task
+    return _battles._run_headless_simulation(
+        parameters, player_names, player_codes, seed, keep_logs=False
+    )
@@ -0,0 +1,156 @@
+"""Running each player's bot in its own process, so the bots of a single step run in parallel."""
+
+from __future__ import annotations
+
+import multiprocessing
+import pickle
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import TYPE_CHECKING, List
+
+if TYPE_CHECKING:
+    from code_battles.battles import CodeBattles
+
+
+def is_fork_available():
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+class BotProcesses:
+    """
+    A persistent forked process for each player, which keeps the player's globals (and random generator) between steps.
+
+    The processes are forked from the current simulation, so they start with the bots that were already created.
+    Each call ships the current step, state and active players alongside the player's requests and a branch of the log sink,
+    and returns the player's requests, log sink, alerts and error count after the bot ran.
+    The log sinks are merged like the sinks of :class:`code_battles.threads.BotThreads`, so log limits are counted as in sequential execution.
+
+    .. warning::
+       The state and player requests must be picklable, and the API implementation should access them through the game
+       (for example ``self.game.state``) rather than keeping its own references, since they are replaced on every call.
+    """
+
+    def __init__(self, battles: CodeBattles):
+        context = multiprocessing.get_context("fork")
+
+        self._battles = battles
+        self._connections: List[Connection] = []
+        self._processes: List[BaseProcess] = []
+        self._alive: List[bool] = []
+        for player_index in range(len(battles.player_names)):
+            connection, child_connection = context.Pipe()
+            process = context.Process(
+                target=_serve,
+                args=(
+                    battles,
+                    player_index,
+                    child_connection,
+                    [*self._connections, connection],
+                ),
+                daemon=True,
+            )
+            process.start()
+            child_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+            self._alive.append(True)
+
+    def run(self, method_name: str, player_indices: List[int]) -> List[float]:
+        battles = self._battles
+        snapshot = pickle.dumps(
+            (battles.step, battles.state, battles.active_players),
+            pickle.HIGHEST_PROTOCOL,
+        )
+
+        for player_index in player_indices:
+            if self._alive[player_index]:
+                connection = self._connections[player_index]
+                connection.send(
+                    (
+                        method_name,
+                        battles.player_requests[player_index],
+                        battles._log_sink.branch(),
+                    )
+                )
+                connection.send_bytes(snapshot)
+
+        # Collect the results in player order so logs and alerts are identical to sequential execution.
+        times = []
+        for player_index in player_indices:
+            if not self._alive[player_index]:
+                times.append(0.0)
+                continue
+
+            try:
+                requests, log_sink, alerts, errors, elapsed = self._connections[
+                    player_index
+                ].recv()
+            except EOFError:
+                self._alive[player_index] = False
+                battles.alert(
+                    f"Code Exception in 'Player {player_index + 1}' API!",
+                    "The bot's process exited unexpectedly.",
+                    "red",
+                    "fa-solid fa-exclamation",
+                )
+                times.append(0.0)
+                continue
+
+            battles.player_requests[player_index] = requests
+            battles._log_sink.merge(log_sink)
+            battles._alerts.extend(alerts)
+            battles._error_counts[player_index] = errors
+            battles._bot_timings.add(player_index, method_name, elapsed)
+            times.append(elapsed)
+
+        return times
+
+    def close(self, timeout=1.0):
+        """Stops the processes, terminating the ones which don't exit within ``timeout`` seconds (for example, because a bot is stuck)."""
+
+        # Closing the connections makes each process exit once its bot is done.
+        for connection in self._connections:
+            connection.close()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+
+def _serve(
+    battles: CodeBattles,
+    player_index: int,
+    connection: Connection,
+    parent_connections: List[Connection],
+):
+    # Close the inherited copies of the parent's connections, so each process gets an EOF once the parent closes its connection.
+    for parent_connection in parent_connections:
+        parent_connection.close()
+
+    while True:
+        try:
+            method_name, requests, log_sink = connection.recv()
+            step, state, active_players = pickle.loads(connection.recv_bytes())
+        except EOFError:
+            return
+
+        battles._invalidate_views()
+        battles.step = step
+        battles.state = state
+        battles.active_players = active_players
+        battles.player_requests[player_index] = requests
+        battles._log_sink = log_sink
+        battles._alerts = []
+
+        elapsed = battles.run_bot_method(player_index, method_name)
+
+        connection.send(
+            (
+                battles.player_requests[player_index],
+                battles._log_sink,
+                battles._alerts,
+                battles._error_counts[player_index],
+                elapsed,
+            )
+        )
@@ -0,0 +1,412 @@
+"""Columnar collection, export and aggregation of the results of many simulations."""
+
+from __future__ import annotations
+
+import csv
+import glob
+import json
+import math
+import os
+from array import array
+from dataclasses import dataclass
+from random import Random
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence, Tuple, Union
+
+from code_battles.utilities import _numpy
+
+if TYPE_CHECKING:
+    from code_battles.battles import SimulationResult
+
+_INTEGER_COLUMNS = ["match", "place", "won", "steps", "player_count", "errors"]
+_CATEGORY_COLUMNS = ["player", "map", "seed", "parameters"]
+
+
+@dataclass
+class Summary:
+    """An aggregate of a single column over a group of rows."""
+
+    count: int
+    mean: float
+    low: float
+    """The lower bound of the bootstrap confidence interval of :attr:`mean`."""
+    high: float
+    """The upper bound of the bootstrap confidence interval of :attr:`mean`."""
+
+
+class StatisticsTable:
+    """
+    The results of many simulations, stored in columns with a row for each player in each simulation.
+
+    The columns are ``match``, ``place`` (0 for the winner), ``won``, ``steps``, ``player_count``, ``errors`` (the amount of exceptions the player's bot raised),
+    the categorical ``player``, ``map``, ``seed`` and ``parameters`` columns, and a column for each statistic returned by :func:`CodeBattles.get_statistics`.
+    Integer columns are stored in ``array``'s, statistics are stored as doubles (NaN when missing) and categorical columns are stored as indices into their categories.
+    """
+
+    def __init__(self):
+        self.integers: Dict[str, array] = {
+            column: array("q") for column in _INTEGER_COLUMNS
+        }
+        self.categories: Dict[str, List[str]] = {
+            column: [] for column in _CATEGORY_COLUMNS
+        }
+        self.codes: Dict[str, array] = {
+            column: array("i") for column in _CATEGORY_COLUMNS
+        }
+        self.statistics: Dict[str, array] = {}
+        self._category_indices: Dict[str, Dict[str, int]] = {
+            column: {} for column in _CATEGORY_COLUMNS
+        }
+
+    def __len__(self):
+        return len(self.integers["match"])
+
+    def add(self, match: int, result: SimulationResult):
+        """Adds a row for each player of the given simulation result."""
+
+        statistics = {key: float(value) for key, value in result.statistics.items()}
+        for key in statistics:
+            if key not in self.statistics:
+                self.statistics[key] = array("d", [math.nan] * len(self))
+
+        for place, player_index in enumerate(result.places):
+            self._append(
+                {
+                    "match": match,
+                    "place": place,
+                    "won": 1 if place == 0 else 0,
+                    "steps": result.steps,
+                    "player_count": len(result.player_names),
+                    "errors": result.errors[player_index]
+                    if len(result.errors) != 0
+                    else 0,
+                },
+                {
+                    "player": result.player_names[player_index],
+                    "map": result.parameters.get("map", ""),
+                    "seed": str(result.seed),
+                    "parameters": json.dumps(result.parameters, sort_keys=True),
+                },
+                statistics,
+            )
+
+    def extend(self, other: StatisticsTable):
+        """Appends all of the rows of another table."""
+
+        for key in other.statistics:
+            if key not in self.statistics:
+                self.statistics[key] = array("d", [math.nan] * len(self))
+
+        for row in range(len(other)):
+            self._append(
+                {column: other.integers[column][row] for column in _INTEGER_COLUMNS},
+                {
+                    column: other.categories[column][other.codes[column][row]]
+                    for column in _CATEGORY_COLUMNS
+                },
+                {key: values[row] for key, values in other.statistics.items()},
+            )
+
+    def clear(self):
+        self.__init__()  # type: ignore
+
+    def column(self, name: str) -> Union[array, List[str]]:
+        """Returns the values of the given column, where categorical values are decoded to strings."""
+
+        if name in self.integers:
+            return self.integers[name]
+        if name in self.statistics:
+            return self.statistics[name]
+        categories = self.categories[name]
+        return [categories[code] for code in self.codes[name]]
+
+    def summarize(
+        self,
+        column: str,
+        by: Sequence[str] = ("player",),
+        confidence=0.95,
+        resamples=1000,
+        seed=0,
+    ) -> Dict[Tuple[str, ...], Summary]:
+        """
+        Aggregates the given column for each group of rows with the same values in the ``by`` columns.
+
+        Missing statistics are ignored. The aggregation is vectorized with NumPy when it is available.
+
+        :returns: A mapping from the values of the ``by`` columns to the summary of the group, where the confidence interval is computed by bootstrapping.
+        """
+
+        values = self.integers.get(column, self.statistics.get(column))
+        if values is None:
+            raise KeyError(f"Unknown column '{column}'.")
+
+        if _numpy() is not None:
+            return self._summarize_vectorized(values, by, confidence, resamples, seed)
+
+        groups: Dict[Tuple[str, ...], List[float]] = {}
+        keys = [self.column(name) for name in by]
+        for row, value in enumerate(values):
+            if not math.isnan(value):
+                group = tuple(str(key[row]) for key in keys)
+                groups.setdefault(group, []).append(value)
+
+        random = Random(seed)
+        summaries = {}
+        for group, samples in groups.items():
+            means = sorted(
+                sum(random.choices(samples, k=len(samples))) / len(samples)
+                for _ in range(resamples)
+            )
+            summaries[group] = Summary(
+                len(samples),
+                sum(samples) / len(samples),
+                means[int((1 - confidence) / 2 * (resamples - 1))],
+                means[int((1 + confidence) / 2 * (resamples - 1))],
+            )
+        return summaries
+
+    def win_rates(self, by: Sequence[str] = ("player",), **kwargs):
+        """The win rate of each group of rows, for example of each player (the default) or each player on each map (``by=("player", "map")``)."""
+
+        return self.summarize("won", by, **kwargs)
+
+    def write_csv(self, path: str):
+        """
+        Appends the rows to the given CSV file, writing a header if the file is new.
+
+        If the rows have statistics which the file doesn't have yet, the file is rewritten with the new columns, which are left empty in its earlier rows.
+        """
+
+        header = [*_INTEGER_COLUMNS, *_CATEGORY_COLUMNS, *self.statistics]
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            with open(path, "r", newline="") as f:
+                existing_header = next(csv.reader(f))
+            new_columns = [key for key in header if key not in existing_header]
+            header = existing_header + new_columns
+            if len(new_columns) != 0:
+                with open(path, "r", newline="") as f:
+                    rows = list(csv.reader(f))[1:]
+                with open(path, "w", newline="") as f:
+                    writer = csv.writer(f)
+                    writer.writerow(header)
+                    writer.writerows(row + [""] * len(new_columns) for row in rows)
+
+        columns = [
+            self.column(name)
+            if name in self.integers or name in self.codes or name in self.statistics
+            else [math.nan] * len(self)
+            for name in header
+        ]
+        with open(path, "a", newline="") as f:
+            writer = csv.writer(f)
+            if not exists:
+                writer.writerow(header)
+            writer.writerows(zip(*columns))
+
+    def write_npz(self, path: str):
+        """Writes the columns to a compressed NumPy file."""
+
+        np = _numpy()
+        if np is None:
+            raise ImportError("Writing .npz files requires NumPy.")
+
+        arrays: Dict[str, Any] = {}
+        for name, values in [*self.integers.items(), *self.codes.items()]:
+            arrays[name] = np.frombuffer(values, values.typecode)
+        for name, values in self.statistics.items():
+            arrays[f"statistic:{name}"] = np.frombuffer(values, values.typecode)
+        for name, categories in self.categories.items():
+            arrays[f"categories:{name}"] = np.array(categories, dtype=str)
+        np.savez_compressed(path, **arrays)
+
+    @staticmethod
+    def load(path: str) -> StatisticsTable:
+        """Loads a table from a CSV file, or from all of the chunks written by a :class:`StatisticsSink` to an ``.npz`` path."""
+
+        table = StatisticsTable()
+        if path.endswith(".npz"):
+            for _, chunk in _npz_chunks(path):
+                table.extend(StatisticsTable._load_npz(chunk))
+            return table
+
+        with open(path, "r", newline="") as f:
+            for row in csv.DictReader(f):
+                for key in row:
+                    if (
+                        key not in _INTEGER_COLUMNS
+                        and key not in _CATEGORY_COLUMNS
+                        and key not in table.statistics
+                    ):
+                        table.statistics[key] = array("d", [math.nan] * len(table))
+                table._append(
+                    {column: int(row.get(column) or 0) for column in _INTEGER_COLUMNS},
+                    {column: row[column] for column in _CATEGORY_COLUMNS},
+                    {
+                        key: float(row[key]) if row[key] != "" else math.nan
+                        for key in table.statistics
+                    },
+                )
+        return table
+
+    @staticmethod
+    def _load_npz(path: str) -> StatisticsTable:
+        np = _numpy()
+        if np is None:
+            raise ImportError("Reading .npz files requires NumPy.")
+
+        table = StatisticsTable()
+        with np.load(path) as contents:
+            for name in _INTEGER_COLUMNS:
+                table.integers[name] = (
+                    array("q", contents[name].tobytes())
+                    if name in contents.files
+                    else array("q", [0] * len(contents["match"]))
+                )
+            for name in _CATEGORY_COLUMNS:
+                table.codes[name] = array("i", contents[name].tobytes())
+                table.categories[name] = [
+                    str(x) for x in contents[f"categories:{name}"]
+                ]
+                table._category_indices[name] = {
+                    category: index
+                    for index, category in enumerate(table.categories[name])
+                }
+            for name in contents.files:
+                if name.startswith("statistic:"):
+                    table.statistics[name[len("statistic:") :]] = array(
+                        "d", contents[name].tobytes()
+                    )
+        return table
+
+    def _append(
+        self,
+        integers: Dict[str, int],
+        categories: Dict[str, str],
+        statistics: Dict[str, float],
+    ):
+        for column, value in integers.items():
+            self.integers[column].append(value)
+        for column, category in categories.items():
+            indices = self._category_indices[column]
+            if category not in indices:
+                indices[category] = len(self.categories[column])
+                self.categories[column].append(category)
+            self.codes[column].append(indices[category])
+        for key, values in self.statistics.items():
+            values.append(statistics.get(key, math.nan))
+
+    def _summarize_vectorized(
+        self,
+        values: array,
+        by: Sequence[str],
+        confidence: float,
+        resamples: int,
+        seed: int,
+    ):
+        np = _numpy()
+        assert np is not None
+
+        column = np.frombuffer(values, values.typecode).astype(float)
+        present = ~np.isnan(column)
+        column = column[present]
+        keys = np.zeros((len(column), len(by)), dtype=np.int64)
+        for i, name in enumerate(by):
+            codes = self.codes[name] if name in self.codes else self.integers[name]
+            keys[:, i] = np.frombuffer(codes, codes.typecode)[present]
+        groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        counts = np.bincount(inverse, minlength=len(groups))
+        means = np.bincount(inverse, column, minlength=len(groups)) / counts
+
+        generator = np.random.default_rng(seed)
+        order = np.argsort(inverse, kind="stable")
+        boundaries = np.cumsum(counts)[:-1]
+        summaries = {}
+        for group, mean, samples in zip(
+            groups, means, np.split(column[order], boundaries)
+        ):
+            resampled = samples[
+                generator.integers(0, len(samples), (resamples, len(samples)))
+            ].mean(axis=1)
+            low, high = np.quantile(
+                resampled, [(1 - confidence) / 2, (1 + confidence) / 2]
+            )
+            summaries[
+                tuple(
+                    self.categories[name][code] if name in self.codes else str(code)
+                    for name, code in zip(by, group)
+                )
+            ] = Summary(len(samples), float(mean), float(low), float(high))
+        return summaries
+
+
+class StatisticsSink:
+    """
+    Collects simulation results into a :class:`StatisticsTable`, and flushes them to the given path every ``chunk_size`` simulations.
+
+    CSV paths are appended to, while for ``.npz`` paths every chunk is written to its own numbered file next to the path (``results.0.npz``, ``results.1.npz``, ...).
+    Use :func:`StatisticsTable.load` with the same path to read everything back.
+    When the path already has results (for example, of an interrupted run), the matches are numbered after them.
+    """
+
+    def __init__(self, path: str, chunk_size=1000):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._table = StatisticsTable()
+        self._pending = 0
+        chunks = _npz_chunks(path) if path.endswith(".npz") else []
+        self._chunks = chunks[-1][0] + 1 if len(chunks) != 0 else 0
+        self.matches = _next_match(path, chunks)
+
+    def add(self, result: SimulationResult):
+        self._table.add(self.matches, result)
+        self.matches += 1
+        self._pending += 1
+        if self._pending >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self._pending == 0:
+            return
+
+        if self.path.endswith(".npz"):
+            self._table.write_npz(f"{self.path[:-4]}.{self._chunks}.npz")
+            self._chunks += 1
+        else:
+            self._table.write_csv(self.path)
+        self._table.clear()
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args: Any):
+        self.close()
+
+
+def _next_match(path: str, chunks: List[Tuple[int, str]]) -> int:
+    """The number of the match after the matches already written to the given path (or its ``.npz`` chunks)."""
+
+    matches: Sequence[int] = []
+    if len(chunks) != 0:
+        # Matches are numbered in the order the chunks were written.
+        matches = StatisticsTable._load_npz(chunks[-1][1]).integers["match"]
+    elif not path.endswith(".npz") and os.path.exists(path):
+        with open(path, "r", newline="") as f:
+            matches = [int(row.get("match") or 0) for row in csv.DictReader(f)]
+    return max(matches, default=-1) + 1
+
+
+def _npz_chunks(path: str) -> List[Tuple[int, str]]:
+    """The numbered chunks of the given ``.npz`` path, in the order they were written."""
+
+    prefix = path[:-4] + "."
+    chunks = []
+    for chunk in glob.glob(glob.escape(prefix) + "*.npz"):
+        number = chunk[len(prefix) : -len(".npz")]
+        if number.isdigit():
+            chunks.append((int(number), chunk))
+    return sorted(chunks)
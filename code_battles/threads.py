@@ -0,0 +1,98 @@
+"""Running the players' bots in parallel threads, on interpreters without a global interpreter lock."""
+
+from __future__ import annotations
+
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+from code_battles.logs import LogSink
+
+if TYPE_CHECKING:
+    from code_battles.battles import CodeBattles
+
+
+def is_free_threaded():
+    """Whether the interpreter runs without the global interpreter lock (such as a free-threaded CPython 3.13 build with the GIL disabled)."""
+
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+class BotThreads:
+    """
+    A thread pool with a thread for each player, which runs the bots of a single call to
+    :func:`code_battles.battles.CodeBattles.run_bot_methods` in parallel.
+
+    The bots keep their globals in the simulation, as in sequential execution.
+    Each bot's log entries and alerts are collected separately and added in player order once all of the bots finished,
+    so the results are identical to sequential execution.
+
+    .. warning::
+       The API implementation must only modify its own player's requests while the bots run, since the bots of other players run at the same time.
+    """
+
+    def __init__(self, battles: CodeBattles):
+        self._battles = battles
+        self._executor = ThreadPoolExecutor(
+            len(battles.player_names), thread_name_prefix="code-battles-bot"
+        )
+        self._log_sinks = _PerThread()
+        self._alerts = _PerThread()
+
+    def run(self, method_name: str, player_indices: List[int]) -> List[float]:
+        from code_battles.views import ViewScope
+
+        battles = self._battles
+        # Create the step's view scope up front, so the bots share a single scope which is invalidated at the end of the step.
+        if battles._view_scope is None or not battles._view_scope.valid:
+            battles._view_scope = ViewScope()
+
+        log_sink = battles._log_sink
+        alerts = battles._alerts
+        battles._log_sink = self._log_sinks  # type: ignore[assignment]
+        battles._alerts = self._alerts  # type: ignore[assignment]
+        try:
+            futures = [
+                self._executor.submit(
+                    self._run, player_index, method_name, log_sink.branch()
+                )
+                for player_index in player_indices
+            ]
+            results = [future.result() for future in futures]
+        finally:
+            battles._log_sink = log_sink
+            battles._alerts = alerts
+
+        times = []
+        for sink, bot_alerts, elapsed in results:
+            log_sink.merge(sink)
+            alerts.extend(bot_alerts)
+            times.append(elapsed)
+        return times
+
+    def _run(
+        self, player_index: int, method_name: str, sink: LogSink
+    ) -> Tuple[LogSink, List[Dict[str, Any]], float]:
+        alerts: List[Dict[str, Any]] = []
+        self._log_sinks.set(sink)
+        self._alerts.set(alerts)
+        elapsed = self._battles.run_bot_method(player_index, method_name)
+        return sink, alerts, elapsed
+
+    def close(self):
+        self._executor.shutdown()
+
+
+class _PerThread:
+    """Forwards attribute access to the object set by the current thread."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def set(self, value: Any):
+        self._local.value = value
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._local.value, name)
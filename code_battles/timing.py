@@ -0,0 +1,106 @@
+"""Timing statistics of the players' bots."""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, Tuple, Union
+
+_MINIMUM = 1e-6
+_BUCKETS_PER_DOUBLING = 8
+_LOG_GROWTH = math.log(2) / _BUCKETS_PER_DOUBLING
+# Durations at a bucket's bound (such as those returned by percentile) may have a logarithm slightly above it.
+_BOUND_TOLERANCE = 1e-9
+
+
+class TimingHistogram:
+    """
+    The durations of many calls, in logarithmic buckets (8 per doubling, from a microsecond),
+    so percentiles are accurate to within 9% and memory doesn't grow with the amount of calls.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        """The sum of the durations, in seconds."""
+        self.max = 0.0
+        """The longest duration, in seconds."""
+        self.buckets: Dict[int, int] = {}
+
+    def add(self, duration: float) -> None:
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        bucket = (
+            0
+            if duration <= _MINIMUM
+            else math.ceil(
+                math.log(duration / _MINIMUM) / _LOG_GROWTH - _BOUND_TOLERANCE
+            )
+        )
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def merge(self, other: TimingHistogram) -> None:
+        """Adds the calls of another histogram (for example, of another player)."""
+
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+
+    def percentile(self, percent: float) -> float:
+        """The duration (in seconds) which the given percent of the calls didn't exceed, rounded up to its bucket's bound."""
+
+        if self.count == 0:
+            return 0.0
+
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(_MINIMUM * math.exp(bucket * _LOG_GROWTH), self.max)
+        return self.max
+
+
+class BotTimings:
+    """The timing of each method of each player's bot, collected by :func:`code_battles.battles.CodeBattles.run_bot_method`."""
+
+    def __init__(self):
+        self.histograms: Dict[Tuple[int, str], TimingHistogram] = {}
+
+    def add(self, player_index: int, method_name: str, duration: float) -> None:
+        key = (player_index, method_name)
+        if key not in self.histograms:
+            self.histograms[key] = TimingHistogram()
+        self.histograms[key].add(duration)
+
+    def combined(self, method_name: str) -> TimingHistogram:
+        """The timing of the given method over all players."""
+
+        histogram = TimingHistogram()
+        for (_, name), player_histogram in sorted(self.histograms.items()):
+            if name == method_name:
+                histogram.merge(player_histogram)
+        return histogram
+
+    def statistics(self) -> Dict[str, Union[int, float]]:
+        """
+        Returns ``player_N_METHOD_calls``, ``player_N_METHOD_total_ms``, ``player_N_METHOD_p50_ms``, ``player_N_METHOD_p95_ms``
+        and ``player_N_METHOD_max_ms`` for each player (starting from 1) and method, in milliseconds.
+        """
+
+        result: Dict[str, Union[int, float]] = {}
+        for (player_index, method_name), histogram in sorted(self.histograms.items()):
+            prefix = f"player_{player_index + 1}_{method_name}"
+            result[f"{prefix}_calls"] = histogram.count
+            result[f"{prefix}_total_ms"] = _milliseconds(histogram.total)
+            result[f"{prefix}_p50_ms"] = _milliseconds(histogram.percentile(50))
+            result[f"{prefix}_p95_ms"] = _milliseconds(histogram.percentile(95))
+            result[f"{prefix}_max_ms"] = _milliseconds(histogram.max)
+        return result
+
+
+def _milliseconds(seconds: float) -> float:
+    return round(seconds * 1000, 3)
@@ -0,0 +1,307 @@
+"""Adaptive tournament scheduling on top of simulations without UI."""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from random import Random
+from statistics import NormalDist
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set
+
+if TYPE_CHECKING:
+    from code_battles.battles import CodeBattles, SimulationResult
+
+_Q = math.log(10) / 400
+
+
+@dataclass
+class Rating:
+    """The current standing of a single bot in a :class:`Tournament`."""
+
+    name: str
+    rating: float = 1500.0
+    """The estimated strength of the bot, on the Elo scale."""
+    deviation: float = 350.0
+    """The uncertainty of :attr:`rating`, which shrinks as the bot plays more matches."""
+    points: float = 0.0
+    """Swiss-system points: the number of opponents the bot placed above, summed over all matches."""
+    matches: int = 0
+    byes: int = 0
+
+
+@dataclass
+class Match:
+    """A single simulation scheduled by a :class:`Tournament` (or a :class:`code_battles.comparison.Comparison`)."""
+
+    player_names: List[str]
+    parameters: Dict[str, str]
+    seed: int
+    player_codes: Optional[List[str]] = None
+    """The code of each player, when it can't be looked up by the player's name."""
+
+
+class Tournament:
+    """
+    Schedules matches adaptively until the rankings converge, instead of playing a full round robin.
+
+    Every bot has a Glicko-style rating (an Elo rating alongside a deviation).
+    Multiplayer results are split into pairwise results, where each player beats everyone placed below it.
+
+    - ``"swiss"`` pairing groups all bots with similar points each round, like the Swiss system.
+      Bots which already played against each other are only grouped again when there are no other bots left to group them with.
+      When the bots can't be split evenly, the lowest ranked bots sit out the round and get half of the points of a match.
+    - ``"rating"`` pairing only schedules bots whose position in the ranking is still uncertain, alongside their closest rated opponents.
+
+    The tournament is over once every two adjacent bots in the ranking are either apart with the given ``confidence``,
+    or both have a deviation below ``resolution`` (and are considered tied), or after ``max_rounds`` rounds.
+
+    :param bots: A mapping from each bot's name to its code.
+    :param parameters: The parameters of the matches, which are used in turns (for example, one entry for each map).
+    :param run_matches: Runs the given matches and returns their results. By default, runs them one after the other in the current process.
+    """
+
+    def __init__(
+        self,
+        battles: CodeBattles,
+        bots: Dict[str, str],
+        parameters: List[Dict[str, str]],
+        players_per_match=2,
+        pairing="swiss",
+        confidence=0.95,
+        resolution=80.0,
+        max_rounds=100,
+        seed: Optional[int] = None,
+        run_matches: Optional[Callable[[List[Match]], List[SimulationResult]]] = None,
+    ):
+        if pairing not in ["swiss", "rating"]:
+            raise ValueError(f"Unknown pairing '{pairing}', expected swiss or rating.")
+        if not 2 <= players_per_match <= len(bots):
+            raise ValueError(
+                f"Can't play matches of {players_per_match} players with {len(bots)} bots."
+            )
+        if len(parameters) == 0:
+            raise ValueError("At least one set of parameters is required.")
+
+        self.battles = battles
+        self.bots = bots
+        self.parameters = parameters
+        self.players_per_match = players_per_match
+        self.pairing = pairing
+        self.resolution = resolution
+        self.max_rounds = max_rounds
+        self.ratings = {name: Rating(name) for name in bots}
+        self.round = 0
+        self.matches_played = 0
+
+        self._z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self._random = Random(seed)
+        self._run_matches = run_matches or self._run_matches_locally
+        self._parameters_index = 0
+        self._opponents: Dict[str, Set[str]] = {name: set() for name in bots}
+
+    @property
+    def standings(self) -> List[Rating]:
+        """The ratings from first place to last place."""
+
+        if self.pairing == "swiss":
+            return sorted(self.ratings.values(), key=lambda r: (-r.points, -r.rating))
+        return sorted(self.ratings.values(), key=lambda r: -r.rating)
+
+    @property
+    def converged(self) -> bool:
+        """Whether the order of every two adjacent bots in the ranking is known with the wanted confidence."""
+
+        ranking = sorted(self.ratings.values(), key=lambda r: -r.rating)
+        return all(self._is_settled(a, b) for a, b in zip(ranking, ranking[1:]))
+
+    def run(
+        self,
+        on_round: Optional[Callable[[Tournament, List[SimulationResult]], None]] = None,
+    ):
+        """
+        Plays rounds until the tournament converges and returns the final :attr:`standings`.
+
+        :param on_round: Called after every round with the results of the round's matches.
+        """
+
+        while not self.converged and self.round < self.max_rounds:
+            results = self.play_round()
+            if len(results) == 0:
+                break
+            if on_round is not None:
+                on_round(self, results)
+
+        return self.standings
+
+    def play_round(self) -> List[SimulationResult]:
+        """Pairs the bots, plays a single round and updates the ratings."""
+
+        groups = self.pair()
+        matches = []
+        for group in groups:
+            player_names = group[:]
+            self._random.shuffle(player_names)
+            matches.append(
+                Match(
+                    player_names,
+                    self.parameters[self._parameters_index % len(self.parameters)],
+                    self._random.randint(0, 2**128),
+                )
+            )
+            self._parameters_index += 1
+
+        results = self._run_matches(matches)
+        for match, result in zip(matches, results):
+            self.record(match.player_names, result.places)
+
+        if self.pairing == "swiss":
+            playing = {name for group in groups for name in group}
+            for rating in self.ratings.values():
+                if rating.name not in playing:
+                    rating.byes += 1
+                    rating.points += (self.players_per_match - 1) / 2
+
+        self.round += 1
+        return results
+
+    def pair(self) -> List[List[str]]:
+        """Returns the groups of bots that should play against each other in the next round."""
+
+        if self.pairing == "swiss":
+            return self._pair_swiss()
+        return self._pair_by_rating()
+
+    def record(self, player_names: List[str], places: List[int]):
+        """Updates the ratings with the result of a single match, where ``places`` are player indices from the winner to the loser."""
+
+        ranked = [self.ratings[player_names[index]] for index in places]
+        updates = []
+        for position, rating in enumerate(ranked):
+            variance_inverse = 0.0
+            improvement = 0.0
+            for other_position, other in enumerate(ranked):
+                if other_position == position:
+                    continue
+                score = 1.0 if position < other_position else 0.0
+                g = 1 / math.sqrt(1 + 3 * (_Q * other.deviation / math.pi) ** 2)
+                expected = 1 / (1 + 10 ** (-g * (rating.rating - other.rating) / 400))
+                variance_inverse += _Q**2 * g**2 * expected * (1 - expected)
+                improvement += g * (score - expected)
+
+            precision = 1 / rating.deviation**2 + variance_inverse
+            updates.append(
+                (
+                    rating.rating + _Q / precision * improvement,
+                    math.sqrt(1 / precision),
+                )
+            )
+
+        for position, (rating, (new_rating, new_deviation)) in enumerate(
+            zip(ranked, updates)
+        ):
+            rating.rating = new_rating
+            rating.deviation = new_deviation
+            rating.points += len(ranked) - 1 - position
+            rating.matches += 1
+            self._opponents[rating.name].update(
+                other.name for other in ranked if other is not rating
+            )
+        self.matches_played += 1
+
+    def get_tournament_info(
+        self, members: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """Returns the standings in the format of the ``/tournament/info`` document, which is shown in the tournament block."""
+
+        if members is None:
+            members = {}
+
+        return {
+            "teams": [
+                {
+                    "name": rating.name,
+                    "members": members.get(rating.name, ""),
+                    "points": rating.points
+                    if self.pairing == "swiss"
+                    else round(rating.rating),
+                    "rating": round(rating.rating, 1),
+                    "deviation": round(rating.deviation, 1),
+                    "matches": rating.matches,
+                }
+                for rating in self.standings
+            ]
+        }
+
+    def _is_settled(self, a: Rating, b: Rating) -> bool:
+        if a.deviation < self.resolution and b.deviation < self.resolution:
+            return True
+
+        return abs(a.rating - b.rating) > self._z * math.hypot(a.deviation, b.deviation)
+
+    def _pair_swiss(self):
+        names = [rating.name for rating in self.standings]
+        sitting_out = len(names) % self.players_per_match
+        if sitting_out != 0:
+            # The lowest ranked bots which sat out the least amount of rounds.
+            candidates = sorted(
+                range(len(names)), key=lambda i: (self.ratings[names[i]].byes, -i)
+            )
+            for i in sorted(candidates[:sitting_out], reverse=True):
+                del names[i]
+
+        groups = []
+        while len(names) != 0:
+            # The highest ranked bot, with the next bots in the standings which didn't play against anyone in the group yet.
+            group = [names[0]]
+            for name in names[1:]:
+                if len(group) == self.players_per_match:
+                    break
+                if all(name not in self._opponents[member] for member in group):
+                    group.append(name)
+            for name in names[1:]:
+                if len(group) == self.players_per_match:
+                    break
+                if name not in group:
+                    group.append(name)
+            groups.append(group)
+            names = [name for name in names if name not in group]
+
+        return groups
+
+    def _pair_by_rating(self):
+        ranking = sorted(self.ratings.values(), key=lambda r: -r.rating)
+        unsettled = set()
+        for a, b in zip(ranking, ranking[1:]):
+            if not self._is_settled(a, b):
+                unsettled.update([a.name, b.name])
+
+        available = [rating.name for rating in ranking]
+        groups = []
+        for rating in sorted(ranking, key=lambda r: -r.deviation):
+            if rating.name not in unsettled or rating.name not in available:
+                continue
+            if len(available) < self.players_per_match:
+                break
+
+            available.remove(rating.name)
+            opponents = sorted(
+                available,
+                key=lambda name: abs(self.ratings[name].rating - rating.rating),
+            )[: self.players_per_match - 1]
+            for opponent in opponents:
+                available.remove(opponent)
+            groups.append([rating.name, *opponents])
+
+        return groups
+
+    def _run_matches_locally(self, matches: List[Match]) -> List[SimulationResult]:
+        return [
+            self.battles._run_headless_simulation(
+                match.parameters,
+                match.player_names,
+                [self.bots[name] for name in match.player_names],
+                match.seed,
+                keep_logs=False,
+            )
+            for match in matches
+        ]
@@ -2,18 +2,32 @@
 
 from __future__ import annotations
 
-import asyncio
 import math
 import sys
 from enum import Enum
 from functools import wraps
-from typing import Callable, Dict, List, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 try:
     import js
 except Exception:
     pass
 
+if TYPE_CHECKING:
+    from array import array
+
 
 def is_worker():
     try:
@@ -50,6 +64,8 @@ class Alignment(Enum):
 
 @web_only
 def download_image(src: str):
+    import asyncio
+
     from js import Image
 
     result = asyncio.Future[Image]()
@@ -138,18 +154,68 @@ def console_log(player_index: int, text: str, color: str):
             print(e)
 
 
+@web_only
+def console_log_batch(entries: List[Dict[str, Any]]):
+    """Shows the given log entries in the console with a single call to JavaScript."""
+
+    import json
+
+    from js import window
+
+    if not hasattr(window, "consoleLogBatch"):
+        for entry in entries:
+            console_log(
+                -1 if entry["player_index"] is None else entry["player_index"],
+                entry["text"],
+                entry["color"],
+            )
+        return
+
+    try:
+        window.consoleLogBatch(json.dumps(entries))
+    except Exception as e:
+        print(e)
+
+
 async def with_timeout(fn: Callable[[], None], timeout_seconds: float):
+    import asyncio
+
     async def f():
         fn()
 
     await asyncio.wait_for(f(), timeout_seconds)
 
 
+class _Element:
+    __slots__ = ("key", "method", "args", "bounds")
+
+    def __init__(
+        self,
+        key: Any,
+        method: Callable[..., None],
+        args: Tuple[Any, ...],
+        bounds: Tuple[int, int, int, int],
+    ):
+        self.key = key
+        self.method = method
+        self.args = args
+        self.bounds = bounds
+
+
 class GameCanvas:
     """
     A nice wrapper around HTML Canvas for drawing map-based multiplayer games.
+
+    By default, every draw method draws immediately. In retained mode, everything drawn between :func:`begin_frame` and :func:`end_frame` is recorded,
+    and :func:`end_frame` only repaints the regions of the elements which were added, removed or changed since the previous frame, over a cached copy of the maps.
+    Give elements which persist between frames (such as units) an ``element_id``, so they are matched with their previous version.
     """
 
+    full_redraw_ratio = 0.5
+    """In retained mode, the whole canvas is redrawn if the changed regions cover more than this fraction of it."""
+    text_cache_size = 256
+    """The maximum amount of text bitmaps kept by :func:`draw_text` with ``cache``, where the least recently used bitmaps are dropped first."""
+
     _scale: float
 
     def __init__(
@@ -167,9 +233,86 @@ class GameCanvas:
         self.map_image = map_image
         self.extra_height = extra_height
         self.extra_width = extra_width
+        self.repainted_ratio = 1.0
+        """The fraction of the canvas which the last :func:`end_frame` repainted."""
+        self.text_cache_hits = 0
+        self.text_cache_misses = 0
+        self._text_cache: Dict[Tuple[str, str, float, str], Any] = {}
+
+        self._frame: Optional[List[_Element]] = None
+        self._anonymous_count = 0
+        self._previous_frame: List[_Element] = []
+        self._background: Any = None
 
         self._fit_into(max_width, max_height)
 
+    def begin_frame(self):
+        """Starts recording the draw calls of a frame in retained mode, instead of drawing them. Don't call :func:`clear` in retained mode."""
+
+        self._frame = []
+        self._anonymous_count = 0
+
+    def end_frame(self):
+        """Repaints the regions which changed since the previous frame (or everything, if most of the canvas changed) and stops recording."""
+
+        if self._frame is None:
+            raise Exception("end_frame was called without begin_frame!")
+        frame = self._frame
+        self._frame = None
+
+        previous = {element.key: element for element in self._previous_frame}
+        current = {element.key for element in frame}
+        dirty: List[Tuple[int, int, int, int]] = []
+        # If elements were reordered, they may have to be repainted wherever they overlap each other.
+        full_redraw = self._background is None or [
+            element.key for element in frame if element.key in previous
+        ] != [element.key for element in self._previous_frame if element.key in current]
+        if not full_redraw:
+            for element in frame:
+                old = previous.get(element.key)
+                if old is None:
+                    dirty.append(element.bounds)
+                elif old.method != element.method or old.args != element.args:
+                    dirty.append(old.bounds)
+                    dirty.append(element.bounds)
+            for old in self._previous_frame:
+                if old.key not in current:
+                    dirty.append(old.bounds)
+
+            dirty = _merge_rectangles(
+                [
+                    _clip_rectangle(rectangle, self.canvas.width, self.canvas.height)
+                    for rectangle in dirty
+                ]
+            )
+            area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in dirty)
+            self.repainted_ratio = area / max(1, self.canvas.width * self.canvas.height)
+            full_redraw = self.repainted_ratio > self.full_redraw_ratio
+
+        if full_redraw:
+            self.clear()
+            for element in frame:
+                element.method(*element.args)
+            self.repainted_ratio = 1.0
+        else:
+            for x0, y0, x1, y1 in dirty:
+                width = x1 - x0
+                height = y1 - y0
+                self.context.save()
+                self.context.beginPath()
+                self.context.rect(x0, y0, width, height)
+                self.context.clip()
+                self.context.drawImage(
+                    self._background, x0, y0, width, height, x0, y0, width, height
+                )
+                for element in frame:
+                    ex0, ey0, ex1, ey1 = element.bounds
+                    if ex0 < x1 and x0 < ex1 and ey0 < y1 and y0 < ey1:
+                        element.method(*element.args)
+                self.context.restore()
+
+        self._previous_frame = frame
+
     def draw_element(
         self,
         image: "js.Image",
@@ -179,6 +322,7 @@ class GameCanvas:
         board_index=0,
         direction: Union[float, None] = None,
         alignment=Alignment.CENTER,
+        element_id: Any = None,
     ):
         """
         Draws the given image on the specified board.
@@ -187,6 +331,28 @@ class GameCanvas:
         where 0 is no rotation and the direction is clockwise positive.
         """
 
+        if self._frame is not None:
+            center_x, center_y = self._translate_position(board_index, x, y)
+            scaled_width, scaled_height = self._translate_width(
+                width, image.width / image.height
+            )
+            if alignment == Alignment.TOP_LEFT:
+                center_x += scaled_width / 2
+                center_y += scaled_height / 2
+            radius = math.hypot(scaled_width, scaled_height) / 2
+            self._record(
+                element_id,
+                self.draw_element,
+                (image, x, y, width, board_index, direction, alignment),
+                (
+                    center_x - radius,
+                    center_y - radius,
+                    center_x + radius,
+                    center_y + radius,
+                ),
+            )
+            return
+
         if direction is None:
             direction = 0
 
@@ -213,16 +379,50 @@ class GameCanvas:
         board_index=0,
         text_size=15,
         font="",
+        element_id: Any = None,
+        cache=False,
     ):
         """
         Draws the given text in the given coordinates (in map pixels).
+
+        :param cache: Rasterize the text once and copy the bitmap on later calls with the same text, color, size and font,
+            which is much faster for text which repeats between frames (such as names and labels). See :attr:`text_cache_size`.
         """
 
-        if font != "":
-            font += ", "
+        if self._frame is not None:
+            center_x, center_y = self._translate_position(board_index, x, y)
+            if cache:
+                bitmap = self._get_text_bitmap(text, color, text_size, font)
+                half_width = bitmap.width / 2
+                half_height = bitmap.height / 2
+            else:
+                self._set_font(text_size, font)
+                half_width = self.context.measureText(text).width / 2
+                # Points are 4/3 pixels, and glyphs may extend above and below the font size.
+                half_height = text_size * self._scale * 4 / 3
+            self._record(
+                element_id,
+                self.draw_text,
+                (text, x, y, color, board_index, text_size, font, None, cache),
+                (
+                    center_x - half_width,
+                    center_y - half_height,
+                    center_x + half_width,
+                    center_y + half_height,
+                ),
+            )
+            return
 
         x, y = self._translate_position(board_index, x, y)
-        self.context.font = f"{text_size * self._scale}pt {font}system-ui, -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, Cantarell, 'Open Sans', 'Helvetica Neue', sans-serif, 'Noto Emoji'"
+        if cache:
+            bitmap = self._get_text_bitmap(text, color, text_size, font)
+            # Whole pixels keep the bitmap sharp.
+            self.context.drawImage(
+                bitmap, round(x - bitmap.width / 2), round(y - bitmap.height / 2)
+            )
+            return
+
+        self._set_font(text_size, font)
         self.context.fillStyle = color
         self.context.fillText(text, x, y)
 
@@ -235,11 +435,29 @@ class GameCanvas:
         stroke="black",
         stroke_width=10,
         board_index=0,
+        element_id: Any = None,
     ):
         """
         Draws a line between the given ``(start_x, start_y)`` and ``(end_x, end_y)`` coordinates (in map pixels) with the given stroke.
         """
 
+        if self._frame is not None:
+            x0, y0 = self._translate_position(board_index, start_x, start_y)
+            x1, y1 = self._translate_position(board_index, end_x, end_y)
+            margin = stroke_width * self._scale / 2
+            self._record(
+                element_id,
+                self.draw_line,
+                (start_x, start_y, end_x, end_y, stroke, stroke_width, board_index),
+                (
+                    min(x0, x1) - margin,
+                    min(y0, y1) - margin,
+                    max(x0, x1) + margin,
+                    max(y0, y1) + margin,
+                ),
+            )
+            return
+
         start_x, start_y = self._translate_position(board_index, start_x, start_y)
         end_x, end_y = self._translate_position(board_index, end_x, end_y)
 
@@ -260,11 +478,37 @@ class GameCanvas:
         stroke="transparent",
         stroke_width=2,
         board_index=0,
+        element_id: Any = None,
     ):
         """
         Draws the given rectangle with the top-left corner at `(start_x, start_y)` (in map pixels) and with the specified `width` and `height` (in map pixels) with the given stroke and fill.
         """
 
+        if self._frame is not None:
+            x0, y0 = self._translate_position(board_index, start_x, start_y)
+            margin = stroke_width * self._scale / 2
+            self._record(
+                element_id,
+                self.draw_rectangle,
+                (
+                    start_x,
+                    start_y,
+                    width,
+                    height,
+                    fill,
+                    stroke,
+                    stroke_width,
+                    board_index,
+                ),
+                (
+                    x0 - margin,
+                    y0 - margin,
+                    x0 + width * self._scale + margin,
+                    y0 + height * self._scale + margin,
+                ),
+            )
+            return
+
         start_x, start_y = self._translate_position(board_index, start_x, start_y)
         width *= self._scale
         height *= self._scale
@@ -286,11 +530,28 @@ class GameCanvas:
         stroke="transparent",
         stroke_width=2,
         board_index=0,
+        element_id: Any = None,
     ):
         """
         Draws the given circle (with the given stroke and fill) in the given coordinates and with the given radius (in map pixels).
         """
 
+        if self._frame is not None:
+            center_x, center_y = self._translate_position(board_index, x, y)
+            extent = (radius + stroke_width / 2) * self._scale
+            self._record(
+                element_id,
+                self.draw_circle,
+                (x, y, radius, fill, stroke, stroke_width, board_index),
+                (
+                    center_x - extent,
+                    center_y - extent,
+                    center_x + extent,
+                    center_y + extent,
+                ),
+            )
+            return
+
         x, y = self._translate_position(board_index, x, y)
 
         self.context.fillStyle = fill
@@ -304,12 +565,36 @@ class GameCanvas:
     def clear(self):
         """Clears the canvas and re-draws the players' maps."""
 
+        if self._background is None:
+            from js import OffscreenCanvas
+
+            self._background = OffscreenCanvas.new(
+                self.canvas.width, self.canvas.height
+            )
+            self._draw_background(self._background.getContext("2d"))
+
         self.context.clearRect(0, 0, self.canvas.width, self.canvas.height)
-        self.context.fillStyle = "#fff"
-        self.context.fillRect(0, 0, self.canvas.width, self.canvas.height)
+        self.context.drawImage(self._background, 0, 0)
+
+    @property
+    def text_cache_hit_rate(self) -> float:
+        """The fraction of the calls to :func:`draw_text` with ``cache`` which reused a bitmap."""
+
+        calls = self.text_cache_hits + self.text_cache_misses
+        return 0.0 if calls == 0 else self.text_cache_hits / calls
+
+    @property
+    def total_width(self) -> float:
+        """The total width of the canvas (in map pixels)."""
+
+        return self.map_image.width * self.player_count
+
+    def _draw_background(self, context: Any):
+        context.fillStyle = "#fff"
+        context.fillRect(0, 0, self.canvas.width, self.canvas.height)
 
         for i in range(self.player_count):
-            self.context.drawImage(
+            context.drawImage(
                 self.map_image,
                 i * self.canvas.width / self.player_count,
                 0,
@@ -317,11 +602,65 @@ class GameCanvas:
                 self.map_image.height * self._scale,
             )
 
-    @property
-    def total_width(self) -> float:
-        """The total width of the canvas (in map pixels)."""
+    def _record(
+        self,
+        element_id: Any,
+        method: Callable[..., None],
+        args: Tuple[Any, ...],
+        bounds: Tuple[float, float, float, float],
+    ):
+        assert self._frame is not None
+        x0, y0, x1, y1 = bounds
+        if element_id is None:
+            # Elements without an id are matched by their position among the elements without an id.
+            element_id = ("", self._anonymous_count)
+            self._anonymous_count += 1
+        self._frame.append(
+            _Element(
+                element_id,
+                method,
+                args,
+                # Leave room for antialiasing.
+                (
+                    math.floor(x0) - 2,
+                    math.floor(y0) - 2,
+                    math.ceil(x1) + 2,
+                    math.ceil(y1) + 2,
+                ),
+            )
+        )
 
-        return self.map_image.width * self.player_count
+    def _get_text_bitmap(self, text: str, color: str, text_size: float, font: str):
+        key = (text, color, text_size, font)
+        bitmap = self._text_cache.pop(key, None)
+        if bitmap is not None:
+            self.text_cache_hits += 1
+        else:
+            from js import OffscreenCanvas
+
+            self.text_cache_misses += 1
+            self._set_font(text_size, font)
+            # Leave room for glyphs which extend beyond the measured width and the font size.
+            width = math.ceil(self.context.measureText(text).width) + 4
+            height = math.ceil(text_size * self._scale * 8 / 3) + 4
+            bitmap = OffscreenCanvas.new(width, height)
+            context = bitmap.getContext("2d")
+            context.font = self.context.font
+            context.textAlign = "center"
+            context.textBaseline = "middle"
+            context.fillStyle = color
+            context.fillText(text, width / 2, height / 2)
+            while len(self._text_cache) >= max(1, self.text_cache_size):
+                del self._text_cache[next(iter(self._text_cache))]
+
+        # Keep the most recently used bitmaps last.
+        self._text_cache[key] = bitmap
+        return bitmap
+
+    def _set_font(self, text_size: float, font: str):
+        if font != "":
+            font += ", "
+        self.context.font = f"{text_size * self._scale}pt {font}system-ui, -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, Cantarell, 'Open Sans', 'Helvetica Neue', sans-serif, 'Noto Emoji'"
 
     def _fit_into(self, max_width: int, max_height: int):
         from js import window
@@ -343,6 +682,10 @@ class GameCanvas:
         self.context = self.canvas.getContext("2d")
         self.context.textAlign = "center"
         self.context.textBaseline = "middle"
+        # Everything is repainted at the new size.
+        self._background = None
+        self._previous_frame = []
+        self._text_cache = {}
 
         self.canvas_map_width = (
             self.canvas.width - self._scale * self.extra_width
@@ -363,3 +706,460 @@ class GameCanvas:
         width *= self._scale
         height = width / aspect_ratio
         return width, height
+
+
+def _clip_rectangle(
+    rectangle: Tuple[int, int, int, int], width: float, height: float
+) -> Tuple[int, int, int, int]:
+    x0, y0, x1, y1 = rectangle
+    return (
+        max(0, x0),
+        max(0, y0),
+        max(0, min(int(width), x1)),
+        max(0, min(int(height), y1)),
+    )
+
+
+def _merge_rectangles(
+    rectangles: List[Tuple[int, int, int, int]],
+) -> List[Tuple[int, int, int, int]]:
+    """Replaces overlapping rectangles with their bounding rectangle until none overlap, and drops empty rectangles."""
+
+    merged: List[Tuple[int, int, int, int]] = []
+    for rectangle in rectangles:
+        x0, y0, x1, y1 = rectangle
+        if x0 >= x1 or y0 >= y1:
+            continue
+        i = 0
+        while i < len(merged):
+            mx0, my0, mx1, my1 = merged[i]
+            if mx0 < x1 and x0 < mx1 and my0 < y1 and y0 < my1:
+                x0, y0, x1, y1 = min(x0, mx0), min(y0, my0), max(x1, mx1), max(y1, my1)
+                merged.pop(i)
+                # The grown rectangle may overlap rectangles which were already checked.
+                i = 0
+            else:
+                i += 1
+        merged.append((x0, y0, x1, y1))
+    return merged
+
+
+_numpy_module: Any = None
+
+
+def _numpy():
+    """Returns the NumPy module, or ``None`` if it isn't installed."""
+
+    global _numpy_module
+    if _numpy_module is None:
+        try:
+            import numpy  # type: ignore
+
+            _numpy_module = numpy
+        except ImportError:
+            _numpy_module = False
+    return _numpy_module or None
+
+
+class EntityStore:
+    """
+    A struct-of-arrays container for many entities (such as units) of a game state, with a typed :class:`array.array` column per attribute.
+
+    Every entity gets a stable id, which keeps referring to it when other entities are removed.
+    Rows are kept dense by moving the last row into the place of a removed row, so the order of rows changes on removal.
+    Columns can be updated in bulk with :func:`apply`, which runs on NumPy arrays if NumPy is installed.
+
+    For example, ``EntityStore(x="d", y="d", health="i", owner="B")`` (the values are :mod:`array` type codes).
+
+    .. warning::
+       Adding and removing entities fails while a NumPy array or ``memoryview`` of a column exists, so don't keep them around.
+    """
+
+    def __init__(self, **columns: str):
+        from array import array
+
+        self.typecodes = dict(columns)
+        self._columns = {name: array(typecode) for name, typecode in columns.items()}
+        self._ids = array("q")
+        self._rows: Dict[int, int] = {}
+        self._next_id = 0
+
+    def add(self, **values: Any) -> int:
+        """Adds an entity with the given column values (0 for missing columns) and returns its id."""
+
+        entity_id = self._next_id
+        self._next_id += 1
+        self._rows[entity_id] = len(self._ids)
+        self._ids.append(entity_id)
+        for name, column in self._columns.items():
+            column.append(values.get(name, 0))
+        return entity_id
+
+    def add_many(self, count: int, **columns: Sequence[Any]) -> range:
+        """Adds ``count`` entities with the given values of each column (0 for missing columns) and returns their ids."""
+
+        ids = range(self._next_id, self._next_id + count)
+        for name, values in columns.items():
+            if len(values) != count:
+                raise ValueError(
+                    f"Expected {count} values of {name}, got {len(values)}."
+                )
+        for name, column in self._columns.items():
+            if name in columns:
+                column.extend(columns[name])
+            else:
+                column.frombytes(bytes(count * column.itemsize))
+
+        self._next_id += count
+        first_row = len(self._ids)
+        self._ids.extend(ids)
+        self._rows.update(zip(ids, range(first_row, first_row + count)))
+        return ids
+
+    def remove(self, entity_id: int):
+        row = self._rows.pop(entity_id)
+        last = len(self._ids) - 1
+        if row != last:
+            for column in self._columns.values():
+                column[row] = column[last]
+            moved = self._ids[last]
+            self._ids[row] = moved
+            self._rows[moved] = row
+        for column in self._columns.values():
+            column.pop()
+        self._ids.pop()
+
+    def remove_many(self, entity_ids: Iterable[int]):
+        for entity_id in entity_ids:
+            self.remove(entity_id)
+
+    @property
+    def ids(self) -> List[int]:
+        """The ids of the entities, in the order of the rows."""
+
+        return self._ids.tolist()
+
+    def row(self, entity_id: int) -> int:
+        return self._rows[entity_id]
+
+    def column(self, name: str) -> "array":
+        """The values of the given column, in the order of the rows. Modifying them modifies the entities."""
+
+        return self._columns[name]
+
+    def get(self, entity_id: int, name: str) -> Any:
+        return self._columns[name][self._rows[entity_id]]
+
+    def set(self, entity_id: int, name: str, value: Any):
+        self._columns[name][self._rows[entity_id]] = value
+
+    def view(self, entity_id: int) -> EntityView:
+        """Returns a read-only view of the given entity, which can be handed to bots."""
+
+        if entity_id not in self._rows:
+            raise KeyError(entity_id)
+        return EntityView(self, entity_id)
+
+    def views(self) -> List[EntityView]:
+        """Returns read-only views of all entities, in the order of the rows."""
+
+        return [EntityView(self, entity_id) for entity_id in self._ids]
+
+    def find(self, **conditions: Any) -> List[int]:
+        """Returns the ids of the entities whose columns equal all of the given values, for example ``find(owner=2)``."""
+
+        np = _numpy()
+        if np is not None and len(self._ids) != 0:
+            mask = np.ones(len(self._ids), dtype=bool)
+            for name, value in conditions.items():
+                mask &= self.numpy(name) == value
+            return np.frombuffer(self._ids, dtype=self._ids.typecode)[mask].tolist()
+
+        rows: Iterable[int] = range(len(self._ids))
+        for name, value in conditions.items():
+            column = self._columns[name]
+            rows = [row for row in rows if column[row] == value]
+        return [self._ids[row] for row in rows]
+
+    def apply(self, name: str, function: Callable[..., Any], *columns: str):
+        """
+        Sets the given column to the result of ``function`` on the given columns, for example ``apply("x", lambda x, dx: x + dx, "x", "dx")``.
+
+        If NumPy is installed, ``function`` is called once with a NumPy array of each column, and otherwise once for each row,
+        so it should only use operations which work on both (such as arithmetic). Results are converted to the column's type.
+        """
+
+        np = _numpy()
+        if len(self._ids) == 0:
+            return
+        if np is not None:
+            self.numpy(name)[:] = function(*[self.numpy(column) for column in columns])
+            return
+
+        target = self._columns[name]
+        convert: Callable[[Any], Any] = float if target.typecode in "fd" else int
+        for row, values in enumerate(
+            zip(*[self._columns[column] for column in columns])
+        ):
+            target[row] = convert(function(*values))
+
+    def numpy(self, name: str):
+        """Returns a NumPy array which shares the memory of the given column. Requires NumPy."""
+
+        np = _numpy()
+        if np is None:
+            raise ImportError("EntityStore.numpy requires NumPy.")
+        column = self._columns[name]
+        if len(column) == 0:
+            return np.zeros(0, dtype=column.typecode)
+        return np.frombuffer(column, dtype=column.typecode)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, entity_id: int):
+        return entity_id in self._rows
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._ids.tolist())
+
+
+class EntityView:
+    """
+    A read-only view of a single entity of an :class:`EntityStore`, whose attributes are the entity's current column values.
+
+    The view follows the entity when rows move, and raises a :class:`KeyError` once the entity is removed.
+    """
+
+    __slots__ = ("_store", "id")
+
+    _store: EntityStore
+    id: int
+
+    def __init__(self, store: EntityStore, entity_id: int):
+        object.__setattr__(self, "_store", store)
+        object.__setattr__(self, "id", entity_id)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        store = self._store
+        try:
+            column = store._columns[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        return column[store._rows[self.id]]
+
+    def __setattr__(self, name: str, value: Any):
+        from code_battles.views import ReadOnlyError
+
+        raise ReadOnlyError(f"Can't modify a read-only view of entity {self.id}.")
+
+    def __delattr__(self, name: str):
+        from code_battles.views import ReadOnlyError
+
+        raise ReadOnlyError(f"Can't modify a read-only view of entity {self.id}.")
+
+    def as_dict(self) -> Dict[str, Any]:
+        row = self._store._rows[self.id]
+        return {name: column[row] for name, column in self._store._columns.items()}
+
+    def __repr__(self):
+        values = ", ".join(
+            f"{name}={value!r}" for name, value in self.as_dict().items()
+        )
+        return f"EntityView(id={self.id}, {values})"
+
+    def __eq__(self, other: object):
+        return (
+            isinstance(other, EntityView)
+            and other._store is self._store
+            and other.id == self.id
+        )
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class SpatialHash:
+    """
+    A uniform grid over the map which finds the entities near a point without checking all of them,
+    for collisions, attack ranges and vision. Positions are in map pixels (the coordinates of :class:`GameCanvas` boards).
+
+    Entities are identified by any hashable id (such as :class:`EntityStore` ids). Moving an entity within its cell is almost free,
+    and :func:`rebuild` replaces all entities at once (for example, at the start of each step).
+    Positions outside the map are kept in the nearest edge cell.
+
+    :param cell_size: The width and height of each cell. A good value is around the typical query radius.
+    """
+
+    def __init__(self, width: float, height: float, cell_size: float):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self._columns = max(1, math.ceil(width / cell_size))
+        self._rows = max(1, math.ceil(height / cell_size))
+        self._cells: Dict[int, List[Any]] = {}
+        self._positions: Dict[Any, Tuple[float, float, int]] = {}
+
+    @staticmethod
+    def for_map(map_image: Any, cell_size: float) -> SpatialHash:
+        """Returns a spatial hash covering the given map image (anything with a ``width`` and a ``height``)."""
+
+        return SpatialHash(map_image.width, map_image.height, cell_size)
+
+    def insert(self, entity_id: Any, x: float, y: float):
+        if entity_id in self._positions:
+            self.move(entity_id, x, y)
+            return
+        cell = self._cell(x, y)
+        self._positions[entity_id] = (x, y, cell)
+        self._cells.setdefault(cell, []).append(entity_id)
+
+    def move(self, entity_id: Any, x: float, y: float):
+        _, _, old_cell = self._positions[entity_id]
+        cell = self._cell(x, y)
+        self._positions[entity_id] = (x, y, cell)
+        if cell != old_cell:
+            self._remove_from_cell(entity_id, old_cell)
+            self._cells.setdefault(cell, []).append(entity_id)
+
+    def remove(self, entity_id: Any):
+        _, _, cell = self._positions.pop(entity_id)
+        self._remove_from_cell(entity_id, cell)
+
+    def rebuild(self, ids: Iterable[Any], xs: Iterable[float], ys: Iterable[float]):
+        """Replaces all entities with the given ones, for example ``rebuild(store.ids, store.column("x"), store.column("y"))``."""
+
+        cell_size = self.cell_size
+        last_column = self._columns - 1
+        last_row = self._rows - 1
+        cells: Dict[int, List[Any]] = {}
+        positions: Dict[Any, Tuple[float, float, int]] = {}
+        for entity_id, x, y in zip(ids, xs, ys):
+            column = min(max(int(x // cell_size), 0), last_column)
+            row = min(max(int(y // cell_size), 0), last_row)
+            cell = row * self._columns + column
+            positions[entity_id] = (x, y, cell)
+            entities = cells.get(cell)
+            if entities is None:
+                cells[cell] = [entity_id]
+            else:
+                entities.append(entity_id)
+
+        self._cells = cells
+        self._positions = positions
+
+    def position(self, entity_id: Any) -> Tuple[float, float]:
+        x, y, _ = self._positions[entity_id]
+        return x, y
+
+    def query_radius(self, x: float, y: float, radius: float) -> List[Any]:
+        """Returns the ids of the entities within ``radius`` of the given point (including its edge), in no particular order."""
+
+        first_column, first_row = self._cell_position(x - radius, y - radius)
+        last_column, last_row = self._cell_position(x + radius, y + radius)
+        squared_radius = radius * radius
+        cells = self._cells
+        positions = self._positions
+
+        result = []
+        for row in range(first_row, last_row + 1):
+            start = row * self._columns
+            for cell in range(start + first_column, start + last_column + 1):
+                entities = cells.get(cell)
+                if entities is None:
+                    continue
+                for entity_id in entities:
+                    ex, ey, _ = positions[entity_id]
+                    if (ex - x) * (ex - x) + (ey - y) * (ey - y) <= squared_radius:
+                        result.append(entity_id)
+        return result
+
+    def nearest(
+        self,
+        x: float,
+        y: float,
+        k=1,
+        max_radius: Optional[float] = None,
+        exclude: Optional[Any] = None,
+    ) -> List[Any]:
+        """
+        Returns the ids of the ``k`` entities closest to the given point, from the closest.
+
+        The point may be outside the map.
+
+        :param max_radius: Ignore entities farther than this.
+        :param exclude: An id to skip, such as the id of the entity which is looking for its neighbors.
+        """
+
+        import heapq
+
+        cell_size = self.cell_size
+        center_column, center_row = self._cell_position(x, y)
+        max_ring = max(self._columns, self._rows)
+        if max_radius is not None:
+            max_ring = min(max_ring, int(max_radius // cell_size) + 1)
+        cells = self._cells
+        positions = self._positions
+
+        candidates: List[Tuple[float, Any]] = []
+        for ring in range(max_ring + 1):
+            for row in range(center_row - ring, center_row + ring + 1):
+                if not 0 <= row < self._rows:
+                    continue
+                edge = row in (center_row - ring, center_row + ring)
+                step = 1 if edge else 2 * ring
+                for column in range(
+                    center_column - ring, center_column + ring + 1, step
+                ):
+                    if not 0 <= column < self._columns:
+                        continue
+                    for entity_id in cells.get(row * self._columns + column, ()):
+                        if entity_id == exclude:
+                            continue
+                        ex, ey, _ = positions[entity_id]
+                        candidates.append(((ex - x) ** 2 + (ey - y) ** 2, entity_id))
+
+            # Entities in further rings are at least this far away. This holds for points (and entities) outside the map too:
+            # they are searched from the nearest edge cell, and clamping both positions to the map never makes them farther apart.
+            if len(candidates) >= k:
+                bound = ring * cell_size
+                closest = heapq.nsmallest(
+                    k, candidates, key=lambda candidate: candidate[0]
+                )
+                if closest[-1][0] <= bound * bound:
+                    candidates = closest
+                    break
+
+        if max_radius is not None:
+            squared_radius = max_radius * max_radius
+            candidates = [c for c in candidates if c[0] <= squared_radius]
+        return [
+            entity_id
+            for _, entity_id in heapq.nsmallest(
+                k, candidates, key=lambda candidate: candidate[0]
+            )
+        ]
+
+    def _cell_position(self, x: float, y: float) -> Tuple[int, int]:
+        return (
+            min(max(int(x // self.cell_size), 0), self._columns - 1),
+            min(max(int(y // self.cell_size), 0), self._rows - 1),
+        )
+
+    def _cell(self, x: float, y: float) -> int:
+        column, row = self._cell_position(x, y)
+        return row * self._columns + column
+
+    def _remove_from_cell(self, entity_id: Any, cell: int):
+        entities = self._cells[cell]
+        entities.remove(entity_id)
+        if len(entities) == 0:
+            del self._cells[cell]
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, entity_id: Any):
+        return entity_id in self._positions
@@ -0,0 +1,336 @@
+"""Cheap read-only views over game state, which can be handed to bots instead of copies."""
+
+from __future__ import annotations
+
+import copy
+from collections.abc import KeysView
+from enum import Enum
+from types import BuiltinFunctionType, FunctionType, MethodType
+from typing import Any, Iterator
+
+from code_battles.utilities import EntityView
+
+_IMMUTABLE_TYPES = (int, float, complex, str, bytes, bool, type(None), Enum, range)
+_EXACT_IMMUTABLE_TYPES = frozenset(
+    [int, float, complex, str, bytes, bool, type(None), range]
+)
+
+
+class ReadOnlyError(TypeError):
+    """Raised when a read-only view is modified, or used after it was invalidated."""
+
+
+class ViewScope:
+    """A group of views which are invalidated together, for example at the end of a step."""
+
+    __slots__ = ("valid",)
+
+    def __init__(self):
+        self.valid = True
+
+    def invalidate(self):
+        self.valid = False
+
+
+def read_only(value: Any, scope: ViewScope) -> Any:
+    """
+    Returns a read-only view of the given value, which belongs to the given scope.
+
+    Creating a view takes constant time: nested values are wrapped only when they are accessed.
+    Immutable values, functions, classes and :class:`code_battles.utilities.EntityView` objects are returned as is, ``bytearray`` and ``array`` become read-only memory views,
+    dictionaries, lists, tuples and sets become the corresponding views, and any other object becomes a :class:`ObjectView`.
+
+    Views support the operations of their values which don't modify them, such as concatenating lists or intersecting sets.
+    Shallow copies (``view.copy()`` or ``copy.copy(view)``) are regular, modifiable containers whose items are still views (which are invalidated with the scope),
+    while ``copy.deepcopy(view)`` returns a regular, modifiable copy of the entire value, which bots can keep between steps.
+    The value itself isn't available through the view's attributes.
+    """
+
+    if type(value) in _EXACT_IMMUTABLE_TYPES:
+        return value
+    if isinstance(value, (_View, EntityView)) or isinstance(value, _IMMUTABLE_TYPES):
+        return value
+    if isinstance(value, dict):
+        return DictView(value, scope)
+    if isinstance(value, (list, tuple)):
+        return SequenceView(value, scope)
+    if isinstance(value, (set, frozenset)):
+        return SetView(value, scope)
+    if isinstance(value, memoryview):
+        return value.toreadonly()
+    if isinstance(value, bytearray) or type(value).__name__ == "array":
+        return memoryview(value).toreadonly()
+    if isinstance(value, (type, FunctionType, BuiltinFunctionType)):
+        return value
+    return ObjectView(value, scope)
+
+
+class _View:
+    __slots__ = ("_target", "_scope")
+
+    def __init__(self, target: Any, scope: ViewScope):
+        _TARGET.__set__(self, target)
+        _SCOPE.__set__(self, scope)
+
+    def __setattr__(self, name: str, value: Any):
+        _reject(self)
+
+    def __delattr__(self, name: str):
+        _reject(self)
+
+    def __repr__(self):
+        return repr(_get(self))
+
+    def __str__(self):
+        return str(_get(self))
+
+    def __eq__(self, other: object):
+        return _get(self) == _unwrap(other)
+
+    def __lt__(self, other: Any):
+        return _get(self) < _unwrap(other)
+
+    def __le__(self, other: Any):
+        return _get(self) <= _unwrap(other)
+
+    def __gt__(self, other: Any):
+        return _get(self) > _unwrap(other)
+
+    def __ge__(self, other: Any):
+        return _get(self) >= _unwrap(other)
+
+    def __hash__(self):
+        return hash(_get(self))
+
+    def __bool__(self):
+        return bool(_get(self))
+
+    def __len__(self):
+        return len(_get(self))
+
+    def __contains__(self, item: Any):
+        return _unwrap(item) in _get(self)
+
+    def __iter__(self) -> Iterator[Any]:
+        for value in _get(self):
+            yield _wrap(self, value)
+
+    def __copy__(self):
+        return copy.copy(_get(self))
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(_get(self), memo)
+
+    def __reduce__(self):
+        _reject(self)
+
+
+# The slots are only accessible through these descriptors, so the value can't be reached through the view's attributes.
+_TARGET = _View.__dict__["_target"]
+_SCOPE = _View.__dict__["_scope"]
+delattr(_View, "_target")
+delattr(_View, "_scope")
+
+
+def _get(view: _View) -> Any:
+    if not _SCOPE.__get__(view).valid:
+        raise ReadOnlyError(
+            "This view is no longer valid, since the step it was created in is over."
+        )
+    return _TARGET.__get__(view)
+
+
+def _wrap(view: _View, value: Any) -> Any:
+    return read_only(value, _SCOPE.__get__(view))
+
+
+def _unwrap(value: Any) -> Any:
+    return _get(value) if isinstance(value, _View) else value
+
+
+def _shallow(value: Any) -> Any:
+    """Returns a shallow copy of a view (whose items are views), or the given value if it isn't a view."""
+
+    return value.__copy__() if isinstance(value, _View) else value
+
+
+def _reject(view: _View, *args, **kwargs):
+    raise ReadOnlyError(f"Can't modify a read-only view of {_get(view)!r}.")
+
+
+class SequenceView(_View):
+    """A read-only view of a list or a tuple."""
+
+    __slots__ = ()
+
+    def __getitem__(self, index):
+        return _wrap(self, _get(self)[index])
+
+    def __reversed__(self):
+        for value in reversed(_get(self)):
+            yield _wrap(self, value)
+
+    def __add__(self, other: Any):
+        return self.copy() + _shallow(other)
+
+    def __radd__(self, other: Any):
+        return _shallow(other) + self.copy()
+
+    def __mul__(self, count: int):
+        return self.copy() * count
+
+    __rmul__ = __mul__
+
+    def index(self, *args):
+        return _get(self).index(*args)
+
+    def count(self, value: Any):
+        return _get(self).count(value)
+
+    def copy(self):
+        """Returns a list (or a tuple) of the items, as views."""
+
+        return list(self) if isinstance(_get(self), list) else tuple(self)
+
+    __copy__ = copy
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _reject
+    append = extend = insert = pop = remove = clear = sort = reverse = _reject
+
+
+class DictView(_View):
+    """A read-only view of a dictionary."""
+
+    __slots__ = ()
+
+    def __getitem__(self, key: Any):
+        return _wrap(self, _get(self)[key])
+
+    def __reversed__(self):
+        return reversed(_get(self))
+
+    def __or__(self, other: Any):
+        return self.copy() | _shallow(other)
+
+    def __ror__(self, other: Any):
+        return _shallow(other) | self.copy()
+
+    def get(self, key: Any, default: Any = None):
+        return _wrap(self, _get(self).get(key, default))
+
+    def keys(self):
+        # Unlike the dictionary's own keys view, this one doesn't expose the dictionary through ``mapping``.
+        return KeysView(self)
+
+    def values(self):
+        for value in _get(self).values():
+            yield _wrap(self, value)
+
+    def items(self):
+        for key, value in _get(self).items():
+            yield key, _wrap(self, value)
+
+    def copy(self):
+        """Returns a dictionary with the same keys, whose values are views."""
+
+        return dict(self.items())
+
+    __copy__ = copy
+    __setitem__ = __delitem__ = __ior__ = _reject
+    update = pop = popitem = setdefault = clear = _reject
+
+
+class SetView(_View):
+    """A read-only view of a set."""
+
+    __slots__ = ()
+
+    def __or__(self, other: Any):
+        return self.copy() | _shallow(other)
+
+    def __ror__(self, other: Any):
+        return _shallow(other) | self.copy()
+
+    def __and__(self, other: Any):
+        return self.copy() & _shallow(other)
+
+    def __rand__(self, other: Any):
+        return _shallow(other) & self.copy()
+
+    def __sub__(self, other: Any):
+        return self.copy() - _shallow(other)
+
+    def __rsub__(self, other: Any):
+        return _shallow(other) - self.copy()
+
+    def __xor__(self, other: Any):
+        return self.copy() ^ _shallow(other)
+
+    def __rxor__(self, other: Any):
+        return _shallow(other) ^ self.copy()
+
+    def union(self, *others: Any):
+        return self.copy().union(*map(_shallow, others))
+
+    def intersection(self, *others: Any):
+        return self.copy().intersection(*map(_shallow, others))
+
+    def difference(self, *others: Any):
+        return self.copy().difference(*map(_shallow, others))
+
+    def symmetric_difference(self, other: Any):
+        return self.copy().symmetric_difference(_shallow(other))
+
+    def issubset(self, other: Any):
+        return _get(self).issubset(_unwrap(other))
+
+    def issuperset(self, other: Any):
+        return _get(self).issuperset(_unwrap(other))
+
+    def isdisjoint(self, other: Any):
+        return _get(self).isdisjoint(_unwrap(other))
+
+    def copy(self):
+        """Returns a set (or a frozenset) of the items, as views."""
+
+        return set(self) if isinstance(_get(self), set) else frozenset(self)
+
+    __copy__ = copy
+    __isub__ = __iand__ = __ior__ = __ixor__ = _reject
+    add = discard = remove = pop = clear = update = _reject
+    difference_update = intersection_update = symmetric_difference_update = _reject
+
+
+class ObjectView(_View):
+    """
+    A read-only view of any other object.
+
+    Attributes are wrapped in views when accessed, and methods run with the view as ``self``, so methods which modify the object fail.
+    ``isinstance`` checks against the object's class work as usual.
+    """
+
+    __slots__ = ()
+
+    @property  # type: ignore
+    def __class__(self):
+        return _get(self).__class__
+
+    def __getattr__(self, name: str):
+        target = _get(self)
+        value = getattr(target, name)
+        if type(value) is MethodType and value.__self__ is target:
+            return MethodType(value.__func__, self)
+        return _wrap(self, value)
+
+    def __getitem__(self, key: Any):
+        return _wrap(self, _get(self)[key])
+
+    def __copy__(self):
+        # A shallow copy of the object whose attributes are views, like the shallow copies of containers.
+        copied = copy.copy(_get(self))
+        attributes = getattr(copied, "__dict__", None)
+        if attributes is not None:
+            for name, value in attributes.items():
+                attributes[name] = _wrap(self, value)
+        return copied
+
+    __setitem__ = __delitem__ = _reject
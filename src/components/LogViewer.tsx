@@ -37,6 +37,24 @@ const LogViewer: React.FC<Props> = ({ playerNames }) => {
         setLogs((l) => [...l, { playerIndex, text, color }])
       }
     }
+    // @ts-ignore
+    window.consoleLogBatch = (entries: string) => {
+      const con = document.getElementById("console")
+      if (con) {
+        const batch: Log[] = JSON.parse(entries).map(
+          (entry: {
+            player_index: number | null
+            text: string
+            color: string
+          }) => ({
+            playerIndex: entry.player_index ?? -1,
+            text: entry.text,
+            color: entry.color,
+          })
+        )
+        setLogs((l) => [...l, ...batch])
+      }
+    }
   }, [])
 
   useEffect(() => {
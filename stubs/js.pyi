@@ -42,12 +42,16 @@ class CanvasRenderingContext2D:
     @staticmethod
     def fillRect(x: float, y: float, width: float, height: float): ...
     @staticmethod
-    def drawImage(image: "Image", x: float, y: float, width: float, height: float): ...
+    def drawImage(image: Any, *coordinates: float): ...
     @staticmethod
     def clearRect(startX: float, endX: float, width: float, height: float): ...
     @staticmethod
     def rect(startX: float, endX: float, width: float, height: float): ...
     @staticmethod
+    def clip(): ...
+    @staticmethod
+    def measureText(text: str) -> "TextMetrics": ...
+    @staticmethod
     def save(): ...
     @staticmethod
     def restore(): ...
@@ -56,6 +60,9 @@ class CanvasRenderingContext2D:
     @staticmethod
     def rotate(radians: float): ...
 
+class TextMetrics:
+    width: float
+
 class Styles:
     width: str
     height: str
@@ -133,6 +140,11 @@ class Image(Element):
     onload: Callable[[Event], None]
     onerror: Callable[[Event], None]
 
+class OffscreenCanvas:
+    @staticmethod
+    def new(width: float, height: float) -> "OffscreenCanvas": ...
+    def getContext(self, dimensions: str) -> Any: ...
+
 def clearInterval(id: int) -> None: ...
 def setInterval(fn: JsCallable, period: float) -> int: ...
 def setTimeout(fn: JsCallable, period: float) -> None: ...
@@ -0,0 +1,3 @@
+from io import StringIO
+
+def open_url(url: str) -> StringIO: ...
@@ -1,15 +1,20 @@
 from __future__ import annotations
 
 import json
+import math
 import os
 import sys
+import types
 from pathlib import Path
 from typing import Dict, List
 
+import pytest
 from pytest import MonkeyPatch
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
-from code_battles.battles import CodeBattles, Simulation
+from code_battles.battles import CodeBattles, Simulation, SimulationResult
+from code_battles.jobs import JobQueue, run_worker
+from code_battles.results import StatisticsSink, StatisticsTable
 
 
 def snapshot_test(
@@ -51,3 +56,1308 @@ def snapshot_test(
             assert (
                 simulation.decisions == Simulation.load(test_path.read_text()).decisions
             ), "Wrong decisions!"
+
+
+class _Context:
+    def __init__(self, game: "_Game", player_index: int):
+        self._game = game
+        self.player_index = player_index
+
+    def alive(self):
+        return list(self._game.active_players)
+
+    def hp(self, player_index: int):
+        return self._game.state["hp"][player_index]
+
+    def attack(self, target: int, strength: int):
+        self._game.player_requests[self.player_index] = {
+            "target": target,
+            "strength": strength,
+        }
+
+    def log(self, text: str):
+        self._game.log(text, self.player_index)
+
+
+class _Bot:
+    def __init__(self, context: _Context):
+        self.context = context
+
+    def run(self):
+        pass
+
+
+_api = types.ModuleType("api")
+_api.CodeBattlesBot = _Bot  # type: ignore[attr-defined]
+
+
+class _Game(CodeBattles):
+    """A minimal game where each player attacks another player every step, until one player is left or 200 steps pass."""
+
+    def __init__(self, execution="sequential"):
+        self.execution = execution
+
+    def render(self):
+        pass
+
+    def get_api(self):
+        return _api
+
+    def create_initial_state(self):
+        return {"hp": [100 for _ in self.player_names]}
+
+    def create_initial_player_requests(self, player_index: int):
+        return {"target": None, "strength": 0}
+
+    def create_api_implementation(self, player_index: int):
+        return _Context(self, player_index)
+
+    def make_decisions(self):
+        for player_index in self.active_players:
+            self.player_requests[player_index] = {"target": None, "strength": 0}
+        self.run_bot_methods("run")
+        decisions = []
+        for player_index in self.active_players:
+            requests = self.player_requests[player_index]
+            if requests["target"] in self.active_players:
+                decisions.append(
+                    [
+                        requests["target"],
+                        min(10, requests["strength"])
+                        + self.make_decisions_random.randint(0, 3),
+                    ]
+                )
+        return json.dumps(decisions).encode()
+
+    def apply_decisions(self, decisions: bytes):
+        for target, damage in json.loads(decisions):
+            self.state["hp"][target] -= damage
+        for player_index in list(self.active_players):
+            if self.state["hp"][player_index] <= 0:
+                self.eliminate_player(player_index, "No health left")
+        if self.step >= 200:
+            for player_index in list(self.active_players[1:]):
+                self.eliminate_player(player_index, "Out of time")
+
+    def configure_bot_execution(self):
+        return self.execution
+
+
+ATTACKER = """
+class MyBot(CodeBattlesBot):
+    def run(self):
+        others = [p for p in self.context.alive() if p != self.context.player_index]
+        self.context.attack(min(others, key=self.context.hp), random.randint(0, 6))
+        self.context.log("attacking")
+"""
+
+CRASHER = """
+class MyBot(CodeBattlesBot):
+    def __init__(self, context):
+        super().__init__(context)
+        self.steps = 0
+
+    def run(self):
+        self.steps += 1
+        if self.steps % 7 == 0:
+            raise ValueError("step %d" % self.steps)
+        others = [p for p in self.context.alive() if p != self.context.player_index]
+        self.context.attack(others[0], 4)
+"""
+
+CHATTY = """
+class MyBot(CodeBattlesBot):
+    def run(self):
+        for i in range(random.randint(0, 150)):
+            self.context.log("message %d" % i)
+        others = [p for p in self.context.alive() if p != self.context.player_index]
+        self.context.attack(others[0], random.randint(0, 10))
+"""
+
+
+def test_cli_output_is_json_lines(tmp_path: Path, capsys):
+    from code_battles.cli import main
+
+    attacker = tmp_path / "attacker.py"
+    attacker.write_text(ATTACKER)
+    crasher = tmp_path / "crasher.py"
+    crasher.write_text(CRASHER)
+    main(
+        _Game(),
+        [
+            "simulate",
+            str(attacker),
+            str(crasher),
+            "--seed",
+            "3",
+            "--progress-interval",
+            "0",
+        ],
+    )
+
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    alerts = [event for event in events if event["event"] == "alert"]
+    assert len(alerts) != 0
+    assert "ValueError" in alerts[0]["alert"]
+    assert events[-1]["event"] == "result"
+    assert events[-1]["errors"][1] != 0
+
+
+def test_cli_rejects_malformed_parameters(tmp_path: Path, capsys):
+    from code_battles.cli import main
+
+    attacker = tmp_path / "attacker.py"
+    attacker.write_text(ATTACKER)
+    with pytest.raises(SystemExit) as exit_info:
+        main(
+            _Game(),
+            ["simulate", str(attacker), str(attacker), "--parameter", "map"],
+        )
+    assert exit_info.value.code == 2
+    output = capsys.readouterr()
+    assert output.out == ""
+    assert output.err.startswith("usage:") and "KEY=VALUE, got 'map'" in output.err
+
+
+def _simulate_logs(execution: str):
+    game = _Game(execution)
+    game._run_headless_simulation(
+        {"map": "Arena"}, ["A", "B", "C"], [CHATTY, CHATTY, ATTACKER], 11
+    )
+    return game._logs
+
+
+def test_process_logs_match_sequential_logs():
+    sequential = _simulate_logs("sequential")
+    assert any(
+        entry["text"].endswith("messages suppressed")
+        for entries in sequential
+        for entry in entries
+    )
+    assert _simulate_logs("process") == sequential
+
+
+def test_bot_threads_match_sequential_runs(monkeypatch: MonkeyPatch):
+    import code_battles.threads
+    from code_battles.threads import BotThreads
+
+    runs = []
+    run = BotThreads.run
+    monkeypatch.setattr(code_battles.threads, "is_free_threaded", lambda: True)
+    monkeypatch.setattr(
+        BotThreads, "run", lambda self, *args: runs.append(args) or run(self, *args)
+    )
+
+    simulations = []
+    for execution in ["sequential", "thread"]:
+        game = _Game(execution)
+        alerts: List[Dict] = []
+        result = game._run_headless_simulation(
+            {"map": "Arena"},
+            ["A", "B", "C", "D"],
+            [CHATTY, CRASHER, ATTACKER, CRASHER],
+            5,
+            record=True,
+            on_alerts=alerts.extend,
+        )
+        simulations.append(
+            (
+                list(game._decisions),
+                game._logs,
+                alerts,
+                (result.places, result.steps, result.errors),
+            )
+        )
+    sequential, threaded = simulations
+
+    assert len(runs) > 0
+    assert threaded == sequential
+    # The exceptions are reported for the players whose bots raised them.
+    assert [alert["title"] for alert in sequential[2]][:2] == [
+        "Code Exception in 'Player 2' API!",
+        "Code Exception in 'Player 4' API!",
+    ]
+    errors = sequential[3][2]
+    assert errors[0] == errors[2] == 0 and errors[1] > 0 and errors[3] > 0
+
+
+def test_bot_processes_exit_when_closed():
+    import multiprocessing
+
+    from code_battles.processes import BotProcesses
+
+    game = _Game("process")
+    game.parameters = {"map": "Arena"}
+    game.player_names = ["A", "B"]
+    game._initialize_simulation([ATTACKER, CHATTY], 1)
+    processes = BotProcesses(game)
+    processes.run("run", [0, 1])
+    processes.close()
+    assert [process.exitcode for process in processes._processes] == [0, 0]
+    assert multiprocessing.active_children() == []
+
+
+def _result(match: int, statistics: Dict[str, float]):
+    return SimulationResult(
+        {"map": "Arena"}, ["A", "B"], match, [match % 2, 1 - match % 2], 10, statistics
+    )
+
+
+def test_statistics_csv_accepts_new_columns(tmp_path: Path):
+    path = str(tmp_path / "results.csv")
+    with StatisticsSink(path, chunk_size=1) as sink:
+        sink.add(_result(0, {"kills": 1}))
+        sink.add(_result(1, {"kills": 2, "player_3_run_calls": 5}))
+
+    table = StatisticsTable.load(path)
+    assert list(table.column("kills")) == [1, 1, 2, 2]
+    calls = list(table.column("player_3_run_calls"))
+    assert calls[2:] == [5, 5] and all(value != value for value in calls[:2])
+
+
+def test_statistics_npz_chunks_load_in_order(tmp_path: Path):
+    pytest.importorskip("numpy")
+    path = str(tmp_path / "results.npz")
+    with StatisticsSink(path, chunk_size=1) as sink:
+        for match in range(12):
+            sink.add(_result(match, {"score": match}))
+
+    assert list(StatisticsTable.load(path).column("seed")) == [
+        str(match) for match in range(12) for _ in range(2)
+    ]
+
+
+@pytest.mark.parametrize("extension", ["csv", "npz"])
+def test_statistics_sink_resumes_match_numbers(tmp_path: Path, extension: str):
+    if extension == "npz":
+        pytest.importorskip("numpy")
+    path = str(tmp_path / f"results.{extension}")
+    for run in range(3):
+        with StatisticsSink(path, chunk_size=2) as sink:
+            assert sink.matches == 3 * run
+            for match in range(3):
+                sink.add(_result(match, {"run": run}))
+
+    table = StatisticsTable.load(path)
+    assert list(table.column("match")) == [
+        match for match in range(9) for _ in range(2)
+    ]
+    assert list(table.column("run")) == [run for run in range(3) for _ in range(6)]
+
+
+def test_expired_leases_are_requeued_until_attempts_run_out(tmp_path: Path):
+    path = str(tmp_path / "queue.db")
+    queue = JobQueue(path, max_attempts=2)
+    # Leases and heartbeats through this queue expire immediately.
+    expiring = JobQueue(path, lease_seconds=-1, max_attempts=2)
+    job_id = queue.submit({"map": "Arena"}, ["A", "B"], [ATTACKER, ATTACKER], 1)
+
+    job = queue.lease("first")
+    assert job is not None and job.attempts == 1
+    assert queue.lease("second") is None
+    assert expiring.heartbeat(job_id, "first")
+    assert queue.requeue_expired() == 1
+    assert not queue.heartbeat(job_id, "first")
+
+    job = expiring.lease("second")
+    assert job is not None and job.attempts == 2
+    assert not queue.complete(job_id, "first", _result(0, {}))
+    assert queue.requeue_expired() == 1
+    assert queue.progress().failed == 1
+    assert queue.lease("third") is None
+
+
+def test_worker_runs_jobs_and_only_writes_files_it_completes(
+    tmp_path: Path, monkeypatch: MonkeyPatch
+):
+    import code_battles.jobs
+
+    queue = JobQueue(str(tmp_path / "queue.db"))
+    job_ids = [
+        queue.submit(
+            {"map": "Arena"},
+            ["A", "B"],
+            [ATTACKER, CRASHER],
+            seed,
+            str(tmp_path / f"{seed}.btl"),
+        )
+        for seed in range(3)
+    ]
+    monkeypatch.setattr(code_battles.jobs, "_MAX_VARIABLES", 2)
+    run_worker(_Game(), queue, "worker", exit_when_empty=True)
+    results = queue.wait(job_ids)
+    assert [result["errors"][0] for result in results] == [0, 0, 0]
+    assert sorted(os.listdir(tmp_path)) == ["0.btl", "1.btl", "2.btl", "queue.db"]
+
+    # A worker which lost the job's lease doesn't write the simulation file.
+    queue = JobQueue(str(tmp_path / "late.db"), lease_seconds=0.01, max_attempts=1)
+    queue.submit(
+        {"map": "Arena"}, ["A", "B"], [ATTACKER, ATTACKER], 3, str(tmp_path / "3.btl")
+    )
+    monkeypatch.setattr(queue, "complete", lambda *args: False)
+    run_worker(_Game(), queue, "late", poll_seconds=0.01, exit_when_empty=True)
+    assert queue.progress().failed == 1
+    assert sorted(os.listdir(tmp_path)) == [
+        "0.btl",
+        "1.btl",
+        "2.btl",
+        "late.db",
+        "queue.db",
+    ]
+
+
+def test_simulation_pool_stops_workers_on_errors():
+    import multiprocessing
+
+    from code_battles.pool import SimulationPool
+    from code_battles.tournament import Match
+
+    matches = [Match(["A", "B"], {"map": "Arena"}, seed) for seed in range(4)]
+    bots = {"A": ATTACKER, "B": CRASHER}
+    game = _Game()
+    expected = [
+        game._run_headless_simulation(
+            match.parameters, match.player_names, [ATTACKER, CRASHER], match.seed
+        ).places
+        for match in matches
+    ]
+
+    with pytest.raises(KeyboardInterrupt):
+        with SimulationPool(game, 2, bots=bots) as pool:
+            assert [result.places for result in pool.run_matches(matches)] == expected
+            raise KeyboardInterrupt()
+    assert pool._pool is None
+    assert multiprocessing.active_children() == []
+
+
+def test_fork_shares_decisions_and_drops_apply_logs():
+    game = _Game()
+    game.parameters = {"map": "Arena"}
+    game.player_names = ["A", "B", "C"]
+    game.verbose = False
+    game._initialize_simulation([ATTACKER, ATTACKER, ATTACKER], 5)
+    for _ in range(20):
+        game.advance()
+    game._log_sink.take(game.step)
+
+    fork = game.fork()
+    assert len(fork._decisions._frames) == 0
+    while not fork.over:
+        fork.advance()
+    assert len(fork._decisions) == 20 + len(fork._decisions._frames)
+    assert list(fork._decisions)[:20] == list(game._decisions)
+    assert fork._log_sink.take(fork.step) == []
+    assert game.step == 20 and len(game._decisions) == 20
+
+    # Replaying the fork's decisions from the same step gives the same simulation.
+    replay = game.fork()
+    for decisions in list(fork._decisions)[20:]:
+        replay.advance(decisions)
+    assert replay.state == fork.state and replay.active_players == fork.active_players
+
+
+def test_spatial_hash_nearest_outside_the_map():
+    import math
+    from random import Random
+
+    from code_battles.utilities import SpatialHash
+
+    random = Random(0)
+    for _ in range(500):
+        spatial_hash = SpatialHash(200, 100, 15)
+        positions = {}
+        for entity_id in range(random.randint(1, 30)):
+            # Some entities are outside the map too, and are kept in its edge cells.
+            positions[entity_id] = (random.uniform(-100, 300), random.uniform(-50, 150))
+            spatial_hash.insert(entity_id, *positions[entity_id])
+        x, y = random.uniform(-400, 600), random.uniform(-200, 300)
+        k = random.randint(1, 3)
+
+        distances = sorted(math.dist((x, y), p) for p in positions.values())[:k]
+        nearest = spatial_hash.nearest(x, y, k)
+        assert [math.dist((x, y), positions[i]) for i in nearest] == pytest.approx(
+            distances
+        )
+        radius = random.uniform(0, 400)
+        assert sorted(spatial_hash.query_radius(x, y, radius)) == sorted(
+            i for i, p in positions.items() if math.dist((x, y), p) <= radius
+        )
+
+
+class _Unit:
+    def __init__(self, health: int):
+        self.health = health
+        self.orders = [1, 2]
+
+
+def test_read_only_views():
+    import copy
+
+    from code_battles.views import ReadOnlyError, ViewScope, read_only
+
+    units = [_Unit(10), _Unit(20)]
+    state = {"units": units, "tags": {"a", "b"}, "grid": (1, [2])}
+    scope = ViewScope()
+    view = read_only(state, scope)
+
+    # Non-mutating operations work like on the values.
+    assert view["units"] + [None] == [*units, None]
+    assert [None] + view["units"] == [None, *units]
+    assert len(view["units"] * 2) == 4
+    assert view["grid"] + (3,) == (1, [2], 3)
+    assert view["tags"] | {"c"} == {"a", "b", "c"}
+    assert {"a", "c"} & view["tags"] == {"a"}
+    assert view["tags"].union({"c"}) == {"a", "b", "c"}
+    assert view["tags"].issuperset({"a"}) and view["tags"] <= {"a", "b"}
+    assert view["grid"] < (2,)
+    assert (view | {"extra": 1})["extra"] == 1
+    assert isinstance(view["units"][0], _Unit)
+
+    # Copies are modifiable, but the values in them are still views.
+    units_copy = view["units"].copy()
+    units_copy.append(None)
+    assert len(units) == 2
+    for modify in [
+        lambda: (view["units"] + [])[0].orders.append(3),
+        lambda: view.copy()["units"].append(None),
+        lambda: copy.copy(view["units"][0]).orders.append(3),
+        lambda: setattr(view["units"][0], "health", 0),
+        lambda: view["tags"].add("c"),
+    ]:
+        with pytest.raises(ReadOnlyError):
+            modify()
+    assert units[0].orders == [1, 2] and units[0].health == 10
+
+    # The value isn't reachable through the view.
+    for name in ["_get", "_target", "_scope"]:
+        assert not hasattr(view, name)
+    keys = view.keys()
+    assert not hasattr(keys, "mapping") and getattr(keys, "_mapping", view) is view
+    assert keys == {"units", "tags", "grid"} and "tags" in keys and len(keys) == 3
+    assert keys - {"grid"} == {"units", "tags"} and list(reversed(view)) == [
+        "grid",
+        "tags",
+        "units",
+    ]
+    deep = copy.deepcopy(view["units"])
+    deep[0].orders.append(3)
+    assert units[0].orders == [1, 2]
+
+    scope.invalidate()
+    with pytest.raises(ReadOnlyError):
+        len(view)
+
+
+def test_decision_codec_round_trip():
+    from array import array
+
+    from code_battles.codec import (
+        Bool,
+        DecisionCodec,
+        Enum,
+        Float64,
+        Int32,
+        ListOf,
+        Record,
+        UInt16,
+    )
+
+    schema = Record(
+        moves=ListOf(Record(unit=UInt16, x=Float64, fast=Bool)),
+        orders=ListOf(Enum(["hold", "attack", ("retreat", 1)])),
+        targets=ListOf(Int32),
+        cells=ListOf(Enum(range(70000))),
+        named=ListOf(Record(unit=UInt16, order=Enum(["hold", "attack"]))),
+    )
+    codec = DecisionCodec(schema, "1.0")
+    decisions = {
+        "moves": [{"unit": 3, "x": 1.5, "fast": True}, (65535, -2.25, False)],
+        "orders": ["attack", ("retreat", 1), "hold"],
+        "targets": array("i", [-1, 0, 2**31 - 1]),
+        "cells": [0, 255, 256, 65535, 65536, 69999],
+        "named": [{"unit": 1, "order": "attack"}],
+    }
+
+    decoded = codec.decode(codec.encode(decisions))
+    assert decoded["moves"] == [
+        {"unit": 3, "x": 1.5, "fast": True},
+        {"unit": 65535, "x": -2.25, "fast": False},
+    ]
+    assert decoded["orders"] == decisions["orders"]
+    assert decoded["targets"].tolist() == [-1, 0, 2**31 - 1]
+    assert decoded["cells"] == decisions["cells"]
+    assert decoded["named"] == decisions["named"]
+    assert [Enum(range(n)).format for n in [256, 257, 65536, 65537]] == list("BHHI")
+
+    encoded = codec.encode(decisions)
+    with pytest.raises(ValueError, match="not one of"):
+        codec.encode({**decisions, "orders": ["charge"]})
+    with pytest.raises(ValueError, match="truncated"):
+        codec.decode(encoded[:-1])
+    with pytest.raises(ValueError, match="trailing"):
+        codec.decode(encoded + b"\0")
+    with pytest.raises(ValueError, match="version 2.0"):
+        DecisionCodec(schema, "2.0").decode(encoded)
+
+
+def _compare(outcomes: str, **kwargs):
+    from code_battles.comparison import Comparison
+    from code_battles.tournament import Match
+
+    played: List[Match] = []
+
+    def run_matches(matches: List[Match]) -> List[SimulationResult]:
+        results = []
+        for match in matches:
+            pair = len(played) // 2
+            played.append(match)
+            seat = match.player_names.index("Bot")
+            others = [i for i in range(len(match.player_names)) if i != seat]
+            # "w" means the candidate won the pair, "l" that it lost and "t" a tie.
+            first = match.player_codes[seat] == {"w": "new", "l": "old"}.get(
+                outcomes[pair % len(outcomes)]
+            )
+            places = [seat, *others] if first else [*others, seat]
+            results.append(
+                SimulationResult(
+                    match.parameters, match.player_names, match.seed, places, 1, {}
+                )
+            )
+        return results
+
+    comparison = Comparison(
+        _Game(),
+        "old",
+        "new",
+        {"X": "x", "Y": "y"},
+        [{"map": "Arena"}, {"map": "Maze"}],
+        seed=0,
+        run_matches=run_matches,
+        **kwargs,
+    )
+    return comparison.run(), played
+
+
+def test_comparison_stops_when_the_test_is_decided():
+    # With delta=0.1 and alpha=beta=0.05, each win adds log(1.5) and the bounds are ±log(19), so 8 wins decide.
+    result, played = _compare("w", max_pairs=100)
+    assert (result.verdict, result.pairs, result.wins) == ("better", 8, 8)
+    assert result.log_likelihood_ratio == pytest.approx(8 * math.log(1.5))
+    assert (result.simulations, result.saved_simulations) == (16, 184)
+    assert len(played) == 16
+
+    for baseline, candidate in zip(played[::2], played[1::2]):
+        assert baseline.seed == candidate.seed
+        assert baseline.parameters is candidate.parameters
+        assert baseline.player_names == candidate.player_names
+        seat = baseline.player_names.index("Bot")
+        assert baseline.player_codes[seat] == "old"
+        assert candidate.player_codes[seat] == "new"
+        assert baseline.player_codes[:seat] + baseline.player_codes[seat + 1 :] == (
+            candidate.player_codes[:seat] + candidate.player_codes[seat + 1 :]
+        )
+    # The compared bot's seat and the parameters rotate between pairs, and every pair gets a new seed.
+    assert [match.player_names.index("Bot") for match in played[::2]][:3] == [0, 1, 2]
+    assert [match.parameters["map"] for match in played[::2]][:2] == ["Arena", "Maze"]
+    assert len({match.seed for match in played}) == 8
+
+    # Ties don't move the test, and batches are played whole.
+    result, _ = _compare("lt")
+    assert (result.verdict, result.pairs, result.losses, result.ties) == (
+        "worse",
+        15,
+        8,
+        7,
+    )
+    assert _compare("w", batch=3)[0].pairs == 9
+    result, _ = _compare("wl", max_pairs=10)
+    assert (result.verdict, result.pairs, result.saved_simulations) == (
+        "inconclusive",
+        10,
+        0,
+    )
+
+
+def test_tournament_glicko_updates():
+    from code_battles.tournament import Tournament
+
+    bots = {"A": "", "B": "", "C": "", "D": ""}
+    tournament = Tournament(_Game(), bots, [{}], players_per_match=4)
+    for name, rating, deviation in [
+        ("A", 1400, 30),
+        ("B", 1550, 100),
+        ("C", 1700, 300),
+        ("D", 1500, 200),
+    ]:
+        tournament.ratings[name].rating = rating
+        tournament.ratings[name].deviation = deviation
+
+    # The example of Glickman's "The Glicko system": D beats A and loses to B and C.
+    tournament.record(["A", "B", "C", "D"], [2, 1, 3, 0])
+    d = tournament.ratings["D"]
+    assert (d.rating, d.deviation) == (
+        pytest.approx(1464, abs=0.5),
+        pytest.approx(151.4, abs=0.05),
+    )
+    assert [tournament.ratings[name].points for name in "CBDA"] == [3, 2, 1, 0]
+    assert tournament.ratings["A"].rating < 1400 < 1700 < tournament.ratings["C"].rating
+
+    # Everyone is updated from the ratings before the match, so equal bots move by the same amount.
+    tournament = Tournament(_Game(), {"A": "", "B": ""}, [{}])
+    tournament.record(["A", "B"], [1, 0])
+    a, b = tournament.ratings["A"], tournament.ratings["B"]
+    assert b.rating - 1500 == pytest.approx(1500 - a.rating)
+    assert a.deviation == pytest.approx(b.deviation) and a.deviation < 350
+    assert (a.matches, b.matches, tournament.matches_played) == (1, 1, 1)
+
+
+def test_archive_reads_headers_incrementally(tmp_path: Path, monkeypatch: MonkeyPatch):
+    import base64
+    import gzip
+
+    from code_battles import archive
+
+    header = {
+        "parameters": {"map": "Zürich"},
+        "playerNames": ["A", "Bé"],
+        "seed": 12345678901234567890,
+        "results": {"winner": "A", "steps": 120, "statistics": {"ratio": -1.5e-3}},
+    }
+    text = json.dumps({**header, "logs": [{"text": "é" * 50}], "decisions": []})
+    spaced = text.replace(", ", " ,\n ").replace(": ", " :\t")
+
+    # Every prefix either needs more text or gives the whole header, never a value that was cut (like a number).
+    decoder = json.JSONDecoder()
+    for document in [text, spaced]:
+        results = [
+            archive._parse_header(decoder, document[:i])
+            for i in range(len(document) + 1)
+        ]
+        end = results.index(header)
+        assert results[:end] == [None] * end
+        assert document[:end].rstrip().endswith('"logs"')
+        assert all(result == header for result in results[end:])
+    assert archive._parse_header(decoder, json.dumps(header)) == header
+    with pytest.raises(ValueError):
+        archive._parse_header(decoder, '["not", "an", "object"]')
+    with pytest.raises(ValueError):
+        archive._parse_header(decoder, '{"seed" 1}')
+
+    # Chunks which split base64 quadruplets and UTF-8 characters.
+    path = tmp_path / "simulation.btl"
+    path.write_bytes(base64.b64encode(gzip.compress(text.encode())) + b"\n")
+    for chunk_size in [1, 3, 5, 7, 64]:
+        monkeypatch.setattr(archive, "_CHUNK_SIZE", chunk_size)
+        assert archive.read_header(str(path)) == header
+
+    path.write_bytes(base64.b64encode(gzip.compress(text[:40].encode())))
+    with pytest.raises(ValueError, match="not a valid simulation file"):
+        archive.read_header(str(path))
+
+
+def test_step_buffer_reads_spilled_steps():
+    from code_battles.logs import StepBuffer
+
+    steps = [
+        [{"step": step, "text": "é" * (step % 5)}] * (step % 3) for step in range(70)
+    ]
+    buffer = StepBuffer(chunk_size=8)
+    for entries in steps:
+        buffer.append(entries)
+    size = buffer.size
+    buffer.spill(50)
+    assert len(buffer._chunks) == 6 and len(buffer) == 70
+    assert buffer.size < size
+    assert list(buffer) == steps
+    assert [buffer[step] for step in [69, 3, 47, 48, 0, -1]] == [
+        steps[step] for step in [69, 3, 47, 48, 0, -1]
+    ]
+    assert buffer[10:20] == steps[10:20]
+    buffer.spill(1000)
+    assert len(buffer._recent) == 70 % 8 and list(buffer) == steps
+    with pytest.raises(IndexError):
+        buffer[70]
+
+
+def test_web_steps_replay_like_sequential_runs(monkeypatch: MonkeyPatch):
+    import code_battles.battles
+    from code_battles.logs import StepBuffer
+
+    bots = [ATTACKER, CRASHER, CHATTY]
+    sequential = _Game()
+    sequential._run_headless_simulation(
+        {"map": "Arena"},
+        ["A", "B", "C"],
+        bots,
+        3,
+        record=True,
+        on_alerts=lambda alerts: None,
+    )
+
+    games = []
+    for player_codes in [bots, ["", "", ""]]:
+        game = _Game()
+        game.parameters = {"map": "Arena"}
+        game.player_names = ["A", "B", "C"]
+        game.verbose = False
+        game._initialize_simulation(player_codes, 3)
+        games.append(game)
+    # The web worker collects alerts, and the main thread shows them.
+    worker, main = games
+    worker._collect_alerts = True
+    main._logs = StepBuffer(chunk_size=16)
+    main._alerts = StepBuffer(chunk_size=16)  # type: ignore[assignment]
+    main.configure_lookahead_steps = lambda: 5  # type: ignore[method-assign]
+    shown_alerts: List[List[Dict]] = []
+    monkeypatch.setattr(
+        code_battles.battles,
+        "show_alert",
+        lambda title, *_: shown_alerts[-1].append(title),
+    )
+
+    def replay():
+        shown_alerts.append([])
+        main._replay_step()
+        if not main.over:
+            main.step += 1
+        entries = main._log_sink.take(main.step)
+        # The main thread also logs while applying the decisions (for example, eliminations).
+        expected = sequential._logs[main._decision_index - 1]
+        assert entries[: len(expected)] == expected
+
+    while not worker.over:
+        decisions, logs, alerts = worker._simulate_step()
+        main._receive_step(
+            worker._decisions.encode(decisions),
+            json.dumps(logs),
+            json.dumps(alerts),
+            False,
+        )
+        if not worker.over:
+            worker.step += 1
+        # The worker waits while the main thread is 5 steps behind.
+        assert main._is_lookahead_full() == (
+            "true" if len(main._decisions) - main._decision_index >= 5 else "false"
+        )
+        while main._is_lookahead_full() == "true":
+            replay()
+            assert main._is_lookahead_full() == "false"
+    while main._decision_index < len(main._decisions):
+        replay()
+
+    assert main.over and main.step == sequential.step
+    assert main.state == sequential.state and main._eliminated == sequential._eliminated
+    assert list(main._decisions) == list(sequential._decisions)
+    assert len(main._logs._chunks) > 0 and list(main._logs) == sequential._logs
+    assert list(main._alerts) == sequential._alerts
+    assert shown_alerts == [
+        [alert["title"] for alert in alerts] for alerts in sequential._alerts
+    ]
+    assert sum(map(len, shown_alerts)) > 0
+
+
+def test_decision_logs_round_trip():
+    from random import Random
+
+    from code_battles.compression import (
+        DecisionCompressor,
+        DecisionLog,
+        XorDeltaCompressor,
+        ZlibStreamCompressor,
+    )
+
+    random = Random(0)
+    steps = []
+    for step in range(50):
+        # Mostly similar steps of varying lengths, including empty ones.
+        length = random.choice([0, 8, 16, 16, 16, 40])
+        steps.append(
+            bytes((step // 4 + i * random.randint(0, 1)) % 256 for i in range(length))
+        )
+
+    for make_compressor in [
+        DecisionCompressor,
+        XorDeltaCompressor,
+        ZlibStreamCompressor,
+        lambda: ZlibStreamCompressor(dictionary=bytes(range(16))),
+    ]:
+        log = DecisionLog(make_compressor(), steps[:30], keyframe_interval=8)
+        assert list(log) == steps[:30]
+        # Random access, including going back and crossing keyframes.
+        for step in [17, 3, 29, 8, 7, 16, 16, 0]:
+            assert log[step] == steps[step]
+        assert log[-2] == steps[28]
+        assert log[5:12] == steps[5:12]
+
+        # A copy continues independently from the shared steps.
+        fork = log.copy()
+        fork.extend(steps[30:])
+        log.extend(reversed(steps[30:]))
+        assert list(fork) == steps
+        assert list(log) == steps[:30] + steps[30:][::-1]
+        assert fork[20] == steps[20] and fork[45] == steps[45]
+
+        # The web worker encodes the frames, and the main thread stores them.
+        worker = DecisionLog(make_compressor(), keyframe_interval=8)
+        main = DecisionLog(make_compressor(), keyframe_interval=8)
+        for decisions in steps:
+            main.append_frame(worker.encode(decisions))
+        assert len(worker) == 0 and list(main) == steps
+        assert main[41] == steps[41] and main[9] == steps[9]
+
+
+def test_simulation_logs_are_queried_by_player_and_step():
+    import base64
+    import gzip
+
+    game = _Game()
+    game._run_headless_simulation(
+        {"map": "Arena"}, ["A", "B", "C"], [CHATTY, ATTACKER, CHATTY], 4, record=True
+    )
+    # Entries without a player are indexed as game entries (player -1), like eliminations.
+    game._logs[-1].append(
+        {"step": game.step, "text": "over", "player_index": None, "color": "gray"}
+    )
+    steps = game._logs
+    simulation = Simulation.load(game._get_simulation().dump())
+    assert simulation.logs.players == [-1, 0, 1, 2]
+    assert list(simulation.logs) == steps
+    for player_index in [None, -1, 0, 1, 2, 5]:
+        for start, end in [(0, None), (3, 9), (9, 3), (-5, 2), (len(steps) - 1, 10**6)]:
+            expected = [
+                entry
+                for entries in steps[max(start, 0) : end]
+                for entry in entries
+                if player_index is None
+                or (-1 if entry["player_index"] is None else entry["player_index"])
+                == player_index
+            ]
+            assert simulation.query_logs(player_index, start, end) == expected
+
+    # Simulation files from before logs were indexed keep the logs of each step, and the seed at their end.
+    old_file = base64.b64encode(
+        gzip.compress(
+            json.dumps(
+                {
+                    "parameters": {"map": "Arena"},
+                    "playerNames": ["A", "B", "C"],
+                    "game": "_Game",
+                    "version": "1.0",
+                    "timestamp": "2024-05-01T12:00:00",
+                    "logs": steps,
+                    "alerts": [[] for _ in steps],
+                    "decisions": [
+                        base64.b64encode(decisions).decode()
+                        for decisions in game._decisions
+                    ],
+                    "seed": 4,
+                }
+            ).encode()
+        )
+    ).decode()
+    old = Simulation.load(old_file)
+    assert (old.seed, old.results, old.decisions) == (4, None, list(game._decisions))
+    assert list(old.logs) == steps and old.logs[2] == steps[2]
+    assert old.query_logs(1, 2, 6) == simulation.query_logs(1, 2, 6)
+    assert Simulation.load(old.dump()).logs[:] == steps
+
+
+RAISER = """
+class MyBot(CodeBattlesBot):
+    def __init__(self, context):
+        super().__init__(context)
+        self.steps = 0
+
+    def run(self):
+        self.steps += 1
+        if self.steps % 50 == 0:
+            raise ValueError("every 50 steps")
+        if self.steps == 120:
+            raise KeyError("once")
+        raise ValueError("step %d" % self.steps)
+"""
+
+
+def test_repeated_bot_exceptions_are_reported_less_often():
+    game = _Game()
+    alerts: List[Dict] = []
+    result = game._run_headless_simulation(
+        {"map": "Arena"}, ["A", "B"], [RAISER, RAISER], 0, on_alerts=alerts.extend
+    )
+    calls = result.steps + 1
+    assert result.errors == [calls, calls]
+
+    # Each player's exceptions are counted separately, by their type and lines in the bot.
+    for player_index in [0, 1]:
+        outputs = [
+            alert["alert"]
+            for alert in alerts
+            if alert["title"] == f"Code Exception in 'Player {player_index + 1}' API!"
+        ]
+        assert len(outputs) == 5
+        assert outputs[0] == (
+            "Traceback (most recent call last):\n"
+            "Line 1, in <module>\n"
+            "Line 13, in run\n"
+            "ValueError: step 1\n"
+        )
+        assert outputs[1] == "ValueError (line 13) repeated 10 times."
+        assert "Line 10, in run\nValueError: every 50 steps\n" in outputs[2]
+        assert outputs[3] == "ValueError (line 13) repeated 100 times."
+        assert "Line 12, in run\nKeyError: 'once'\n" in outputs[4]
+
+
+@pytest.mark.parametrize("with_numpy", [False, True])
+def test_entity_store(monkeypatch: MonkeyPatch, with_numpy: bool):
+    import code_battles.utilities
+    from code_battles.utilities import EntityStore
+    from code_battles.views import ReadOnlyError
+
+    if with_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(code_battles.utilities, "_numpy_module", False)
+
+    store = EntityStore(x="d", health="i", owner="B")
+    assert store.add(x=1.5, health=10, owner=1) == 0
+    ids = store.add_many(4, x=[0.0, 1.0, 2.0, 3.0], owner=[0, 1, 0, 1])
+    assert list(ids) == [1, 2, 3, 4] and store.ids == [0, 1, 2, 3, 4]
+    assert store.column("health").tolist() == [10, 0, 0, 0, 0]
+    with pytest.raises(ValueError):
+        store.add_many(2, x=[1.0])
+    assert len(store) == 5
+
+    # Removing a row moves the last row into its place, and ids keep referring to their entities.
+    view = store.view(4)
+    store.remove(1)
+    assert store.ids == [0, 4, 2, 3] and store.row(4) == 1
+    assert view.x == 3.0 and view.owner == 1
+    store.remove(3)
+    assert store.ids == [0, 4, 2] and 3 not in store and 4 in store
+    assert [store.get(i, "x") for i in [0, 4, 2]] == [1.5, 3.0, 1.0]
+    assert store.find(owner=1) == [0, 4, 2] and store.find(owner=0) == []
+    assert store.find(owner=1, health=10) == [0]
+    assert store.find(owner=5) == []
+
+    store.apply("health", lambda x, health: x * 2 + health, "x", "health")
+    assert store.column("health").tolist() == [13, 6, 2]
+    store.apply("x", lambda x: x / 2, "x")
+    assert [view.x for view in store.views()] == [0.75, 1.5, 0.5]
+
+    for modify in [
+        lambda: setattr(view, "x", 0),
+        lambda: setattr(view, "id", 0),
+        lambda: delattr(view, "id"),
+        lambda: delattr(view, "x"),
+    ]:
+        with pytest.raises(ReadOnlyError):
+            modify()
+    assert view.id == 4 and view.as_dict() == {"x": 1.5, "health": 6, "owner": 1}
+
+    store.remove_many([0, 4, 2])
+    assert len(store) == 0 and store.find(owner=1) == []
+    store.apply("x", lambda x: x + 1, "x")
+    with pytest.raises(KeyError):
+        view.x
+
+
+def test_navigation_distance_fields(tmp_path: Path, monkeypatch: MonkeyPatch):
+    from code_battles.navigation import NavigationGrid
+
+    # The wall forces a detour through the bottom row, where cutting the wall's corner would save a step.
+    grid = NavigationGrid.from_text("..#..\n..#..\n.....")
+    field = grid.distance_field([(4.5, 0.5)])
+    assert [field.distance(x + 0.5, 0.5) for x in range(5)] == [6, 6, None, 1, 0]
+    assert field.distance(2.5, 2.5) == 3 and field.distance(1.5, 1.5) == 5
+    path = field.path(0.5, 0.5)
+    assert len(path) == 6 and path[-1] == (4.5, 0.5)
+    previous = grid.cell(0.5, 0.5)
+    for position in path:
+        x, y = grid.cell(*position)
+        assert grid.is_passable(*position)
+        assert max(abs(x - previous[0]), abs(y - previous[1])) == 1
+        assert grid.passable[previous[1] * 5 + x] and grid.passable[y * 5 + previous[0]]
+        previous = (x, y)
+
+    # Diagonal neighbors are unreachable when both cells between them are blocked.
+    field = NavigationGrid.from_text(".#\n#.").distance_field([(1.5, 1.5)])
+    assert field.distance(0.5, 0.5) is None
+    assert field.direction(0.5, 0.5) is None and field.path(0.5, 0.5) == []
+    field = NavigationGrid.from_text(".#.\n.#.", cell_size=10).distance_field([(5, 5)])
+    assert [field.distance(25, y) for y in [5, 15]] == [None, None]
+    assert field.distance(5, 15) == 1 and field.direction(5, 15) == (0, -1)
+    assert field.next_position(5, 15) == (5, 5)
+
+    computed = []
+    compute = NavigationGrid._compute_distances
+    monkeypatch.setattr(
+        NavigationGrid,
+        "_compute_distances",
+        lambda self, targets: computed.append(targets) or compute(self, targets),
+    )
+    map_path = tmp_path / "map.txt"
+    map_path.write_text("..#..\n..#..\n.....")
+    cache = str(tmp_path / "cache")
+    grid = NavigationGrid.load(str(map_path), cache_directory=cache)
+    field = grid.distance_field([(4.5, 0.5), (4.1, 0.9)])
+    assert grid.distance_field([(4.5, 0.5)]) is field
+    # Another simulation which loads the same map maps the cached field into memory.
+    other = NavigationGrid.load(str(map_path), cache_directory=cache)
+    assert list(other.distance_field([(4.5, 0.5)]).distances) == list(field.distances)
+    assert computed == [(4,)]
+    assert len(os.listdir(cache)) == 1
+    other.distance_field([(0.5, 0.5)])
+    assert computed == [(4,), (0,)]
+
+
+def test_archive_indexes_changed_files(tmp_path: Path, capsys):
+    import base64
+    import datetime
+    import gzip
+
+    from code_battles.archive import SimulationArchive, main
+
+    directory = tmp_path / "simulations"
+    (directory / "old").mkdir(parents=True)
+
+    def save(name: str, player_names: List[str], map: str, seed: int, day: int):
+        game = _Game()
+        game._run_headless_simulation(
+            {"map": map, "mode": "fast"},
+            player_names,
+            [ATTACKER for _ in player_names],
+            seed,
+            record=True,
+        )
+        simulation = game._get_simulation()
+        simulation.timestamp = datetime.datetime(2024, 5, day)
+        path = directory / name
+        path.write_text(simulation.dump())
+        return str(path), game._get_results()
+
+    a, a_results = save("a.btl", ["A", "B"], "Arena", 1, 1)
+    b, _ = save("b.btl", ["A", "C", "D"], "Maze", 2, 2)
+    # Simulation files from before the header was placed first have their seed after the decisions.
+    c = str(directory / "old" / "c.btl")
+    with open(c, "w") as f:
+        f.write(
+            base64.b64encode(
+                gzip.compress(
+                    json.dumps(
+                        {
+                            "map": "Arena",
+                            "playerNames": ["C", "D"],
+                            "game": "_Game",
+                            "version": "1.0",
+                            "timestamp": "2024-05-03T00:00:00",
+                            "logs": [],
+                            "alerts": [],
+                            "decisions": [],
+                            "seed": 3,
+                        }
+                    ).encode()
+                )
+            ).decode()
+        )
+    (directory / "notes.txt").write_text("not a simulation")
+
+    archive = SimulationArchive(str(tmp_path / "archive.db"))
+    assert archive.update(str(directory)) == 3
+    assert archive.update(str(directory)) == 0
+    assert archive.query() == [a, b, c]
+    assert archive.query(player="A") == [a, b]
+    assert archive.query(players=["A", "D"]) == [b]
+    assert archive.query(map="Arena") == [a, c]
+    assert archive.query(parameters={"mode": "fast"}, map="Arena") == [a]
+    assert archive.query(winner=a_results["winner"], player="B") == [a]
+    assert archive.query(since="2024-05-02", until="2024-05-02T23:59") == [b]
+    assert (
+        archive.query(min_steps=a_results["steps"], max_steps=a_results["steps"])[0]
+        == a
+    )
+    metadata = archive.get_metadata(c)
+    assert metadata is not None and metadata["seed"] == 3
+    assert metadata["parameters"] == {"map": "Arena"} and metadata["steps"] is None
+    metadata = archive.get_metadata(a)
+    assert metadata is not None
+    assert (metadata["seed"], metadata["player_names"], metadata["winner"]) == (
+        1,
+        ["A", "B"],
+        a_results["winner"],
+    )
+
+    # Only the new, changed and deleted files are updated.
+    save("a.btl", ["A", "E"], "Forest", 4, 4)
+    os.utime(a, (0, 1))
+    os.remove(b)
+    d, _ = save("d.btl", ["B", "C"], "Arena", 5, 5)
+    assert archive.update(str(directory)) == 2
+    assert archive.query() == [c, a, d]
+    assert archive.query(player="E") == [a] and archive.query(map="Maze") == []
+    assert archive.get_metadata(b) is None
+    # Updating a subdirectory doesn't forget the files outside of it.
+    assert archive.update(str(directory / "old")) == 0
+    assert archive.query() == [c, a, d]
+
+    main(["query", str(tmp_path / "archive.db"), "--parameter", "map=Arena"])
+    assert capsys.readouterr().out.splitlines() == [c, d]
+    with pytest.raises(SystemExit) as exit_info:
+        main(["query", str(tmp_path / "archive.db"), "--parameter", "map"])
+    assert exit_info.value.code == 2
+    assert "KEY=VALUE" in capsys.readouterr().err
+
+
+HOARDER = """
+class MyBot(CodeBattlesBot):
+    def __init__(self, context):
+        super().__init__(context)
+        self.hoard = []
+
+    def run(self):
+        self.hoard.append([self.context.player_index] * 100000)
+"""
+
+IDLE = """
+class MyBot(CodeBattlesBot):
+    def run(self):
+        pass
+"""
+
+
+def test_memory_profiler_attributes_and_stops_bots(monkeypatch: MonkeyPatch):
+    from code_battles.memory import MemoryProfiler
+
+    game = _Game()
+    monkeypatch.setattr(
+        game,
+        "configure_memory_profiling",
+        lambda: MemoryProfiler(interval=1, limit=2 * 2**20, policy="stop"),
+    )
+    game.parameters = {"map": "Arena"}
+    game.player_names = ["A", "B"]
+    game.verbose = False
+    game._collect_alerts = True
+    game._initialize_simulation([HOARDER, IDLE], 0)
+    profiler = game.memory_profiler
+    assert profiler is not None
+    try:
+        sizes = []
+        for _ in range(5):
+            game.advance()
+            sizes.append(profiler.size(0))
+            assert profiler.size(1) < 50_000
+    finally:
+        game._stop_memory_profiler()
+
+    # Every step adds a list of 100000 references (800KB) until the bot exceeds 2MiB and is stopped, freeing its memory.
+    assert sizes[0] >= 800_000 and sizes[1] >= 2 * sizes[0] * 0.9
+    assert sizes[2] > 2 * 2**20 and sizes[3] < 50_000 and sizes[4] < 50_000
+    assert profiler.exceeded == [0] and profiler.peak(0) == sizes[2]
+    assert 8 not in [site.lineno for site in profiler.top_sites[0]]
+    assert game._player_globals[0]["player_api"] is None
+    assert [alert["title"] for alert in game._alerts] == [
+        "Memory Limit Exceeded in 'Player 1' API!"
+    ]
+    assert "mostly from line 8" in game._alerts[0]["alert"]
+    assert "The bot was stopped." in game._alerts[0]["alert"]
+
+
+def test_timing_histograms():
+    import math
+
+    from code_battles.timing import BotTimings, TimingHistogram
+
+    # Buckets are bounded by a microsecond times powers of 2 ** (1 / 8), and include their upper bound.
+    histogram = TimingHistogram()
+    bounds = [1e-6 * 2 ** (bucket / 8) for bucket in range(200)]
+    for bucket, bound in enumerate(bounds):
+        histogram.add(bound)
+        histogram.add(bound * 1.001)
+        assert histogram.buckets[bucket] == 1
+        assert histogram.buckets[bucket + 1] == 1
+        histogram.buckets.clear()
+    for duration in [0, 1e-7, 1e-6]:
+        histogram.add(duration)
+    assert histogram.buckets == {0: 3}
+
+    histogram = TimingHistogram()
+    durations = [0.001 * (i + 1) for i in range(100)]
+    for duration in reversed(durations):
+        histogram.add(duration)
+    assert histogram.count == 100 and histogram.max == 0.1
+    assert histogram.total == pytest.approx(sum(durations))
+    for percent in [1, 50, 95, 99]:
+        exact = durations[math.ceil(percent) - 1]
+        assert exact <= histogram.percentile(percent) <= exact * 2 ** (1 / 8)
+    # Percentiles are never above the longest call.
+    assert histogram.percentile(100) == 0.1
+    assert TimingHistogram().percentile(50) == 0.0
+
+    timings = BotTimings()
+    for i in range(100):
+        timings.add(0, "run", 0.001)
+        timings.add(1, "run", 0.01 if i < 90 else 0.1)
+    timings.add(1, "setup", 1.0)
+    combined = timings.combined("run")
+    assert (combined.count, combined.max) == (200, 0.1)
+    assert combined.total == pytest.approx(0.1 + 0.9 + 1.0)
+    assert 0.001 <= combined.percentile(50) <= 0.001 * 2 ** (1 / 8)
+    assert 0.01 <= combined.percentile(90) <= 0.01 * 2 ** (1 / 8)
+    assert combined.percentile(96) == 0.1
+    # Merging doesn't change the players' own timings.
+    assert timings.histograms[(0, "run")].count == 100
+    statistics = timings.statistics()
+    assert statistics["player_2_run_calls"] == 100
+    assert statistics["player_2_run_p95_ms"] == 100.0
+    assert statistics["player_2_setup_max_ms"] == 1000.0
+    assert statistics["player_1_run_p50_ms"] == pytest.approx(1.0, rel=0.1)
+
+
+def test_swiss_pairing_avoids_rematches():
+    from code_battles.tournament import Match, Tournament
+
+    strengths = {"A": 4, "B": 3, "C": 2, "D": 1, "E": 0}
+
+    def run_matches(matches: List[Match]) -> List[SimulationResult]:
+        return [
+            SimulationResult(
+                match.parameters,
+                match.player_names,
+                match.seed,
+                sorted(
+                    range(len(match.player_names)),
+                    key=lambda i: -strengths[match.player_names[i]],
+                ),
+                1,
+                {},
+            )
+            for match in matches
+        ]
+
+    tournament = Tournament(
+        _Game(),
+        {name: "" for name in "ABCD"},
+        [{}],
+        seed=0,
+        max_rounds=4,
+        run_matches=run_matches,
+    )
+    pairs = []
+    for _ in range(3):
+        pairs.extend(frozenset(group) for group in tournament.pair())
+        tournament.play_round()
+    # The two leaders would meet again in the third round without avoiding rematches.
+    assert len(set(pairs)) == 6
+    # Once everyone played against everyone, bots are paired by their standing again.
+    assert tournament.pair() == [["A", "B"], ["C", "D"]]
+
+    # With an odd amount of bots, every bot sits out once and rematches are still avoided.
+    tournament = Tournament(
+        _Game(), {name: "" for name in "ABCDE"}, [{}], run_matches=run_matches
+    )
+    pairs = []
+    for _ in range(5):
+        pairs.extend(frozenset(group) for group in tournament.pair())
+        tournament.play_round()
+    assert len(set(pairs)) == len(pairs) == 10
+    assert [rating.byes for rating in tournament.ratings.values()] == [1] * 5
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from benchmarks.bench_import import (
+    IMPORT_BUDGET_MS,
+    LAZY_MODULES,
+    get_loaded_modules,
+    measure_import_time,
+)
+
+
+def test_lazy_modules_are_not_imported():
+    loaded = get_loaded_modules()
+    assert [module for module in LAZY_MODULES if module in loaded] == []
+
+
+def test_numpy_is_imported_on_first_use():
+    assert "numpy" not in get_loaded_modules("code_battles.results")
+
+
+# Import times vary a lot between machines and with their load, so only regressions much larger than the noise fail.
+# The lazy modules test above catches the usual cause of regressions deterministically.
+IMPORT_TIME_SLACK = 4
+
+
+def test_import_time_budget():
+    assert measure_import_time() <= IMPORT_BUDGET_MS * IMPORT_TIME_SLACK